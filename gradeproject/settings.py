@@ -19,8 +19,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'grades.metrics.PerformanceMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'grades.sessions.StudentSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -34,8 +36,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'grades' / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # compiled templates are kept in memory (also with DEBUG; the
+            # autoreloader resets them when a template file changes)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -47,11 +56,19 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'gradeproject.wsgi.application'
+# production profile: gunicorn + uvicorn workers (see gunicorn.conf.py)
+ASGI_APPLICATION = 'gradeproject.asgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # background workers write concurrently with requests: take the write lock at
+        # BEGIN and wait for it, instead of failing when a read transaction upgrades
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -73,3 +90,39 @@ LOGOUT_REDIRECT_URL = 'grades:login'
 MEDIA_URL = '/media/'
 MEDIAFILES_DIRS = [BASE_DIR / "media"]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Log a warning when a single request runs more SQL queries than this (see grades.metrics)
+METRICS_QUERY_BUDGET = 50
+
+# کش داشبورد دانش‌آموز و صفحه کلاس، در جدولی از همین پایگاه داده (migrate آن را می‌سازد) تا
+# نسخه‌هایی که run_workers، زمان‌بند، auto_reset و دیگر پردازه‌های وب عوض می‌کنند به همه برسد.
+# Redis یا Memcached هم مناسب‌اند؛ LocMemCache فقط برای یک پردازه است و run_workers با آن اجرا نمی‌شود.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'grades_cache',
+        # version tokens are culled along with payloads past this size, which only costs cache misses
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# نشست پورتال دانش‌آموز در کوکی امضاشده (بدون نوشتن در جدول django_session)؛ جدا از نشست کارکنان
+STUDENT_SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+STUDENT_SESSION_COOKIE_NAME = 'studentsessionid'
+
+# بایگانی فشرده تاریخچه قدیمی (python manage.py archive_history)؛ یک فایل برای هر سال تحصیلی
+HISTORY_ARCHIVE_DIR = BASE_DIR / 'history_archive'
+
+# کارهای پس‌زمینه (grades.jobs)؛ در محیط عملیاتی python manage.py run_workers را اجرا کنید
+# و JOBS_IN_PROCESS را False بگذارید تا هیچ کار سنگینی در پردازه وب اجرا نشود
+JOBS_IN_PROCESS = True
+JOB_MAX_ATTEMPTS = 3
+
+# فایل‌های zip کارنامه همه کلاس‌ها که کار پس‌زمینه report_cards می‌سازد (پس از ۷ روز پاک می‌شوند)
+REPORT_CARD_DIR = BASE_DIR / 'report_cards'
+
+# ریست خودکار هر کلاس (run_workers --schedule): هر AUTO_RESET_INTERVAL_HOURS ساعت یک بار،
+# با فاصله‌گذاری کلاس‌ها در پنجره AUTO_RESET_WINDOW_MINUTES دقیقه‌ای
+AUTO_RESET_INTERVAL_HOURS = 12
+AUTO_RESET_WINDOW_MINUTES = 60
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
+from grades.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Prometheus-style per-view metrics (staff only)
+    path('metrics', metrics_view, name='metrics'),
     # include app grades with namespace 'grades'
     path('', include(('grades.urls', 'grades'), namespace='grades')),
 ]
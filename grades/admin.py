@@ -3,9 +3,24 @@ from .models import SchoolClass, Subject, Student, Grade, GradebookEntry
 
 @admin.register(SchoolClass)
 class SchoolClassAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'grade_level', 'subject_count', 'student_count', 'average_grade')
     search_fields = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stats()
+
+    @admin.display(description='دروس', ordering='subject_count')
+    def subject_count(self, obj):
+        return obj.subject_count
+
+    @admin.display(description='دانش‌آموزان', ordering='student_count')
+    def student_count(self, obj):
+        return obj.student_count
+
+    @admin.display(description='معدل کلاس', ordering='average_grade')
+    def average_grade(self, obj):
+        return obj.average_grade
+
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'classroom')
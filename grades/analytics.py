@@ -0,0 +1,156 @@
+"""Vectorized grade statistics.
+
+Effective scores (Grade + GradebookEntry, as materialized in
+StudentSubjectScore) are loaded into a student x subject NumPy matrix with NaN
+for missing scores; every statistic is then computed column-wise.
+"""
+import warnings
+
+import numpy as np
+
+from .models import Student, Subject, StudentSubjectScore
+from .scoring import stored_averages
+
+PERCENTILES = (25, 75, 90)
+HISTOGRAM_BINS = np.arange(0, 22, 2)  # 0-2, 2-4, ..., 18-20
+
+
+class ScoreMatrix:
+    """Student x subject matrix of effective scores.
+
+    ``students`` and ``subjects`` are the row/column labels as lists of
+    ``(id, name)``; ``values`` is a float ndarray with NaN where a student has
+    no score for a subject.
+    """
+
+    def __init__(self, students, subjects, values):
+        self.students = students
+        self.subjects = subjects
+        self.values = values
+
+
+def load_matrix(classes):
+    """Build a ScoreMatrix for one class or an iterable of classes.
+
+    Columns are keyed by subject name so several classes of the same grade
+    level can be analysed together.
+    """
+    if hasattr(classes, 'pk'):
+        classes = [classes]
+    classes = list(classes)
+    for sc in classes:
+        # make sure every student has materialized rows
+        stored_averages(sc)
+
+    class_ids = [sc.id for sc in classes]
+    students = list(Student.objects.filter(classroom_id__in=class_ids)
+                    .order_by('classroom_id', 'roll_number', 'full_name')
+                    .values_list('id', 'full_name'))
+    names = sorted(set(Subject.objects.filter(classroom_id__in=class_ids).values_list('name', flat=True)))
+
+    rows = np.array(
+        list(StudentSubjectScore.objects.filter(student__classroom_id__in=class_ids)
+             .values_list('student_id', 'subject__name', 'score')),
+        dtype=object,
+    ).reshape(-1, 3)
+
+    values = np.full((len(students), len(names)), np.nan)
+    if len(rows):
+        row_index = {sid: i for i, (sid, _) in enumerate(students)}
+        col_index = {name: j for j, name in enumerate(names)}
+        r = np.fromiter((row_index[sid] for sid in rows[:, 0]), dtype=np.intp, count=len(rows))
+        c = np.fromiter((col_index[name] for name in rows[:, 1]), dtype=np.intp, count=len(rows))
+        values[r, c] = rows[:, 2].astype(float)
+    return ScoreMatrix(students, [(j, name) for j, name in enumerate(names)], values)
+
+
+def ranks(values):
+    """Competition rank (1 = best) of each score within its column; NaN stays NaN."""
+    out = np.full(values.shape, np.nan)
+    for j in range(values.shape[1]):
+        col = values[:, j]
+        mask = ~np.isnan(col)
+        ordered = np.sort(col[mask])
+        # number of strictly greater scores + 1
+        out[mask, j] = len(ordered) - np.searchsorted(ordered, col[mask], side='right') + 1
+    return out
+
+
+def zscores(values):
+    """Column-wise z-scores; columns with zero spread give 0."""
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        z = (values - mean) / std
+    z[:, std == 0] = np.where(np.isnan(values[:, std == 0]), np.nan, 0.0)
+    return z
+
+
+def subject_stats(matrix):
+    """Per-subject summary statistics as a list of dicts (one per column)."""
+    values = matrix.values
+    if not values.size:
+        return []
+    counts = np.sum(~np.isnan(values), axis=0)
+    with warnings.catch_warnings():
+        # all-NaN columns (subjects without scores) warn and yield NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        median = np.nanmedian(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        pct = np.nanpercentile(values, PERCENTILES, axis=0)
+        low = np.nanmin(values, axis=0)
+        high = np.nanmax(values, axis=0)
+    clipped = np.clip(values, HISTOGRAM_BINS[0], HISTOGRAM_BINS[-1])
+
+    stats = []
+    for j, name in matrix.subjects:
+        if not counts[j]:
+            stats.append({'subject': name, 'count': 0})
+            continue
+        hist, _ = np.histogram(clipped[:, j][~np.isnan(clipped[:, j])], bins=HISTOGRAM_BINS)
+        stats.append({
+            'subject': name,
+            'count': int(counts[j]),
+            'mean': round(float(mean[j]), 2),
+            'median': round(float(median[j]), 2),
+            'std': round(float(std[j]), 2),
+            'percentiles': {f'p{p}': round(float(pct[k, j]), 2) for k, p in enumerate(PERCENTILES)},
+            'min': round(float(low[j]), 2),
+            'max': round(float(high[j]), 2),
+            'histogram': [
+                {'range': f"{int(HISTOGRAM_BINS[b])}-{int(HISTOGRAM_BINS[b + 1])}", 'count': int(hist[b]),
+                 'percent': round(100.0 * hist[b] / counts[j])}
+                for b in range(len(hist))
+            ],
+        })
+    return stats
+
+
+def subject_breakdown(matrix, subject_name):
+    """Per-student score, rank, percentile and z-score for one subject column."""
+    names = [name for _, name in matrix.subjects]
+    if subject_name not in names:
+        return []
+    j = names.index(subject_name)
+    col = matrix.values[:, j:j + 1]
+    rank = ranks(col)[:, 0]
+    z = zscores(col)[:, 0]
+    n = int(np.sum(~np.isnan(col)))
+    rows = []
+    for i in np.argsort(np.where(np.isnan(rank), np.inf, rank), kind='stable'):
+        sid, full_name = matrix.students[i]
+        if np.isnan(col[i, 0]):
+            rows.append({'student_id': sid, 'full_name': full_name, 'score': None})
+            continue
+        rows.append({
+            'student_id': sid,
+            'full_name': full_name,
+            'score': round(float(col[i, 0]), 2),
+            'rank': int(rank[i]),
+            # share of scored students at or below this one
+            'percentile': round(100.0 * (n - rank[i] + 1) / n),
+            'zscore': round(float(z[i]), 2),
+        })
+    return rows
@@ -0,0 +1,191 @@
+"""Bulk attendance writes and the compact per-term attendance bitmaps.
+
+Besides the Attendance rows, every student has one AttendanceBitmap per
+school year: bit ``i`` of ``recorded``/``absent`` is the ``i``-th day after
+1 Mehr. The bitmaps are rebuilt from the rows after every change, and the
+summaries (absence counts, rates, longest absence streaks, daily class
+totals) are computed from them with integer bit operations and NumPy, so a
+class summary for a term is a single read of a few dozen bytes per student.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .caching import bump_students
+from .jalali import school_year, school_year_start, to_jalali
+from .models import Attendance, AttendanceBitmap
+from .pending import PendingIds
+from .scoring import schedule_refresh
+
+BITMAP_CHUNK_SIZE = 500
+
+
+def upsert_roster(marks, dates):
+    """Insert or update attendance for a whole roster on one or more dates.
+
+    ``marks`` maps student id -> present (bool). All rows are written in one
+    transaction with a single INSERT ... ON CONFLICT(student, date) DO UPDATE
+    per batch; the Jalali date is computed once per date.
+    Returns the number of rows written.
+    """
+    rows = []
+    for d in dates:
+        try:
+            date_j = to_jalali(d)
+        except Exception:
+            date_j = None
+        rows.extend(
+            Attendance(student_id=sid, date=d, date_jalali=date_j, present=present)
+            for sid, present in marks.items()
+        )
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['present', 'date_jalali'],
+        )
+        # bulk_create bypasses post_save, so refresh materialized scores here
+        schedule_refresh(marks.keys())
+        schedule_bitmap_refresh(marks.keys())
+        bump_students(marks.keys())
+    return len(rows)
+
+
+# --- bitmaps -------------------------------------------------------------
+
+def _to_int(data):
+    return int.from_bytes(bytes(data), 'little')
+
+
+def _to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def day_index(d):
+    """(term, bit index) of a date."""
+    term = school_year(d)
+    return term, (d - school_year_start(term)).days
+
+
+def refresh_bitmaps(student_ids):
+    """Rebuild the AttendanceBitmap rows of the given students from Attendance."""
+    student_ids = list(set(student_ids))
+    for start in range(0, len(student_ids), BITMAP_CHUNK_SIZE):
+        ids = student_ids[start:start + BITMAP_CHUNK_SIZE]
+        with transaction.atomic():
+            bits = {}
+            for sid, d, present in Attendance.objects.filter(student_id__in=ids).values_list('student_id', 'date', 'present'):
+                term, i = day_index(d)
+                row = bits.setdefault((sid, term), [0, 0])
+                row[0] |= 1 << i
+                if not present:
+                    row[1] |= 1 << i
+            AttendanceBitmap.objects.filter(student_id__in=ids).delete()
+            AttendanceBitmap.objects.bulk_create([
+                AttendanceBitmap(student_id=sid, term=term, recorded=_to_bytes(rec), absent=_to_bytes(ab))
+                for (sid, term), (rec, ab) in bits.items()
+            ])
+
+
+_pending = PendingIds(refresh_bitmaps, 'student_ids')
+
+
+def schedule_bitmap_refresh(student_ids):
+    """Rebuild the students' bitmaps once the current transaction commits."""
+    _pending.add(student_ids=student_ids)
+
+
+def longest_run(absent, recorded):
+    """Longest streak of absences on consecutive recorded days.
+
+    Days without a record (weekends, holidays) neither break nor extend a
+    streak: runs are taken over ``absent | ~recorded`` and only the absences
+    inside each run are counted.
+    """
+    x = absent | (~recorded & ((1 << recorded.bit_length()) - 1))
+    best = 0
+    while x:
+        low = x & -x
+        run = x & ~(x + low)  # the lowest run of set bits
+        best = max(best, (run & absent).bit_count())
+        x &= ~run
+    return best
+
+
+def summarize(recorded, absent):
+    """Counts for one student from int bitsets."""
+    days = recorded.bit_count()
+    absences = absent.bit_count()
+    return {
+        'days': days,
+        'present': days - absences,
+        'absent': absences,
+        'rate': round(100.0 * (days - absences) / days, 1) if days else None,
+        'longest_absence': longest_run(absent, recorded),
+    }
+
+
+def student_totals(student_ids):
+    """{student_id: summary over all terms}, from one read of the bitmaps.
+
+    ``student_ids`` may be a list or an id subquery.
+    """
+    totals = {}
+    for sid, rec, ab in AttendanceBitmap.objects.filter(student_id__in=student_ids).order_by(
+            'term').values_list('student_id', 'recorded', 'absent'):
+        row = summarize(_to_int(rec), _to_int(ab))
+        if sid in totals:
+            # streaks are not carried across school years
+            prev = totals[sid]
+            row = {
+                'days': prev['days'] + row['days'],
+                'present': prev['present'] + row['present'],
+                'absent': prev['absent'] + row['absent'],
+                'longest_absence': max(prev['longest_absence'], row['longest_absence']),
+            }
+            row['rate'] = round(100.0 * row['present'] / row['days'], 1) if row['days'] else None
+        totals[sid] = row
+    return totals
+
+
+def class_terms(school_class):
+    """School years with attendance in this class, newest first."""
+    return list(AttendanceBitmap.objects.filter(student__classroom=school_class)
+                .order_by('-term').values_list('term', flat=True).distinct())
+
+
+def class_term_summary(school_class, term):
+    """Per-student summaries and per-day presence totals of a class for one school year."""
+    students = list(school_class.students.order_by('roll_number', 'full_name').values_list('id', 'full_name'))
+    bitmaps = {sid: (bytes(rec), bytes(ab)) for sid, rec, ab in AttendanceBitmap.objects.filter(
+        student__classroom=school_class, term=term).values_list('student_id', 'recorded', 'absent')}
+
+    rows = []
+    for sid, full_name in students:
+        rec, ab = bitmaps.get(sid, (b'', b''))
+        rows.append(dict(summarize(_to_int(rec), _to_int(ab)), student_id=sid, full_name=full_name))
+
+    days = []
+    if bitmaps:
+        # one row of bits per student; column sums are the daily totals
+        width = max(len(rec) for rec, _ in bitmaps.values())
+        recorded = np.zeros((len(bitmaps), width), dtype=np.uint8)
+        absent = np.zeros((len(bitmaps), width), dtype=np.uint8)
+        for k, (rec, ab) in enumerate(bitmaps.values()):
+            recorded[k, :len(rec)] = np.frombuffer(rec, dtype=np.uint8)
+            absent[k, :len(ab)] = np.frombuffer(ab, dtype=np.uint8)
+        recorded_per_day = np.unpackbits(recorded, axis=1, bitorder='little').sum(axis=0)
+        absent_per_day = np.unpackbits(absent, axis=1, bitorder='little').sum(axis=0)
+        first_day = school_year_start(term)
+        for i in np.flatnonzero(recorded_per_day):
+            d = first_day + timedelta(days=int(i))
+            days.append({
+                'date': d,
+                'date_jalali': to_jalali(d),
+                'present': int(recorded_per_day[i] - absent_per_day[i]),
+                'absent': int(absent_per_day[i]),
+            })
+    return {'term': term, 'students': rows, 'days': days}
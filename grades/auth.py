@@ -0,0 +1,97 @@
+"""Student portal authentication.
+
+Students are not Django users, so this backend is called directly by the
+portal views rather than listed in AUTHENTICATION_BACKENDS. Lookups go through
+the unique index on ``national_id``; passwords are stored with Django's
+password hashers. Rows still holding a plaintext password (created before
+hashing, or by raw SQL) are accepted once and upgraded on the spot; the
+``hash_student_passwords`` command converts them all in one go.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.utils.crypto import constant_time_compare
+
+from .models import Student
+
+
+def is_hashed(value):
+    """True if ``value`` looks like an encoded password from a known hasher."""
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return False
+    return True
+
+
+def hash_passwords(raw_passwords, workers=None):
+    """make_password() for many values, in parallel threads.
+
+    The hashers spend their time in hashlib, which releases the GIL, so
+    threads give a near-linear speedup for bulk imports and migrations.
+    """
+    raw_passwords = list(raw_passwords)
+    if len(raw_passwords) < 2:
+        return [make_password(p) for p in raw_passwords]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(make_password, raw_passwords))
+
+
+class StudentBackend:
+    def authenticate(self, request, national_id=None, password=None):
+        """Return the Student for these credentials, or None."""
+        if not national_id or not password:
+            return None
+        student = (Student.objects.filter(national_id=national_id)
+                   .only('id', 'full_name', 'classroom_id', 'password').first())
+        if student is None or not student.password:
+            # run the hasher anyway so a missing national_id takes as long as a wrong password
+            make_password(password)
+            return None
+        if is_hashed(student.password):
+            def upgrade(raw):
+                # hasher settings changed since the password was stored
+                Student.objects.filter(pk=student.pk).update(password=make_password(raw))
+            return student if check_password(password, student.password, upgrade) else None
+        if constant_time_compare(password, student.password):
+            Student.objects.filter(pk=student.pk).update(password=make_password(password))
+            return student
+        return None
+
+    async def aauthenticate(self, request, national_id=None, password=None):
+        """Async authenticate() for the async portal views.
+
+        Hashing runs in worker threads outside the thread-sensitive ORM
+        executor, so concurrent logins hash in parallel instead of queueing
+        behind each other's queries.
+        """
+        if not national_id or not password:
+            return None
+        student = await (Student.objects.filter(national_id=national_id)
+                         .only('id', 'full_name', 'classroom_id', 'password').afirst())
+        if student is None or not student.password:
+            await _hash(password)
+            return None
+        if is_hashed(student.password):
+            ok, must_update = await sync_to_async(_verify, thread_sensitive=False)(password, student.password)
+            if not ok:
+                return None
+        elif not constant_time_compare(password, student.password):
+            return None
+        else:
+            must_update = True
+        if must_update:
+            await Student.objects.filter(pk=student.pk).aupdate(password=await _hash(password))
+        return student
+
+
+_hash = sync_to_async(make_password, thread_sensitive=False)
+
+
+def _verify(password, encoded):
+    """(matches, needs rehash) without writing anything."""
+    upgrade = []
+    ok = check_password(password, encoded, setter=upgrade.append)
+    return ok, bool(upgrade)
@@ -0,0 +1,76 @@
+"""Recompute ``date_jalali`` of dated rows (live and, optionally, history tables).
+
+Rows are read in keyset order and only those whose stored value differs are
+written, one ``bulk_update`` per batch, so a re-run after an interruption
+skips everything already fixed.
+"""
+from datetime import date
+
+from django.db import transaction
+
+from .caching import bump_students
+from .jalali import to_jalali
+from .models import Attendance, AttendanceHistory, GradebookEntry, GradebookEntryHistory
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_queryset(model, since=None, skip_existing=False):
+    qs = model.objects.order_by().exclude(date__isnull=True)
+    if since:
+        qs = qs.filter(date__gte=since)
+    if skip_existing:
+        qs = qs.filter(date_jalali__isnull=True) | qs.filter(date_jalali='')
+    return qs
+
+
+def backfill_model(model, qs, batch_size=BACKFILL_BATCH_SIZE, progress=None):
+    """Fix date_jalali for ``qs``; returns ``(rows checked, rows updated)``."""
+    total = qs.count()
+    done = updated = 0
+    last_id = 0
+    while True:
+        chunk = list(qs.filter(id__gt=last_id).order_by('id').values_list('id', 'date', 'date_jalali', 'student_id')[:batch_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        changed = []
+        students = set()
+        for pk, d, current, student_id in chunk:
+            # to_jalali is memoized, so each distinct date is converted once
+            date_j = to_jalali(d)
+            if date_j != current:
+                changed.append(model(id=pk, date_jalali=date_j))
+                students.add(student_id)
+        with transaction.atomic():
+            model.objects.bulk_update(changed, ['date_jalali'])
+            bump_students(students)
+        done += len(chunk)
+        updated += len(changed)
+        if progress:
+            progress(done, total)
+    return done, updated
+
+
+def backfill_jalali_dates(since=None, skip_existing=False, include_history=False,
+                          batch_size=BACKFILL_BATCH_SIZE, progress=None):
+    """Backfill every table as one job; ``since`` is a date or ISO string.
+
+    Returns ``{model name: rows updated}``.
+    """
+    if isinstance(since, str):
+        since = date.fromisoformat(since)
+    models = [Attendance, GradebookEntry]
+    if include_history:
+        models += [AttendanceHistory, GradebookEntryHistory]
+    querysets = [(model, backfill_queryset(model, since, skip_existing)) for model in models]
+    total = sum(qs.count() for _, qs in querysets)
+    result = {}
+    offset = 0
+    for model, qs in querysets:
+        def report(done, _total, offset=offset):
+            if progress:
+                progress(min(offset + done, total), total)
+        checked, result[model.__name__] = backfill_model(model, qs, batch_size, progress=report)
+        offset += checked
+    return result
@@ -0,0 +1,142 @@
+"""Versioned cache keys for per-student and per-class payloads.
+
+Every student and every class has a version token in the cache, and every
+class also has a roster token that changes whenever any of its students' data
+changes. Cached payloads include the tokens in their key, so changing a token
+makes all older payloads unreachable; nothing has to be deleted explicitly.
+Tokens are replaced by the model signals and by the bulk write paths (resets,
+roster upserts, imports) once the surrounding transaction commits, so a
+payload built from uncommitted data is never stored under a current version.
+
+Tokens replaced by one process (a worker, the scheduler, ``auto_reset``,
+another web worker) only reach the others through a shared cache backend,
+which is why the default is the database cache; the per-process locmem
+cache is refused wherever a second process is involved.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from .pending import PendingIds
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60 * 60)
+PER_PROCESS_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def require_shared_cache(who):
+    """Raise ImproperlyConfigured if the default cache is per process; ``who`` names the multi-process setup."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_BACKENDS:
+        raise ImproperlyConfigured(
+            f'{who} needs a cache shared between processes, but the default cache ({backend}) is per '
+            f'process: invalidations made in one process would never reach the others. Use the database '
+            f'cache, Redis or Memcached in CACHES.')
+
+
+def _student_key(student_id):
+    return f'grades:v:student:{student_id}'
+
+
+def _class_key(class_id):
+    return f'grades:v:class:{class_id}'
+
+
+def _roster_key(class_id):
+    return f'grades:v:roster:{class_id}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def versions(keys):
+    """Return {key: token} for version keys, creating missing ones."""
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # add() keeps a token another process created meanwhile
+            cache.add(key, _new_token(), timeout=None)
+            found[key] = cache.get(key) or _new_token()
+    return found
+
+
+async def aversions(keys):
+    """Async versions()."""
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, _new_token(), timeout=None)
+            found[key] = await cache.aget(key) or _new_token()
+    return found
+
+
+def class_version(class_id):
+    return versions([_class_key(class_id)])[_class_key(class_id)]
+
+
+def student_version(student_id, class_id):
+    """Combined version of a student and their class, for use in cache keys."""
+    keys = [_student_key(student_id), _class_key(class_id)]
+    found = versions(keys)
+    return '.'.join(found[k] for k in keys)
+
+
+async def astudent_version(student_id, class_id):
+    keys = [_student_key(student_id), _class_key(class_id)]
+    found = await aversions(keys)
+    return '.'.join(found[k] for k in keys)
+
+
+def roster_version(class_id):
+    """Version of everything shown on a class page (class + all its students)."""
+    keys = [_class_key(class_id), _roster_key(class_id)]
+    found = versions(keys)
+    return '.'.join(found[k] for k in keys)
+
+
+def _flush_pending(keys, student_ids):
+    from .models import Student
+
+    if student_ids:
+        keys.update(_student_key(sid) for sid in student_ids)
+        # one query per commit to find the class pages that show these students
+        class_ids = Student.objects.filter(id__in=student_ids).values_list('classroom_id', flat=True).distinct()
+        keys.update(_roster_key(cid) for cid in class_ids)
+    if keys:
+        cache.set_many({k: _new_token() for k in keys}, timeout=None)
+
+
+_pending = PendingIds(_flush_pending, 'keys', 'student_ids')
+
+
+def _schedule(keys=(), student_ids=()):
+    _pending.add(keys=keys, student_ids=student_ids)
+
+
+def bump_students(student_ids):
+    """Invalidate cached payloads of the given students (and their class pages) after commit."""
+    _schedule(student_ids=student_ids)
+
+
+def bump_roster(class_id):
+    """Invalidate the cached class page only, e.g. after a student left the class."""
+    _schedule(keys=[_roster_key(class_id)])
+
+
+def bump_class(class_id):
+    """Invalidate cached payloads of a class and all its students after commit."""
+    _schedule(keys=[_class_key(class_id)])
+
+
+def dashboard_key(student_id, class_id):
+    return f'grades:dashboard:{student_id}:{student_version(student_id, class_id)}'
+
+
+async def adashboard_key(student_id, class_id):
+    return f'grades:dashboard:{student_id}:{await astudent_version(student_id, class_id)}'
+
+
+def class_page_key(class_id):
+    return f'grades:class_page:{class_id}:{roster_version(class_id)}'
@@ -0,0 +1,486 @@
+"""Cold storage for old history rows in compressed, append-only segment files.
+
+``archive_history`` moves AttendanceHistory / GradebookEntryHistory rows
+older than a cutoff out of SQLite into ``HISTORY_ARCHIVE_DIR``: one segment
+per kind and school year (``attendance-1403.seg``) made of zlib-compressed
+blocks of JSON lines. Every block has a fixed-size record in the segment's
+index file (``attendance-1403.idx``) with its offset, row count and its id,
+archived_at and date ranges. Readers mmap the index and the segment and only
+decompress blocks whose ranges can match, so the history pages and exports
+read the live table and the segments together at the cost of a few blocks.
+
+Rows are stored denormalized (student name, national id, subject name), the
+same values the exports produce, so they stay readable after the student or
+subject is gone.
+
+Files are only appended to. A block is fsynced before its index record is
+written, and the DB rows are deleted only after that, so a crash leaves at
+most unreferenced bytes at the end of a segment (ignored by readers) or rows
+that are both archived and still in the table; every run carries a batch
+number and the next run deletes the rows of the last batch first.
+
+Until that delete, the history pages and exports skip archived rows whose
+id is still in the table, so no row is listed twice.
+
+The one exception is ``purge_students`` (deleting a class): segments holding
+rows of the deleted students are rewritten without them into ``.tmp`` files
+(index first), and replacing the index is the switch, so a crash part way is
+either rolled back or finished by the next writer. The switch holds an
+exclusive lock on ``.switch`` that readers take shared while they read an
+index and open its segment; they keep the open file, so a query started
+before a rewrite reads the old segment to the end.
+"""
+import heapq
+import json
+from contextlib import contextmanager
+import mmap
+import os
+import struct
+import zlib
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import cached_property
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import exports
+from .jalali import parse_date, school_year
+from .models import AttendanceHistory, GradebookEntry, GradebookEntryHistory, Student
+from .search import match_expression, student_q, text_matches
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows; run one archive_history at a time
+    fcntl = None
+
+HISTORY_ARCHIVE_DIR = getattr(settings, 'HISTORY_ARCHIVE_DIR', settings.BASE_DIR / 'history_archive')
+ARCHIVE_CHUNK_SIZE = 2000
+COMPRESSION_LEVEL = 6
+
+# what is stored per row: the export fields plus what the history pages show
+KINDS = {
+    'attendance': (AttendanceHistory, exports.ATTENDANCE_FIELDS + [
+        ('roll_number', 'student__roll_number'),
+    ]),
+    'gradebook': (GradebookEntryHistory, exports.GRADEBOOK_FIELDS + [
+        ('national_id', 'student__national_id'),
+        ('roll_number', 'student__roll_number'),
+    ]),
+}
+
+# offset, length, rows, min/max id, min/max archived_at (epoch microseconds),
+# min/max record date (ordinal, 0 = none), batch
+_INDEX = struct.Struct('<QIIqqqqiiI')
+
+# ``segment`` is the segment mapped together with its index (see ``blocks``)
+Block = namedtuple('Block', 'path offset length rows min_id max_id min_ts max_ts min_date max_date batch segment')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_ENTRY_TYPES = dict(GradebookEntry.ENTRY_TYPES)
+
+
+def _micros(dt):
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _segment_paths(kind, term):
+    return HISTORY_ARCHIVE_DIR / f'{kind}-{term}.seg', HISTORY_ARCHIVE_DIR / f'{kind}-{term}.idx'
+
+
+# --- reading -------------------------------------------------------------
+
+@contextmanager
+def _switch_lock(shared):
+    """Readers hold it shared, ``_rewrite`` exclusive while it swaps files."""
+    with open(HISTORY_ARCHIVE_DIR / '.switch', 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+
+
+def blocks(kind):
+    """Index records of every segment of ``kind``.
+
+    Each segment is mapped under the switch lock together with its index,
+    and ``read_block`` reads from that mapping, so a segment rewritten in
+    the meantime does not change what the records point to.
+    """
+    if not HISTORY_ARCHIVE_DIR.is_dir():
+        return []
+    result = []
+    with _switch_lock(shared=True):
+        for idx in sorted(HISTORY_ARCHIVE_DIR.glob(f'{kind}-*.idx')):
+            size = idx.stat().st_size
+            size -= size % _INDEX.size  # a torn last record is ignored
+            if not size:
+                continue
+            with open(idx, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                records = list(_INDEX.iter_unpack(mm[:size]))
+            seg = idx.with_suffix('.seg')
+            # a rewrite that crashed after its switch: the new segment is still the .tmp
+            path = _tmp(seg) if not _tmp(idx).exists() and _tmp(seg).exists() else seg
+            with open(path, 'rb') as f:
+                segment = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            result.extend(Block(seg, *rec, segment=segment) for rec in records)
+    return result
+
+
+def read_block(block):
+    """Row dicts of one block, in ascending id order."""
+    data = zlib.decompress(block.segment[block.offset:block.offset + block.length])
+    # not splitlines(): it would also split on separators inside notes
+    return [json.loads(line) for line in data.decode('utf-8').split('\n')]
+
+
+class ArchivedRow:
+    """A history row read back from a segment, usable in place of the model
+    instance in the history templates and in keyset pagination."""
+
+    def __init__(self, row):
+        self.__dict__.update(row)
+        self.date = date.fromisoformat(row['date']) if row['date'] else None
+        self.archived_at = datetime.fromisoformat(row['archived_at'])
+        self.student = SimpleNamespace(id=row['student_id'], full_name=row['student'],
+                                       roll_number=row['roll_number'], national_id=row['national_id'])
+        if 'subject' in row:
+            self.subject = SimpleNamespace(name=row['subject']) if row['subject'] else None
+
+    def get_entry_type_display(self):
+        return _ENTRY_TYPES.get(self.entry_type, self.entry_type)
+
+
+def _key(row):
+    return _micros(datetime.fromisoformat(row['archived_at'])), row['id']
+
+
+class ArchiveQuery:
+    """The archived rows of one kind, filtered like ``exports.*_history_queryset``.
+
+    Text search matches students found by the directory search (as on the
+    live table) and, for students deleted since, the stored name and
+    national id.
+    """
+
+    def __init__(self, kind, q='', present=None, entry_type=None, date_from=None, date_to=None):
+        self.kind = kind
+        self.present = (present == '1') if present in ['0', '1'] else None
+        self.entry_type = entry_type if entry_type in ['pos', 'neg', 'num'] else None
+        self.date_from = self._bound(date_from)
+        self.date_to = self._bound(date_to)
+        self.q = q if match_expression(q) else ''
+
+    @cached_property
+    def student_ids(self):
+        return set(Student.objects.filter(student_q(self.q, prefix='')).values_list('id', flat=True))
+
+    @cached_property
+    def live_ids(self):
+        """Ids of the last archive batch that are still in the table.
+
+        They are listed from the table until the batch's delete (or the next
+        ``reconcile``) removes them there.
+        """
+        all_blocks = blocks(self.kind)
+        if not all_blocks:
+            return set()
+        last = max(b.batch for b in all_blocks)
+        last_blocks = [b for b in all_blocks if b.batch == last]
+        model, _ = KINDS[self.kind]
+        return set(model.objects.filter(id__range=(min(b.min_id for b in last_blocks),
+                                                   max(b.max_id for b in last_blocks)))
+                   .values_list('id', flat=True))
+
+    @staticmethod
+    def _bound(value):
+        if value and isinstance(value, str):
+            try:
+                value = parse_date(value)
+            except Exception:
+                return None
+        return value or None
+
+    def matches(self, row):
+        if row['id'] in self.live_ids:
+            return False
+        if self.present is not None and row.get('present') != self.present:
+            return False
+        if self.entry_type and row.get('entry_type') != self.entry_type:
+            return False
+        if self.date_from or self.date_to:
+            if not row['date']:
+                return False
+            d = date.fromisoformat(row['date'])
+            if (self.date_from and d < self.date_from) or (self.date_to and d > self.date_to):
+                return False
+        if self.q and row['student_id'] not in self.student_ids:
+            # deleted or since-edited students: the directory search over the stored
+            # name and national ID, plus the subject filter of the live gradebook query
+            subject = row.get('subject') or ''
+            if not (text_matches(self.q, row['student'], row['national_id'])
+                    or self.q.casefold() in subject.casefold()):
+                return False
+        return True
+
+    def blocks(self):
+        """Index records that can hold matching rows."""
+        result = blocks(self.kind)
+        if self.date_from:
+            result = [b for b in result if b.max_date >= self.date_from.toordinal()]
+        if self.date_to:
+            result = [b for b in result if b.min_date and b.min_date <= self.date_to.toordinal()]
+        return result
+
+    def page(self, before=None, after=None, limit=100):
+        """Up to ``limit`` rows past a decoded (archived_at, id) cursor.
+
+        Newest first below ``before`` (or from the top), oldest first above
+        ``after``, like the live side of ``pagination.keyset_page``. Blocks
+        are visited best bound first and reading stops once no remaining
+        block can beat the rows already found.
+        """
+        newest_first = after is None
+        cursor = before or after
+        cursor = (_micros(cursor[0]), cursor[1]) if cursor else None
+        if newest_first:
+            candidates = [b for b in self.blocks() if not cursor or (b.min_ts, b.min_id) < cursor]
+            candidates.sort(key=lambda b: (b.max_ts, b.max_id), reverse=True)
+        else:
+            candidates = [b for b in self.blocks() if (b.max_ts, b.max_id) > cursor]
+            candidates.sort(key=lambda b: (b.min_ts, b.min_id))
+
+        found = []
+        for block in candidates:
+            if len(found) >= limit:
+                worst = found[-1][0]
+                if (newest_first and (block.max_ts, block.max_id) < worst
+                        or not newest_first and (block.min_ts, block.min_id) > worst):
+                    break
+            for row in read_block(block):
+                key = _key(row)
+                if cursor and (key >= cursor if newest_first else key <= cursor):
+                    continue
+                if self.matches(row):
+                    found.append((key, row))
+            found.sort(key=lambda item: item[0], reverse=newest_first)
+            del found[limit:]
+        return [ArchivedRow(row) for _, row in found]
+
+    def iter_rows(self, after_id=0):
+        """Matching row dicts in ascending id order, for the exports.
+
+        Blocks are opened in order of their smallest id and merged through a
+        heap, so memory is bounded by the blocks whose id ranges overlap.
+        """
+        pending = sorted((b for b in self.blocks() if b.max_id > (after_id or 0)), key=lambda b: b.min_id)
+        heap = []
+        i = 0
+        while i < len(pending) or heap:
+            while i < len(pending) and (not heap or pending[i].min_id <= heap[0][0]):
+                for row in read_block(pending[i]):
+                    if row['id'] > (after_id or 0) and self.matches(row):
+                        heapq.heappush(heap, (row['id'], row))
+                i += 1
+            if heap:
+                yield heapq.heappop(heap)[1]
+
+
+# --- writing -------------------------------------------------------------
+
+def _compress(rows):
+    return zlib.compress('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows).encode('utf-8'),
+                         COMPRESSION_LEVEL)
+
+
+def _record(rows, offset, length, batch):
+    stamps = [_micros(datetime.fromisoformat(row['archived_at'])) for row in rows]
+    dates = [date.fromisoformat(row['date']).toordinal() for row in rows if row['date']]
+    return _INDEX.pack(offset, length, len(rows), rows[0]['id'], rows[-1]['id'], min(stamps), max(stamps),
+                       min(dates, default=0), max(dates, default=0), batch)
+
+
+def _append(kind, term, rows, batch):
+    """Append one block and then its index record, each fsynced."""
+    seg, idx = _segment_paths(kind, term)
+    data = _compress(rows)
+    with open(seg, 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    record = _record(rows, offset, len(data), batch)
+    with open(idx, 'ab') as f:
+        torn = f.seek(0, os.SEEK_END) % _INDEX.size
+        if torn:
+            f.truncate(f.tell() - torn)
+        f.write(record)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def reconcile(kind):
+    """Delete table rows that the last archive batch already wrote to a segment."""
+    model, _ = KINDS[kind]
+    all_blocks = blocks(kind)
+    if not all_blocks:
+        return 0
+    last = max(b.batch for b in all_blocks)
+    deleted = 0
+    for block in all_blocks:
+        if block.batch != last or not model.objects.filter(id__range=(block.min_id, block.max_id)).exists():
+            continue
+        ids = [row['id'] for row in read_block(block)]
+        deleted += model.objects.filter(id__in=ids).delete()[0]
+    return deleted
+
+
+class _Lock:
+    """Exclusive lock on the archive directory for one writer."""
+
+    def __enter__(self):
+        HISTORY_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        self.file = open(HISTORY_ARCHIVE_DIR / '.lock', 'w')
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        _recover()
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+def archive(kind, cutoff, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """Move ``kind`` history rows archived before ``cutoff`` into the segments.
+
+    Returns the number of rows moved. ``progress(done, total)`` is called
+    after every chunk.
+    """
+    model, fields = KINDS[kind]
+    names = [name for name, _ in fields]
+    lookups = [lookup for _, lookup in fields]
+    with _Lock():
+        reconcile(kind)
+        batch = max((b.batch for b in blocks(kind)), default=0) + 1
+        qs = model.objects.filter(archived_at__lt=cutoff)
+        total = qs.count()
+        done = 0
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id).order_by('id').values_list(*lookups)[:chunk_size])
+            if not chunk:
+                break
+            terms = defaultdict(list)
+            for values in chunk:
+                row = dict(zip(names, values))
+                terms[school_year(row['date'] or timezone.localdate(row['archived_at']))].append(
+                    {name: _json_value(value) for name, value in row.items()})
+            for term, rows in sorted(terms.items()):
+                _append(kind, term, rows, batch)
+            with transaction.atomic():
+                model.objects.filter(id__in=[values[0] for values in chunk]).delete()
+            last_id = chunk[-1][0]
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    return done
+
+
+def _tmp(path):
+    return path.with_name(path.name + '.tmp')
+
+
+def _recover():
+    """Roll back or finish a segment rewrite interrupted by a crash."""
+    for idx_tmp in HISTORY_ARCHIVE_DIR.glob('*.idx.tmp'):
+        # crashed before the switch: the old files are intact
+        idx_tmp.unlink()
+        _tmp(idx_tmp.with_suffix('').with_suffix('.seg')).unlink(missing_ok=True)
+    for seg_tmp in HISTORY_ARCHIVE_DIR.glob('*.seg.tmp'):
+        # the new index is in place (the .idx.tmp is written first): finish the switch
+        with _switch_lock(shared=False):
+            os.replace(seg_tmp, seg_tmp.with_suffix(''))
+
+
+def _rewrite(seg, seg_blocks, student_ids):
+    """Rewrite one segment without the rows of ``student_ids``; returns rows dropped."""
+    kept = []
+    dropped = 0
+    for block in seg_blocks:
+        rows = read_block(block)
+        keep = [row for row in rows if row['student_id'] not in student_ids]
+        dropped += len(rows) - len(keep)
+        if keep:
+            kept.append((keep, block.batch))
+    if not dropped:
+        return 0
+    idx = seg.with_suffix('.idx')
+    records = []
+    chunks = []
+    offset = 0
+    for rows, batch in kept:
+        data = _compress(rows)
+        records.append(_record(rows, offset, len(data), batch))
+        chunks.append(data)
+        offset += len(data)
+    # the index first: a .seg.tmp without an .idx.tmp then always means a finished switch
+    for path, data in ((_tmp(idx), b''.join(records)), (_tmp(seg), b''.join(chunks))):
+        with open(path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    with _switch_lock(shared=False):
+        # the switch: from here on _recover() completes the rewrite instead of undoing it
+        os.replace(_tmp(idx), idx)
+        os.replace(_tmp(seg), seg)
+    return dropped
+
+
+def purge_students(student_ids):
+    """Remove every archived row of ``student_ids`` (their class is being deleted).
+
+    Only the segments that hold such rows are rewritten. Returns the number
+    of rows removed.
+    """
+    student_ids = set(student_ids)
+    if not student_ids:
+        return 0
+    removed = 0
+    with _Lock():
+        for kind in KINDS:
+            by_segment = defaultdict(list)
+            for block in blocks(kind):
+                by_segment[block.path].append(block)
+            for seg, seg_blocks in by_segment.items():
+                removed += _rewrite(seg, seg_blocks, student_ids)
+    return removed
+
+
+def clear(kind):
+    """Remove every segment of ``kind`` (used when the whole history is cleared)."""
+    with _Lock(), _switch_lock(shared=False):
+        for path in list(HISTORY_ARCHIVE_DIR.glob(f'{kind}-*.seg')) + list(HISTORY_ARCHIVE_DIR.glob(f'{kind}-*.idx')):
+            path.unlink()
+
+
+def stats(kind):
+    """{term: {'rows', 'blocks', 'bytes'}} of the segments of ``kind``."""
+    result = {}
+    for b in blocks(kind):
+        term = int(b.path.stem.rsplit('-', 1)[1])
+        entry = result.setdefault(term, {'rows': 0, 'blocks': 0, 'bytes': 0})
+        entry['rows'] += b.rows
+        entry['blocks'] += 1
+        entry['bytes'] += b.length
+    return result
@@ -0,0 +1,133 @@
+"""Chunked deletion of large row sets (clearing history, deleting a class).
+
+``QuerySet.delete()`` collects every related row in memory and deletes them
+all in one transaction, holding the SQLite write lock until it is done.
+Here each table is emptied bottom-up in bounded chunks: one ``DELETE ...
+WHERE id IN (SELECT id ... LIMIT n)`` per transaction, with a short pause
+between chunks so waiting requests get the write lock. The parents are
+deleted last through the ORM, by which time their cascades find nothing and
+only the signal handlers (caches, rankings) run.
+
+Every step is idempotent, so an interrupted deletion is finished by running
+it again.
+"""
+import time
+
+from django.db import connection, transaction
+
+from . import coldstore
+from .caching import bump_class, bump_students
+from .models import (
+    Attendance, AttendanceBitmap, AttendanceHistory, GradebookEntry, GradebookEntryHistory, Grade,
+    SchoolClass, Student, StudentAverage, StudentSubjectScore, Subject,
+)
+from .scoring import schedule_refresh
+
+DELETE_CHUNK_SIZE = 1000
+DELETE_PAUSE = 0.05  # seconds between chunks, for other writers
+
+
+def delete_chunk(qs, chunk_size=DELETE_CHUNK_SIZE):
+    """Delete up to ``chunk_size`` rows of ``qs`` (smallest pk first) in one
+    transaction, without loading them or sending signals. Returns the count."""
+    table = connection.ops.quote_name(qs.model._meta.db_table)
+    pk = connection.ops.quote_name(qs.model._meta.pk.column)
+    id_sql, id_params = qs.order_by('pk').values('pk')[:chunk_size].query.sql_with_params()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({id_sql})", id_params)
+        return cursor.rowcount
+
+
+def delete_all(qs, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """Delete every row of ``qs`` chunk by chunk; ``progress(deleted)`` after each chunk."""
+    deleted = 0
+    while True:
+        count = delete_chunk(qs, chunk_size)
+        if not count:
+            return deleted
+        deleted += count
+        if progress:
+            progress(deleted)
+        time.sleep(DELETE_PAUSE)
+
+
+class _Progress:
+    """Turns per-step counts into one ``progress(done, total)`` stream."""
+
+    def __init__(self, total, progress):
+        self.total, self.base, self.progress = total, 0, progress
+
+    def step(self, qs, chunk_size):
+        deleted = delete_all(qs, chunk_size, progress=self._report)
+        self.advance(deleted)
+        return deleted
+
+    def advance(self, count):
+        self.base += count
+        self._report(0)
+
+    def _report(self, deleted):
+        if self.progress:
+            self.progress(min(self.base + deleted, self.total), self.total)
+
+
+def clear_history(kind, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """Delete the whole attendance or gradebook history, archive segments included."""
+    model = AttendanceHistory if kind == 'attendance' else GradebookEntryHistory
+    qs = model.objects.all()
+    deleted = _Progress(qs.count(), progress).step(qs, chunk_size)
+    coldstore.clear(kind)
+    return deleted
+
+
+def delete_class(class_id, chunk_size=DELETE_CHUNK_SIZE, progress=None):
+    """Delete a class with its students, subjects and everything that hangs off them.
+
+    The students' archived history goes too: once their history rows are out
+    of the table, the segments holding their rows are rewritten without them.
+    Returns the number of rows deleted (not counting the final ORM deletes).
+    """
+    in_class = {'student__classroom_id': class_id}
+    of_subjects = {'subject__classroom_id': class_id}
+    steps = [
+        AttendanceHistory.objects.filter(**in_class),
+        GradebookEntryHistory.objects.filter(**in_class),
+        Attendance.objects.filter(**in_class),
+        AttendanceBitmap.objects.filter(**in_class),
+        GradebookEntry.objects.filter(**in_class),
+        GradebookEntry.objects.filter(**of_subjects).exclude(**in_class),
+        Grade.objects.filter(**in_class),
+        Grade.objects.filter(**of_subjects).exclude(**in_class),
+        StudentSubjectScore.objects.filter(**in_class),
+        StudentSubjectScore.objects.filter(**of_subjects).exclude(**in_class),
+        StudentAverage.objects.filter(**in_class),
+    ]
+    # students of other classes (moved away) with grades in this class's subjects
+    outside = set()
+    for model in (Grade, GradebookEntry):
+        outside.update(model.objects.filter(**of_subjects).exclude(**in_class).values_list('student_id', flat=True))
+    students = Student.objects.filter(classroom_id=class_id)
+    tracker = _Progress(sum(qs.count() for qs in steps) + students.count(), progress)
+    for qs in steps:
+        tracker.step(qs, chunk_size)
+    # after the history steps, so archive_history cannot move more of their rows in
+    coldstore.purge_students(students.values_list('id', flat=True))
+
+    # students through the ORM (signals update caches and rankings), a chunk at a time
+    while True:
+        with transaction.atomic():
+            ids = list(students.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            Student.objects.filter(id__in=ids).delete()
+        tracker.advance(len(ids))
+        time.sleep(DELETE_PAUSE)
+
+    with transaction.atomic():
+        # subjects are few; history rows of moved students keep a NULL subject
+        Subject.objects.filter(classroom_id=class_id).delete()
+        SchoolClass.objects.filter(id=class_id).delete()
+        bump_class(class_id)
+        schedule_refresh(outside)
+        bump_students(outside)
+    return tracker.base
@@ -5,9 +5,12 @@ from .models import SchoolClass, Student, Subject, Grade
 class ClassForm(forms.ModelForm):
     class Meta:
         model = SchoolClass
-        fields = ['name']
-        labels = {'name': 'نام کلاس'}
-        widgets = {'name': forms.TextInput(attrs={'class':'form-control','placeholder':'مثال: کلاس هشتم الف'})}
+        fields = ['name', 'grade_level']
+        labels = {'name': 'نام کلاس', 'grade_level': 'پایه'}
+        widgets = {
+            'name': forms.TextInput(attrs={'class':'form-control','placeholder':'مثال: کلاس هشتم الف'}),
+            'grade_level': forms.NumberInput(attrs={'class':'form-control','placeholder':'مثال: 8'}),
+        }
 
 class StudentForm(forms.ModelForm):
     class Meta:
@@ -42,6 +45,11 @@ class StudentEditForm(forms.ModelForm):
         fields = ['full_name', 'roll_number', 'national_id', 'password', 'phone1', 'phone2', 'phone3', 'email1', 'email2']
         labels = StudentForm.Meta.labels
         widgets = StudentForm.Meta.widgets
+        help_texts = {'password': 'برای تغییر ندادن رمز عبور، این فیلد را خالی بگذارید.'}
+
+    def clean_password(self):
+        # passwords are stored hashed and never shown; empty keeps the current one
+        return self.cleaned_data.get('password') or self.instance.password
 
 class SubjectForm(forms.ModelForm):
     class Meta:
@@ -73,8 +81,7 @@ class GradeForm(forms.Form):
 
 
 from .models import GradebookEntry, Subject, Student
-import jdatetime
-from datetime import date as _date
+from .jalali import parse_date
 
 
 class GradebookEntryForm(forms.ModelForm):
@@ -105,47 +112,48 @@ class GradebookEntryForm(forms.ModelForm):
         val = self.cleaned_data.get('date')
         if not val:
             return None
+        # ISO YYYY-MM-DD or Jalali YYYY/MM/DD
         try:
-            # ISO YYYY-MM-DD
-            if '-' in val:
-                parts = val.split('-')
-                y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
-                return _date(y, m, d)
-            # Jalali YYYY/MM/DD
-            if '/' in val:
-                parts = val.split('/')
-                jy, jm, jd = int(parts[0]), int(parts[1]), int(parts[2])
-                gd = jdatetime.date(jy, jm, jd).togregorian()
-                return _date(gd.year, gd.month, gd.day)
+            return parse_date(val)
         except Exception:
             raise forms.ValidationError('فرمت تاریخ معتبر نیست (مانند 1404/07/25 یا 2025-10-17).')
-        raise forms.ValidationError('فرمت تاریخ نامشخص است.')
 
 
 class AttendanceDateForm(forms.Form):
     """Simple form to pick a date for marking attendance."""
     # Accept Jalali date strings (e.g. 1404/07/25) or ISO YYYY-MM-DD; convert to Python date
     date = forms.CharField(label='تاریخ', widget=forms.TextInput(attrs={'class':'form-control persian-date','placeholder':'YYYY/MM/DD'}), required=True)
+    # Optional extra dates (comma separated) to record the same roster for several days at once
+    extra_dates = forms.CharField(label='تاریخ‌های دیگر', widget=forms.TextInput(attrs={'class':'form-control','placeholder':'1404/07/26, 1404/07/27'}), required=False)
 
     def clean_date(self):
         val = self.cleaned_data.get('date')
         if not val:
             raise forms.ValidationError('تاریخ معتبر نیست.')
-        # allow ISO format YYYY-MM-DD
         try:
-            if '-' in val:
-                parts = val.split('-')
-                y, m, d = int(parts[0]), int(parts[1]), int(parts[2])
-                return _date(y, m, d)
-            # allow Jalali format YYYY/MM/DD
-            if '/' in val:
-                parts = val.split('/')
-                jy, jm, jd = int(parts[0]), int(parts[1]), int(parts[2])
-                gd = jdatetime.date(jy, jm, jd).togregorian()
-                return _date(gd.year, gd.month, gd.day)
+            return parse_date(val)
         except Exception:
             raise forms.ValidationError('فرمت تاریخ معتبر نیست (مانند 1404/07/25 یا 2025-10-17).')
-        raise forms.ValidationError('فرمت تاریخ نامشخص است.')
+
+    def clean_extra_dates(self):
+        val = self.cleaned_data.get('extra_dates') or ''
+        dates = []
+        for part in val.replace('،', ',').split(','):
+            if not part.strip():
+                continue
+            try:
+                dates.append(parse_date(part))
+            except Exception:
+                raise forms.ValidationError(f'تاریخ «{part.strip()}» معتبر نیست.')
+        return dates
+
+    def dates(self):
+        """All selected dates (main date first), without duplicates."""
+        result = [self.cleaned_data['date']]
+        for d in self.cleaned_data.get('extra_dates') or []:
+            if d not in result:
+                result.append(d)
+        return result
 
 
 class StudentLoginForm(forms.Form):
@@ -164,4 +172,14 @@ class StudentLoginForm(forms.Form):
             'class': 'form-control',
             'placeholder': 'رمز عبور خود را وارد کنید'
         })
-    )
\ No newline at end of file
+    )
+
+class ImportForm(forms.Form):
+    """Upload a roster or grade sheet (CSV, or .xlsx when openpyxl is installed)."""
+    KIND_CHOICES = [
+        ('roster', 'لیست دانش‌آموزان'),
+        ('grades', 'نمرات'),
+    ]
+    kind = forms.ChoiceField(label='نوع فایل', choices=KIND_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    file = forms.FileField(label='فایل', widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}))
+    create_subjects = forms.BooleanField(label='ساخت درس‌های جدید', required=False)
@@ -0,0 +1,190 @@
+"""Bulk import of class rosters and grade sheets from CSV or Excel files.
+
+Every row is validated first with the same rules as the web forms
+(``StudentForm`` for rosters, ``GradeForm`` for grades). If any row fails,
+nothing is written and all errors are reported together; otherwise the rows
+are written with ``bulk_create``/``bulk_update`` in one transaction.
+"""
+import csv
+import io
+
+from django.db import transaction
+
+from .auth import hash_passwords, is_hashed
+from .caching import bump_class
+from .forms import StudentForm, GradeForm
+from .models import Student, Subject, Grade
+from .scoring import refresh_class_scores
+
+ROSTER_FIELDS = StudentForm.Meta.fields
+IMPORT_BATCH_SIZE = 500
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # list of (row number, message)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def read_table(fileobj, filename=''):
+    """Read a CSV or .xlsx file into a list of dicts keyed by header.
+
+    Persian column labels used by the forms (e.g. «نام و نام خانوادگی») are
+    accepted as aliases of the field names. Excel files need openpyxl.
+    """
+    if filename.lower().endswith('.xlsx'):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ValueError('برای خواندن فایل اکسل باید بسته openpyxl نصب باشد؛ از CSV استفاده کنید.')
+        wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+        raw = wb.active.iter_rows(values_only=True)
+        header = next(raw, None) or []
+        rows = ([('' if v is None else str(v)) for v in r] for r in raw)
+    else:
+        data = fileobj.read()
+        if isinstance(data, bytes):
+            data = data.decode('utf-8-sig')
+        reader = csv.reader(io.StringIO(data))
+        header = next(reader, None) or []
+        rows = reader
+
+    aliases = {label: name for name, label in StudentForm.Meta.labels.items()}
+    keys = [aliases.get(str(h or '').strip(), str(h or '').strip()) for h in header]
+    table = []
+    for values in rows:
+        if not any(str(v).strip() for v in values):
+            continue
+        table.append({k: str(v).strip() for k, v in zip(keys, values) if k})
+    return table
+
+
+def import_roster(school_class, rows):
+    """Create or update students of ``school_class``; matched by roll_number."""
+    result = ImportResult()
+    existing = {s.roll_number: s for s in Student.objects.filter(classroom=school_class)}
+    seen, seen_nids = set(), set()
+    to_create, to_update = [], []
+
+    for n, row in enumerate(rows, start=2):  # row 1 is the header
+        data = {f: row.get(f, '') for f in ROSTER_FIELDS}
+        roll = _int_or_none(data['roll_number'])
+        if roll is not None and roll in seen:
+            result.add_error(n, f'شماره دانش‌آموزی {roll} در فایل تکراری است.')
+            continue
+        seen.add(roll)
+        # the database constraint only sees rows already saved, not the rest of the file
+        nid = data['national_id']
+        if nid and nid in seen_nids:
+            result.add_error(n, f'کد ملی {nid} در فایل تکراری است.')
+            continue
+        seen_nids.add(nid)
+        form = StudentForm(data, instance=existing.get(roll))
+        if not form.is_valid():
+            for field, errs in form.errors.items():
+                result.add_error(n, f"{StudentForm.Meta.labels.get(field, field)}: {' '.join(errs)}")
+            continue
+        student = form.save(commit=False)
+        student.classroom = school_class
+        if student.pk and not data['password']:
+            # an empty password cell keeps the current password
+            student.password = form.initial.get('password')
+        (to_update if student.pk else to_create).append(student)
+
+    if not result.ok:
+        return result
+    # bulk writes skip Student.save(), so hash plaintext passwords here
+    plain = [s for s in to_create + to_update if s.password and not is_hashed(s.password)]
+    for student, encoded in zip(plain, hash_passwords(s.password for s in plain)):
+        student.password = encoded
+    with transaction.atomic():
+        Student.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+        Student.objects.bulk_update(to_update, [f for f in ROSTER_FIELDS if f != 'roll_number'],
+                                    batch_size=IMPORT_BATCH_SIZE)
+        bump_class(school_class.id)
+    result.created, result.updated = len(to_create), len(to_update)
+    return result
+
+
+def import_grades(school_class, rows, create_subjects=False):
+    """Create or update Grade rows from a sheet with one column per subject.
+
+    Students are matched by ``roll_number`` (or ``national_id`` when the sheet
+    has no roll numbers); every other column is a subject name.
+    """
+    result = ImportResult()
+    if not rows:
+        return result
+    columns = [c for c in rows[0] if c not in ('roll_number', 'national_id', 'full_name')]
+    subjects = {s.name: s for s in Subject.objects.filter(classroom=school_class)}
+    missing = [c for c in columns if c not in subjects]
+    if missing and not create_subjects:
+        result.add_error(1, 'درس‌های ناشناخته: ' + '، '.join(missing))
+        return result
+
+    students = list(Student.objects.filter(classroom=school_class))
+    by_roll = {s.roll_number: s for s in students}
+    by_nid = {s.national_id: s for s in students if s.national_id}
+
+    with transaction.atomic():
+        for name in missing:
+            subjects[name] = Subject.objects.create(classroom=school_class, name=name)
+        sheet_subjects = [subjects[c] for c in columns]
+        existing = {(g.student_id, g.subject_id): g
+                    for g in Grade.objects.filter(subject__classroom=school_class)}
+        to_create, to_update = [], []
+        seen = set()
+
+        for n, row in enumerate(rows, start=2):
+            student = by_roll.get(_int_or_none(row.get('roll_number'))) or by_nid.get(row.get('national_id'))
+            if student is None:
+                result.add_error(n, 'دانش‌آموز با این شماره/کد ملی در کلاس پیدا نشد.')
+                continue
+            # a second row would add a duplicate Grade or silently overwrite the first
+            if student.id in seen:
+                result.add_error(n, f'دانش‌آموز «{student.full_name}» در فایل تکراری است.')
+                continue
+            seen.add(student.id)
+            form = GradeForm({f'subject_{s.id}': row.get(s.name, '') for s in sheet_subjects},
+                             subjects=sheet_subjects)
+            if not form.is_valid():
+                for field, errs in form.errors.items():
+                    label = form.fields[field].label if field in form.fields else field
+                    result.add_error(n, f"{label}: {' '.join(errs)}")
+                continue
+            for subj in sheet_subjects:
+                val = form.cleaned_data.get(f'subject_{subj.id}')
+                if val is None:
+                    continue
+                grade = existing.get((student.id, subj.id))
+                if grade is None:
+                    to_create.append(Grade(student=student, subject=subj, score=val))
+                elif grade.score != val:
+                    grade.score = val
+                    to_update.append(grade)
+
+        if not result.ok:
+            transaction.set_rollback(True)
+            return result
+        Grade.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+        Grade.objects.bulk_update(to_update, ['score'], batch_size=IMPORT_BATCH_SIZE)
+        # bulk writes skip post_save, so refresh materialized scores once
+        refresh_class_scores(school_class)
+        bump_class(school_class.id)
+    result.created, result.updated = len(to_create), len(to_update)
+    return result
+
+
+def _int_or_none(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
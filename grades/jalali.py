@@ -0,0 +1,62 @@
+"""Shared, memoized Gregorian <-> Jalali conversion.
+
+All Jalali strings in the app use the ``YYYY/MM/DD`` format. Conversions go
+through bounded LRU caches, so rendering a long attendance table or saving a
+whole roster repeats the calendar math only once per distinct date.
+"""
+from datetime import date as _date
+from functools import lru_cache
+
+import jdatetime
+from django.conf import settings
+
+# number of distinct dates kept per direction (~11 years of days by default)
+CACHE_SIZE = getattr(settings, 'JALALI_CACHE_SIZE', 4096)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def to_jalali(d):
+    """Gregorian ``date`` -> Jalali string ``YYYY/MM/DD``."""
+    jd = jdatetime.date.fromgregorian(date=d)
+    return f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def to_gregorian(jy, jm, jd):
+    """Jalali year/month/day -> Gregorian ``date``."""
+    gd = jdatetime.date(jy, jm, jd).togregorian()
+    return _date(gd.year, gd.month, gd.day)
+
+
+def today_jalali():
+    return to_jalali(_date.today())
+
+
+def parse_date(val):
+    """Parse an ISO (YYYY-MM-DD) or Jalali (YYYY/MM/DD) string into a date.
+
+    Raises ValueError for anything else.
+    """
+    val = val.strip()
+    # ISO YYYY-MM-DD
+    if '-' in val:
+        parts = val.split('-')
+        return _date(int(parts[0]), int(parts[1]), int(parts[2]))
+    # Jalali YYYY/MM/DD
+    if '/' in val:
+        parts = val.split('/')
+        return to_gregorian(int(parts[0]), int(parts[1]), int(parts[2]))
+    raise ValueError(val)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def school_year(d):
+    """Jalali year in which the school year containing ``d`` started (1 Mehr)."""
+    j = to_jalali(d)
+    jy, jm = int(j[:4]), int(j[5:7])
+    return jy if jm >= 7 else jy - 1
+
+
+def school_year_start(year):
+    """Gregorian date of 1 Mehr of Jalali ``year``."""
+    return to_gregorian(year, 7, 1)
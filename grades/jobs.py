@@ -0,0 +1,196 @@
+"""Database-backed queue for operations too long to run inside a request.
+
+``enqueue(kind, label, **params)`` stores a pending Job; the view redirects to
+the job's status page, which polls the stored progress. ``run_workers`` runs
+the queue with a thread pool: a worker claims the oldest due job with a
+conditional UPDATE (so two workers never take the same job), runs it and
+records the outcome. A failed attempt goes back to the queue with an
+exponential delay until ``max_attempts``; a running job whose heartbeat
+stopped (its worker died) is put back as well. The heartbeat is refreshed by
+a thread of its own for as long as the handler runs, so a long step that
+reports no progress is not taken for a dead worker.
+
+Handlers are plain functions taking the job params and a ``progress(done,
+total)`` callback, registered by dotted path in ``JOB_HANDLERS`` so this
+module imports nothing heavy. They must be safe to re-run: every handler
+here continues with whatever an interrupted attempt left.
+
+With ``JOBS_IN_PROCESS`` (the default, for setups without ``run_workers``)
+a new job is also started right away in a daemon thread of the web process;
+it is claimed the same way, so a worker picking it up first is harmless. A
+failed attempt there is retried by a timer thread once its delay is over,
+and ``resume()`` (called by the status page) requeues and restarts a job
+left behind by a web process that was restarted.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOBS_IN_PROCESS = getattr(settings, 'JOBS_IN_PROCESS', True)
+JOB_MAX_ATTEMPTS = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+JOB_RETRY_DELAY = getattr(settings, 'JOB_RETRY_DELAY', 30)  # seconds, doubled per attempt
+JOB_STALE_AFTER = getattr(settings, 'JOB_STALE_AFTER', 600)  # seconds without a heartbeat
+JOB_HEARTBEAT_INTERVAL = getattr(settings, 'JOB_HEARTBEAT_INTERVAL', 60)  # seconds
+
+JOB_HANDLERS = {
+    'clear_history': 'grades.deletion.clear_history',
+    'delete_class': 'grades.deletion.delete_class',
+    'reset': 'grades.resets.reset',
+    'backfill_jalali_dates': 'grades.backfill.backfill_jalali_dates',
+    'report_cards': 'grades.reports.build_report_cards',
+}
+
+
+def worker_name(suffix=''):
+    return f'{socket.gethostname()}:{os.getpid()}{suffix}'
+
+
+def enqueue(kind, label, /, max_attempts=None, **params):
+    """Queue a job; with JOBS_IN_PROCESS it also starts once the transaction commits."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'unknown job kind: {kind}')
+    job = Job.objects.create(kind=kind, label=label, params=params,
+                             max_attempts=max_attempts or JOB_MAX_ATTEMPTS)
+    if JOBS_IN_PROCESS:
+        transaction.on_commit(lambda: _start(job.id))
+    return job
+
+
+_local = threading.local()
+
+
+def in_web_process():
+    """True inside a job that run_in_thread runs in the web process."""
+    return getattr(_local, 'in_web_process', False)
+
+
+def _start(job_id):
+    threading.Thread(target=run_in_thread, args=(job_id,), name=f'job-{job_id}', daemon=True).start()
+
+
+def run_in_thread(job_id):
+    _local.in_web_process = True
+    try:
+        job = claim(worker_name('/web'), job_id=job_id)
+        if job:
+            execute(job)
+            _retry_later(job_id)
+    finally:
+        _local.in_web_process = False
+        # the thread's own connection
+        connection.close()
+
+
+def _retry_later(job_id):
+    """Start the next attempt of a job that failed in-process once it is due."""
+    run_after = Job.objects.filter(id=job_id, status='pending').values_list('run_after', flat=True).first()
+    if run_after is None:
+        return
+    timer = threading.Timer((run_after - timezone.now()).total_seconds(), run_in_thread, args=(job_id,))
+    timer.name, timer.daemon = f'job-{job_id}-retry', True
+    timer.start()
+
+
+def resume(job):
+    """Without workers, pick up ``job`` again if nothing is running it.
+
+    Requeues stalled jobs first (their web process was restarted), then
+    starts ``job`` if it is due. Returns the job as now stored.
+    """
+    if not JOBS_IN_PROCESS or job.status not in ('pending', 'running'):
+        return job
+    requeue_stale()
+    job.refresh_from_db()
+    if job.status == 'pending' and job.run_after <= timezone.now():
+        _start(job.id)
+    return job
+
+
+def claim(worker, job_id=None):
+    """Mark the oldest due pending job (or ``job_id``) as running for ``worker``.
+
+    Returns the claimed Job, or None when there is nothing to do.
+    """
+    while True:
+        now = timezone.now()
+        qs = Job.objects.filter(status='pending', run_after__lte=now)
+        if job_id:
+            qs = qs.filter(id=job_id)
+        candidate = qs.order_by('run_after', 'id').values_list('id', flat=True).first()
+        if candidate is None:
+            return None
+        # only one claimer can move the row out of 'pending'
+        claimed = Job.objects.filter(id=candidate, status='pending').update(
+            status='running', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now, error='')
+        if claimed:
+            return Job.objects.get(id=candidate)
+
+
+def _heartbeat(job, stop):
+    """Refresh the heartbeat of this attempt of ``job`` until ``stop`` is set."""
+    try:
+        while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+            Job.objects.filter(id=job.id, status='running', worker=job.worker, attempts=job.attempts).update(
+                heartbeat_at=timezone.now())
+    finally:
+        # the thread's own connection
+        connection.close()
+
+
+def execute(job):
+    """Run a claimed job, recording progress and the outcome."""
+    def progress(done, total):
+        Job.objects.filter(id=job.id).update(done=done, total=total, heartbeat_at=timezone.now())
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job, stop), name=f'job-{job.id}-heartbeat', daemon=True)
+    beat.start()
+    try:
+        import_string(JOB_HANDLERS[job.kind])(progress=progress, **job.params)
+    except Exception as exc:
+        logger.exception('job %s (%s) attempt %s failed', job.id, job.kind, job.attempts)
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = timedelta(seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+            Job.objects.filter(id=job.id).update(status='pending', error=str(exc), run_after=now + delay)
+        else:
+            Job.objects.filter(id=job.id).update(status='failed', error=str(exc), finished_at=now)
+    else:
+        Job.objects.filter(id=job.id).update(status='done', finished_at=timezone.now())
+    finally:
+        stop.set()
+        beat.join()
+
+
+def requeue_stale():
+    """Put running jobs whose worker stopped sending heartbeats back in the queue.
+
+    Jobs out of attempts are marked failed instead. Returns the number of jobs touched.
+    """
+    cutoff = timezone.now() - timedelta(seconds=JOB_STALE_AFTER)
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error='worker stopped responding', finished_at=timezone.now())
+    requeued = stale.update(status='pending', run_after=timezone.now(), error='worker stopped responding')
+    return failed + requeued
+
+
+def retry(job):
+    """Queue a failed job again with a fresh set of attempts."""
+    Job.objects.filter(id=job.id, status='failed').update(
+        status='pending', attempts=0, run_after=timezone.now(), finished_at=None)
+    if JOBS_IN_PROCESS:
+        transaction.on_commit(lambda: _start(job.id))
@@ -0,0 +1,48 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from grades import coldstore
+from grades.jalali import parse_date
+
+
+class Command(BaseCommand):
+    help = 'Move history rows older than a cutoff from the database into compressed per-term archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['attendance', 'gradebook', 'all'], default='all', help='Which history to archive')
+        parser.add_argument('--older-than-days', type=int, default=365, help='Archive rows archived more than this many days ago')
+        parser.add_argument('--before', default=None, help='Archive rows archived before this date (ISO or Jalali); overrides --older-than-days')
+        parser.add_argument('--chunk-size', type=int, default=coldstore.ARCHIVE_CHUNK_SIZE, help='Rows moved per block')
+        parser.add_argument('--vacuum', action='store_true', help='Run VACUUM afterwards so the SQLite file shrinks')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        if options['before']:
+            try:
+                day = parse_date(options['before'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['before']}")
+            cutoff = timezone.make_aware(datetime.combine(day, time.min))
+        else:
+            if options['older_than_days'] < 0:
+                raise CommandError('--older-than-days must not be negative')
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+
+        kinds = ['attendance', 'gradebook'] if options['kind'] == 'all' else [options['kind']]
+        for kind in kinds:
+            count = coldstore.archive(kind, cutoff, options['chunk_size'], progress=self._progress(kind))
+            self.stdout.write(self.style.SUCCESS(f'{kind}: moved {count} rows archived before {cutoff} to {coldstore.HISTORY_ARCHIVE_DIR}'))
+            for term, entry in sorted(coldstore.stats(kind).items()):
+                self.stdout.write(f"  {term}: {entry['rows']} rows, {entry['blocks']} blocks, {entry['bytes']} bytes")
+
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+
+    def _progress(self, label):
+        def report(done, total):
+            self.stdout.write(f"  {label}: {done}/{total}")
+        return report
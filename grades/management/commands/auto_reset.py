@@ -1,56 +1,52 @@
-from django.core.management.base import BaseCommand
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from grades.models import Attendance, AttendanceHistory, GradebookEntry, GradebookEntryHistory
+from grades import jobs
+from grades.caching import require_shared_cache
+from grades.resets import ResetInProgress, RESET_CHUNK_SIZE, reset
 
 
 class Command(BaseCommand):
-    help = 'Archive attendance and gradebook entries and reset them (intended to run every 12 hours).'
+    help = ('Archive attendance and gradebook entries and reset them, one class at a time. '
+            'For periodic staggered resets use run_workers --schedule instead of cron.')
 
     def add_arguments(self, parser):
         parser.add_argument('--class-id', type=int, default=None, help='Limit reset to a single class id')
         parser.add_argument('--attendance-only', action='store_true', help='Only reset attendance')
         parser.add_argument('--gradebook-only', action='store_true', help='Only reset gradebook entries')
+        parser.add_argument('--chunk-size', type=int, default=RESET_CHUNK_SIZE, help='Rows moved per transaction')
+        parser.add_argument('--enqueue', action='store_true', help='Queue as a background job for run_workers instead of running now')
 
     def handle(self, *args, **options):
         class_id = options.get('class_id')
         attendance_only = options.get('attendance_only')
         gradebook_only = options.get('gradebook_only')
-
+        chunk_size = options.get('chunk_size')
+
+        if options.get('enqueue'):
+            job = jobs.enqueue('reset', 'ریست خودکار' + (f' کلاس {class_id}' if class_id else ''),
+                               class_id=class_id, attendance=not gradebook_only, gradebook=not attendance_only,
+                               chunk_size=chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.id}."))
+            return
+
+        try:
+            require_shared_cache('auto_reset')
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
         now = timezone.now()
-
-        if not gradebook_only:
-            qs = Attendance.objects.all()
-            if class_id:
-                qs = qs.filter(student__classroom_id=class_id)
-            items = list(qs)
-            AttendanceHistory.objects.bulk_create([
-                AttendanceHistory(
-                    student=i.student,
-                    date=i.date,
-                    date_jalali=i.date_jalali,
-                    present=i.present,
-                ) for i in items
-            ])
-            qs.delete()
-            self.stdout.write(self.style.SUCCESS(f"Attendance reset archived at {now} (count={len(items)})"))
-
-        if not attendance_only:
-            qs2 = GradebookEntry.objects.all()
-            if class_id:
-                qs2 = qs2.filter(student__classroom_id=class_id)
-            items2 = list(qs2)
-            GradebookEntryHistory.objects.bulk_create([
-                GradebookEntryHistory(
-                    student=i.student,
-                    subject=i.subject,
-                    entry_type=i.entry_type,
-                    value=i.value,
-                    date=i.date,
-                    date_jalali=i.date_jalali,
-                    notes=i.notes,
-                ) for i in items2
-            ])
-            qs2.delete()
-            self.stdout.write(self.style.SUCCESS(f"Gradebook reset archived at {now} (count={len(items2)})"))
-
-
+        try:
+            counts = reset(class_id, attendance=not gradebook_only, gradebook=not attendance_only,
+                           chunk_size=chunk_size, progress=self._progress('Reset'))
+        except ResetInProgress as exc:
+            raise CommandError(str(exc))
+
+        if 'attendance' in counts:
+            self.stdout.write(self.style.SUCCESS(f"Attendance reset archived at {now} (count={counts['attendance']})"))
+        if 'gradebook' in counts:
+            self.stdout.write(self.style.SUCCESS(f"Gradebook reset archived at {now} (count={counts['gradebook']})"))
+
+    def _progress(self, label):
+        def report(done, total):
+            self.stdout.write(f"  {label}: {done}/{total}")
+        return report
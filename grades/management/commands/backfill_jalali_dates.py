@@ -1,22 +1,53 @@
-from django.core.management.base import BaseCommand
-from grades.models import Attendance, GradebookEntry
+from django.core.management.base import BaseCommand, CommandError
+from grades import jobs
+from grades.backfill import BACKFILL_BATCH_SIZE, backfill_model, backfill_queryset
+from grades.jalali import parse_date
+from grades.models import Attendance, GradebookEntry, AttendanceHistory, GradebookEntryHistory
+
 
 class Command(BaseCommand):
     help = 'Backfill date_jalali for Attendance and GradebookEntry records'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help='Rows written per bulk_update')
+        parser.add_argument('--since', default=None, help='Only rows dated on/after this date (YYYY-MM-DD or Jalali YYYY/MM/DD)')
+        parser.add_argument('--skip-existing', action='store_true', help='Skip rows that already have date_jalali')
+        parser.add_argument('--include-history', action='store_true', help='Also backfill the history tables')
+        parser.add_argument('--enqueue', action='store_true', help='Queue as a background job for run_workers instead of running now')
+
     def handle(self, *args, **options):
-        a_qs = Attendance.objects.all()
-        g_qs = GradebookEntry.objects.all()
-        self.stdout.write(f'Processing {a_qs.count()} Attendance rows...')
-        a_count = 0
-        for a in a_qs:
-            a.save()
-            a_count += 1
-        self.stdout.write(self.style.SUCCESS(f'Updated {a_count} Attendance rows.'))
-
-        self.stdout.write(f'Processing {g_qs.count()} GradebookEntry rows...')
-        g_count = 0
-        for g in g_qs:
-            g.save()
-            g_count += 1
-        self.stdout.write(self.style.SUCCESS(f'Updated {g_count} GradebookEntry rows.'))
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        since = None
+        if options['since']:
+            try:
+                since = parse_date(options['since'])
+            except Exception:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+
+        if options['enqueue']:
+            job = jobs.enqueue('backfill_jalali_dates', 'بازسازی تاریخ‌های شمسی',
+                               since=since.isoformat() if since else None, skip_existing=options['skip_existing'],
+                               include_history=options['include_history'], batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Queued job {job.id}.'))
+            return
+
+        models = [Attendance, GradebookEntry]
+        if options['include_history']:
+            models += [AttendanceHistory, GradebookEntryHistory]
+
+        for model in models:
+            qs = backfill_queryset(model, since, options['skip_existing'])
+            self._backfill(model, qs, batch_size)
+
+    def _backfill(self, model, qs, batch_size):
+        name = model.__name__
+        self.stdout.write(f'Processing {qs.count()} {name} rows...')
+
+        def report(done, total):
+            self.stdout.write(f'  {name}: {done}/{total}', ending='\r')
+
+        checked, updated = backfill_model(model, qs, batch_size, progress=report)
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} of {checked} {name} rows.'))
@@ -0,0 +1,155 @@
+import contextlib
+import io
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from grades.models import SchoolClass, Student
+from grades.synthetic import SYNTHETIC_PASSWORD, generate
+
+# name -> generate() arguments
+SCALES = {
+    'small': dict(classes=2, students=30, subjects=8, entries=5, days=20),
+    'medium': dict(classes=5, students=40, subjects=12, entries=20, days=60),
+    'large': dict(classes=10, students=200, subjects=12, entries=40, days=120),
+}
+
+
+class Command(BaseCommand):
+    help = ('Time the hot paths (class_detail, student_dashboard, Student.average, SchoolClass.average, '
+            'mark_attendance POST, auto_reset) on synthetic data at several scales and print JSON results. '
+            'The cached pages are timed both served from the cache and with the cache cleared before every run. '
+            'Runs against a throwaway test database; the configured database is not touched.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='small,medium',
+                            help=f"Comma separated scale names ({', '.join(SCALES)})")
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per operation')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+        parser.add_argument('--output', default=None, help='Write JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        scales = [s.strip() for s in options['scales'].split(',') if s.strip()]
+        unknown = [s for s in scales if s not in SCALES]
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(unknown)}")
+        repeat = max(1, options['repeat'])
+
+        setup_test_environment()
+        # createcachetable notes on stdout that migration 0018 already made the table; stdout carries the JSON
+        with contextlib.redirect_stdout(io.StringIO()):
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = []
+            for scale in scales:
+                self.stderr.write(f"Benchmarking {scale} {SCALES[scale]} ...")
+                results.extend(self._run_scale(scale, repeat, options['seed']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'results': results,
+        }
+        out = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(out + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+        else:
+            self.stdout.write(out)
+
+    def _run_scale(self, scale, repeat, seed):
+        call_command('flush', interactive=False, verbosity=0)
+        params = SCALES[scale]
+        started = time.perf_counter()
+        generate(seed=seed, prefix=f'Bench {scale}', **params)
+        seed_ms = (time.perf_counter() - started) * 1000
+
+        user = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+        staff = Client()
+        staff.force_login(user)
+        sc = SchoolClass.objects.order_by('id').first()
+        student = Student.objects.filter(classroom=sc).order_by('roll_number')[params['students'] // 2]
+        pupil = Client()
+        response = pupil.post(reverse('grades:student_login'),
+                              {'national_id': student.national_id, 'password': SYNTHETIC_PASSWORD})
+        if response.status_code != 302:
+            raise CommandError(f"student login returned {response.status_code}")
+
+        attendance_post = {'date': timezone.localdate().isoformat()}
+        attendance_post.update({f'present_{sid}': 'on'
+                                for sid in sc.students.values_list('id', flat=True)})
+
+        def get(client, url):
+            def run():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {url} returned {response.status_code}")
+            return run
+
+        def post_attendance():
+            response = staff.post(reverse('grades:mark_attendance', args=[sc.id]), attendance_post)
+            if response.status_code != 302:
+                raise CommandError(f"mark_attendance returned {response.status_code}")
+
+        class_detail = get(staff, reverse('grades:class_detail', args=[sc.id]))
+        dashboard = get(pupil, reverse('grades:student_dashboard'))
+        operations = [
+            # the warm-up fills the page caches, so these time cache hits
+            ('class_detail', class_detail, repeat, True, None),
+            ('student_dashboard', dashboard, repeat, True, None),
+            # and these the full render, with the cache emptied (outside the timing) before each run
+            ('class_detail (cold cache)', class_detail, repeat, True, cache.clear),
+            ('student_dashboard (cold cache)', dashboard, repeat, True, cache.clear),
+            ('Student.average', student.average, repeat, True, None),
+            ('SchoolClass.average', sc.average, repeat, True, None),
+            ('mark_attendance POST', post_attendance, repeat, True, None),
+            # destructive: archives everything, so it runs once, cold and last
+            ('auto_reset', lambda: call_command('auto_reset', stdout=io.StringIO()), 1, False, cache.clear),
+        ]
+
+        base = {'scale': scale, 'params': params}
+        results = [dict(base, operation='seed_synthetic', runs=1, min_ms=round(seed_ms, 2),
+                        median_ms=round(seed_ms, 2), max_ms=round(seed_ms, 2), queries=None)]
+        for name, func, runs, warm_up, before_run in operations:
+            results.append(dict(base, operation=name, **self._time(func, runs, warm_up, before_run)))
+        return results
+
+    def _time(self, func, runs, warm_up=True, before_run=None):
+        if warm_up:
+            func()  # caches, lazy imports, first-query overhead
+        timings, queries = [], 0
+        for _ in range(runs):
+            if before_run:
+                before_run()
+            reset_queries()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(ctx.captured_queries)
+        return {
+            'runs': runs,
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': queries,
+        }
@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from grades import coldstore, exports
+
+
+class Command(BaseCommand):
+    help = ('Stream AttendanceHistory or GradebookEntryHistory, including rows in cold storage, '
+            'as CSV or JSONL (resumable with --after-id).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['attendance', 'gradebook'], help='Which history table to export')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='Output format')
+        parser.add_argument('--output', default=None, help='Output file (default: stdout); appended to when resuming')
+        parser.add_argument('--q', default='', help='Same text filter as the history pages')
+        parser.add_argument('--present', choices=['0', '1'], default=None, help='Attendance only: 1=present, 0=absent')
+        parser.add_argument('--entry-type', choices=['pos', 'neg', 'num'], default=None, help='Gradebook only: entry type')
+        parser.add_argument('--date-from', default=None, help='Only records dated on/after this date (ISO or Jalali)')
+        parser.add_argument('--date-to', default=None, help='Only records dated on/before this date (ISO or Jalali)')
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this history id')
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE, help='Rows fetched per query')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        fmt = options['format']
+        if kind == 'attendance':
+            qs = exports.attendance_history_queryset(options['q'], options['present'], options['date_from'], options['date_to'])
+            archived = coldstore.ArchiveQuery(kind, options['q'], present=options['present'],
+                                              date_from=options['date_from'], date_to=options['date_to'])
+            fields = exports.ATTENDANCE_FIELDS
+        else:
+            qs = exports.gradebook_history_queryset(options['q'], options['entry_type'], options['date_from'], options['date_to'])
+            archived = coldstore.ArchiveQuery(kind, options['q'], entry_type=options['entry_type'],
+                                              date_from=options['date_from'], date_to=options['date_to'])
+            fields = exports.GRADEBOOK_FIELDS
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        after_id = options['after_id']
+        count = 0
+        last_id = after_id
+
+        def rows():
+            nonlocal count, last_id
+            for row in exports.iter_rows(qs, fields, after_id=after_id, chunk_size=options['chunk_size'],
+                                         archived=archived):
+                count += 1
+                last_id = row['id']
+                yield row
+
+        lines = exports.render(rows(), fields, fmt)
+        if fmt == 'csv' and after_id:
+            # resuming: the header was written by the first run
+            next(lines)
+
+        out = open(options['output'], 'a' if after_id else 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in lines:
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(self.style.SUCCESS(f'Exported {count} {kind} history rows (last id={last_id}).'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from grades.auth import hash_passwords, is_hashed
+from grades.models import Student
+
+
+class Command(BaseCommand):
+    help = 'Hash student portal passwords still stored in plaintext (safe to re-run).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows hashed and written per transaction')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing threads (default: CPU count)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count plaintext passwords')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        qs = Student.objects.exclude(password__isnull=True).exclude(password='').order_by('id')
+        total = qs.count()
+        done = 0
+        hashed = 0
+        last_id = 0
+        while True:
+            chunk = list(qs.filter(id__gt=last_id).values_list('id', 'password')[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            plain = [(pk, pw) for pk, pw in chunk if not is_hashed(pw)]
+            if plain and not options['dry_run']:
+                encoded = hash_passwords([pw for _, pw in plain], workers=options['workers'])
+                with transaction.atomic():
+                    Student.objects.bulk_update(
+                        [Student(id=pk, password=enc) for (pk, _), enc in zip(plain, encoded)], ['password'])
+            hashed += len(plain)
+            done += len(chunk)
+            self.stdout.write(f'  {done}/{total}', ending='\r')
+        self.stdout.write('')
+        if options['dry_run']:
+            self.stdout.write(f'{hashed} of {total} passwords are stored in plaintext.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Hashed {hashed} of {total} passwords.'))
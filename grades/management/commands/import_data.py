@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from grades.models import SchoolClass
+from grades import imports
+
+
+class Command(BaseCommand):
+    help = 'Bulk import a class roster or grade sheet from a CSV/XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['roster', 'grades'], help='roster = students, grades = one column per subject')
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument('--class-id', type=int, default=None, help='Target class id')
+        parser.add_argument('--class-name', default=None, help='Target class name (created if missing)')
+        parser.add_argument('--create-subjects', action='store_true', help='Create subjects named in the grade sheet that do not exist')
+
+    def handle(self, *args, **options):
+        if options['class_id']:
+            try:
+                sc = SchoolClass.objects.get(id=options['class_id'])
+            except SchoolClass.DoesNotExist:
+                raise CommandError(f"Class {options['class_id']} does not exist")
+        elif options['class_name']:
+            sc, _ = SchoolClass.objects.get_or_create(name=options['class_name'])
+        else:
+            raise CommandError('Pass --class-id or --class-name')
+
+        path = options['path']
+        try:
+            with open(path, 'rb') as f:
+                rows = imports.read_table(f, path)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['kind'] == 'roster':
+            result = imports.import_roster(sc, rows)
+        else:
+            result = imports.import_grades(sc, rows, create_subjects=options['create_subjects'])
+
+        if not result.ok:
+            for row, message in result.errors:
+                self.stderr.write(f'row {row}: {message}')
+            raise CommandError(f'{len(result.errors)} errors, nothing was imported')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sc.name}: {result.created} created, {result.updated} updated from {len(rows)} rows.'))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from grades.models import SchoolClass, StudentAverage, StudentSubjectScore
+from grades import rankings
+from grades.scoring import class_scores, store_scores
+
+
+class Command(BaseCommand):
+    help = ('Verify the materialized StudentSubjectScore/StudentAverage tables against the live computation and repair drift '
+            '(also rebuilds the ranking buckets).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', type=int, default=None, help='Limit to a single class id')
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not repair')
+
+    def handle(self, *args, **options):
+        class_id = options.get('class_id')
+        check_only = options.get('check')
+
+        classes = SchoolClass.objects.all().order_by('id')
+        if class_id:
+            classes = classes.filter(id=class_id)
+
+        total_students = 0
+        total_drift = 0
+        for sc in classes:
+            live = class_scores(sc)
+            stored_avg = {
+                a.student_id: (a.average, a.absences)
+                for a in StudentAverage.objects.filter(student__classroom=sc)
+            }
+            stored_subj = {}
+            for sid, subj_id, score in StudentSubjectScore.objects.filter(
+                    student__classroom=sc).values_list('student_id', 'subject_id', 'score'):
+                stored_subj.setdefault(sid, {})[subj_id] = score
+
+            drifted = {}
+            for sid, row in live.items():
+                expected = {k: v for k, v in row['subjects'].items() if v is not None}
+                if stored_avg.get(sid) != (row['average'], row['absences']) or stored_subj.get(sid, {}) != expected:
+                    drifted[sid] = row
+            total_students += len(live)
+            total_drift += len(drifted)
+
+            if drifted:
+                self.stdout.write(self.style.WARNING(f"{sc.name}: {len(drifted)}/{len(live)} students out of date"))
+                if not check_only:
+                    store_scores(drifted)
+
+        if check_only:
+            self.stdout.write(f"Checked {total_students} students, {total_drift} out of date.")
+        else:
+            rankings.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Checked {total_students} students, repaired {total_drift}; rank buckets rebuilt."))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from grades.models import SchoolClass
+from grades import reports
+
+
+class Command(BaseCommand):
+    help = 'Generate report cards for one or more classes (default: the whole school) into a zip archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', type=int, action='append', default=[], help='Class id (repeatable; default: all classes)')
+        parser.add_argument('--format', choices=reports.FORMATS, default='html', help='html, or print for the A4 layout ready for PDF conversion')
+        parser.add_argument('--output', default='report_cards.zip', help='Zip archive to write')
+        parser.add_argument('--workers', type=int, default=None, help='Rendering processes (default: REPORT_CARD_WORKERS or CPU count)')
+        parser.add_argument('--batch-size', type=int, default=reports.REPORT_CARD_BATCH, help='Cards per worker task')
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        classes = SchoolClass.objects.order_by('name')
+        if options['class_id']:
+            classes = list(classes.filter(id__in=options['class_id']))
+            missing = set(options['class_id']) - {sc.id for sc in classes}
+            if missing:
+                raise CommandError(f"Class {', '.join(map(str, sorted(missing)))} does not exist")
+
+        start = time.perf_counter()
+        with open(options['output'], 'wb') as f:
+            count = reports.write_report_cards(classes, f, fmt=options['format'], workers=options['workers'],
+                                               batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} report cards to {options['output']} in {time.perf_counter() - start:.1f}s."))
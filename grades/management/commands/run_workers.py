@@ -0,0 +1,72 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from grades import jobs, scheduler
+from grades.caching import require_shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (resets, deletions, backfills) with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Jobs run at the same time')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between queue checks when idle')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty instead of waiting for new jobs')
+        parser.add_argument('--schedule', action='store_true', help='Also queue the staggered automatic class resets (see grades.scheduler)')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError('--threads must be positive')
+        try:
+            require_shared_cache('run_workers')
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        name = jobs.worker_name()
+        self.stdout.write(f'Worker {name} running {threads} thread(s); Ctrl+C finishes the running jobs and exits.')
+        count = 0
+        running = set()
+        next_tick = 0
+        with ThreadPoolExecutor(threads, thread_name_prefix='job') as pool:
+            while not self.stopping:
+                if options['schedule'] and time.monotonic() >= next_tick:
+                    for job in scheduler.tick():
+                        self.stdout.write(f'  scheduled job {job.id}: {job.label}')
+                    next_tick = time.monotonic() + 60
+                jobs.requeue_stale()
+                idle = False
+                while len(running) < threads:
+                    job = jobs.claim(name)
+                    if job is None:
+                        idle = True
+                        break
+                    self.stdout.write(f'  started job {job.id}: {job.label} (attempt {job.attempts})')
+                    running.add(pool.submit(self._execute, job))
+                    count += 1
+                finished = {f for f in running if f.done()}
+                for f in finished:
+                    f.result()
+                running -= finished
+                if options['once'] and idle and not running:
+                    break
+                if idle or len(running) >= threads:
+                    time.sleep(options['poll'])
+        self.stdout.write(self.style.SUCCESS(f'Worker {name} stopped after {count} job(s).'))
+
+    def _execute(self, job):
+        try:
+            jobs.execute(job)
+        finally:
+            # the pool thread's own connection
+            connection.close()
+
+    def _stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from grades.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic classes, students, grades, gradebook entries and attendance for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=3, help='Number of classes to create')
+        parser.add_argument('--students', type=int, default=30, help='Students per class')
+        parser.add_argument('--subjects', type=int, default=10, help='Subjects per class')
+        parser.add_argument('--entries', type=int, default=5, help='Gradebook entries per student')
+        parser.add_argument('--days', type=int, default=30, help='School days of attendance per student')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same data)')
+        parser.add_argument('--prefix', default='Synthetic', help='Class name prefix')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        classes = generate(
+            classes=options['classes'],
+            students=options['students'],
+            subjects=options['subjects'],
+            entries=options['entries'],
+            days=options['days'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+        )
+        elapsed = time.perf_counter() - started
+        students = len(classes) * options['students']
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(classes)} classes, {students} students, "
+            f"{students * options['days']} attendance rows and {students * options['entries']} gradebook entries "
+            f"in {elapsed:.1f}s"
+        ))
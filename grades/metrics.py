@@ -0,0 +1,189 @@
+"""Per-view performance metrics in Prometheus text format.
+
+``PerformanceMetricsMiddleware`` records, per resolved URL name (e.g.
+``grades:class_detail``), request latency, SQL query count, SQL time and
+response size into process-local histograms. ``metrics_view`` exposes them
+to staff users. A warning is logged when a request runs more SQL queries than
+``settings.METRICS_QUERY_BUDGET``, which is how N+1 regressions show up.
+"""
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SQL_TIME_BUCKETS = LATENCY_BUCKETS
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = [
+    # name, help, buckets
+    ('grades_request_duration_seconds', 'Request latency', LATENCY_BUCKETS),
+    ('grades_request_sql_queries', 'SQL queries per request', QUERY_BUCKETS),
+    ('grades_request_sql_duration_seconds', 'Time spent in SQL per request', SQL_TIME_BUCKETS),
+    ('grades_response_size_bytes', 'Response body size', SIZE_BUCKETS),
+]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    """Process-local histograms keyed by (metric, view)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def observe(self, view, latency, queries, sql_time, size, status):
+        values = [latency, queries, sql_time, size]
+        with self._lock:
+            key = (view, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for (name, _, buckets), value in zip(METRICS, values):
+                if value is None:
+                    continue
+                hist = self._histograms.get((name, view))
+                if hist is None:
+                    hist = self._histograms[(name, view)] = Histogram(buckets)
+                hist.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            lines.append('# HELP grades_requests_total Requests by view and status')
+            lines.append('# TYPE grades_requests_total counter')
+            for (view, status), n in sorted(self._requests.items()):
+                lines.append(f'grades_requests_total{{view="{view}",status="{status}"}} {n}')
+            for name, help_text, _ in METRICS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), hist in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {hist.count}')
+                    lines.append(f'{name}_sum{{view="{view}"}} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{view}"}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class _QueryCounter:
+    """Queries and SQL time of the current request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Set per request. A context variable follows the request into the threads
+# the async ORM runs queries in (asgiref copies the context), which a
+# per-request connection.execute_wrapper() in the event loop thread would miss.
+_current_counter = contextvars.ContextVar('grades_query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.duration += time.perf_counter() - start
+        counter.count += 1
+
+
+def _install_wrapper(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_wrapper)
+
+
+class PerformanceMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'METRICS_QUERY_BUDGET', 50)
+        for conn in connections.all(initialized_only=True):
+            _install_wrapper(conn)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = _QueryCounter()
+        token = _current_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_counter.reset(token)
+        self._record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        token = _current_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_counter.reset(token)
+        self._record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    def _record(self, request, response, latency, counter):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, latency, counter.count, counter.duration, size, response.status_code)
+
+        if self.query_budget and counter.count > self.query_budget:
+            logger.warning('%s ran %d SQL queries (budget %d, %.1f ms in SQL) for %s',
+                           view, counter.count, self.query_budget, counter.duration * 1000, request.path)
+
+
+def metrics_view(request):
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('forbidden')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
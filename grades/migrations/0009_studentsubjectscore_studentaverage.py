@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0008_student_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAverage',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_average', serialize=False, to='grades.student')),
+                ('average', models.FloatField(blank=True, null=True, verbose_name='معدل')),
+                ('absences', models.PositiveIntegerField(default=0, verbose_name='تعداد غیبت')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'معدل دانش\u200cآموز',
+                'verbose_name_plural': 'معدل دانش\u200cآموزان',
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentSubjectScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='نمره مؤثر')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_scores', to='grades.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_scores', to='grades.subject')),
+            ],
+            options={
+                'verbose_name': 'نمره مؤثر',
+                'verbose_name_plural': 'نمرات مؤثر',
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0009_studentsubjectscore_studentaverage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancehistory',
+            index=models.Index(fields=['-archived_at', '-id'], name='att_hist_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancehistory',
+            index=models.Index(fields=['present', '-archived_at', '-id'], name='att_hist_present_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancehistory',
+            index=models.Index(fields=['date'], name='att_hist_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancehistory',
+            index=models.Index(fields=['student', '-archived_at', '-id'], name='att_hist_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gradebookentryhistory',
+            index=models.Index(fields=['-archived_at', '-id'], name='gb_hist_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gradebookentryhistory',
+            index=models.Index(fields=['entry_type', '-archived_at', '-id'], name='gb_hist_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gradebookentryhistory',
+            index=models.Index(fields=['date'], name='gb_hist_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gradebookentryhistory',
+            index=models.Index(fields=['student', '-archived_at', '-id'], name='gb_hist_student_idx'),
+        ),
+    ]
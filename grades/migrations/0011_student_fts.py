@@ -0,0 +1,64 @@
+# FTS5 index mirroring Student for the directory search (SQLite only).
+
+from django.db import migrations
+
+DOC = """
+    new.full_name,
+    coalesce(new.national_id, ''),
+    trim(coalesce(new.phone1, '') || ' ' || coalesce(new.phone2, '') || ' ' || coalesce(new.phone3, '')),
+    trim(coalesce(new.email1, '') || ' ' || coalesce(new.email2, '')),
+    coalesce((SELECT name FROM grades_schoolclass WHERE id = new.classroom_id), '')
+"""
+
+CREATE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS grades_student_fts USING fts5(
+        full_name, national_id, phones, emails, classroom,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS grades_student_fts_ai AFTER INSERT ON grades_student BEGIN
+        INSERT INTO grades_student_fts(rowid, full_name, national_id, phones, emails, classroom)
+        VALUES (new.id, {DOC});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS grades_student_fts_au AFTER UPDATE ON grades_student BEGIN
+        DELETE FROM grades_student_fts WHERE rowid = old.id;
+        INSERT INTO grades_student_fts(rowid, full_name, national_id, phones, emails, classroom)
+        VALUES (new.id, {DOC});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS grades_student_fts_ad AFTER DELETE ON grades_student BEGIN
+        DELETE FROM grades_student_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS grades_schoolclass_fts_au AFTER UPDATE OF name ON grades_schoolclass BEGIN
+        UPDATE grades_student_fts SET classroom = new.name
+        WHERE rowid IN (SELECT id FROM grades_student WHERE classroom_id = new.id);
+    END""",
+    f"""INSERT INTO grades_student_fts(rowid, full_name, national_id, phones, emails, classroom)
+        SELECT new.id, {DOC} FROM grades_student AS new""",
+]
+
+DROP = [
+    "DROP TRIGGER IF EXISTS grades_schoolclass_fts_au",
+    "DROP TRIGGER IF EXISTS grades_student_fts_ad",
+    "DROP TRIGGER IF EXISTS grades_student_fts_au",
+    "DROP TRIGGER IF EXISTS grades_student_fts_ai",
+    "DROP TABLE IF EXISTS grades_student_fts",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0010_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE), _run(DROP)),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicates(apps, schema_editor):
+    # fail with a readable message instead of a bare IntegrityError
+    Student = apps.get_model('grades', 'Student')
+    dupes = list(Student.objects.exclude(national_id__isnull=True).values('national_id')
+                 .annotate(n=Count('id')).filter(n__gt=1).values_list('national_id', flat=True)[:20])
+    if dupes:
+        raise RuntimeError('Duplicate national_id values must be fixed before migrating: ' + ', '.join(dupes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0011_student_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='student',
+            constraint=models.UniqueConstraint(condition=models.Q(('national_id__isnull', False)), fields=('national_id',), name='student_national_id_uniq', violation_error_message='دانش‌آموزی با این کد ملی قبلاً ثبت شده است.'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0012_student_national_id_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRank',
+            fields=[
+                ('student_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('classroom_id', models.BigIntegerField(db_index=True)),
+                ('grade_level', models.PositiveSmallIntegerField(null=True)),
+                ('bucket', models.PositiveSmallIntegerField(null=True)),
+                ('reset_class_rank', models.PositiveIntegerField(null=True)),
+                ('reset_level_rank', models.PositiveIntegerField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='grade_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='پایه'),
+        ),
+        migrations.CreateModel(
+            name='ScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'bucket')},
+            },
+        ),
+    ]
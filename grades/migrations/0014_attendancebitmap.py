@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_bitmaps(apps, schema_editor):
+    from grades.jalali import school_year, school_year_start
+
+    Attendance = apps.get_model('grades', 'Attendance')
+    AttendanceBitmap = apps.get_model('grades', 'AttendanceBitmap')
+    bits = {}
+    for sid, d, present in Attendance.objects.values_list('student_id', 'date', 'present').iterator(chunk_size=5000):
+        term = school_year(d)
+        i = (d - school_year_start(term)).days
+        row = bits.setdefault((sid, term), [0, 0])
+        row[0] |= 1 << i
+        if not present:
+            row[1] |= 1 << i
+    AttendanceBitmap.objects.bulk_create([
+        AttendanceBitmap(student_id=sid, term=term,
+                         recorded=rec.to_bytes((rec.bit_length() + 7) // 8, 'little'),
+                         absent=ab.to_bytes((ab.bit_length() + 7) // 8, 'little'))
+        for (sid, term), (rec, ab) in bits.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0013_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.PositiveSmallIntegerField(verbose_name='سال تحصیلی')),
+                ('recorded', models.BinaryField()),
+                ('absent', models.BinaryField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='grades.student')),
+            ],
+            options={
+                'unique_together': {('student', 'term')},
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0016_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResetSchedule',
+            fields=[
+                ('classroom', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reset_schedule', serialize=False, to='grades.schoolclass')),
+                ('tracked_since', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True, verbose_name='آخرین ریست موفق')),
+                ('running_since', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'زمان\u200cبندی ریست',
+                'verbose_name_plural': 'زمان\u200cبندی ریست',
+            },
+        ),
+    ]
@@ -1,10 +1,37 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator, EmailValidator
 from django.core.exceptions import ValidationError
-import jdatetime
+from django.contrib.auth.hashers import make_password
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from .jalali import to_jalali
+
+class SchoolClassQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Annotate subject_count, student_count and average_grade.
+
+        Each statistic is a correlated subquery, so the whole list is fetched in
+        one round trip without the row fan-out of joining subjects and students.
+        """
+        subject_count = Subject.objects.filter(classroom=models.OuterRef('pk')).values(
+            'classroom').annotate(n=models.Count('id')).values('n')
+        student_count = Student.objects.filter(classroom=models.OuterRef('pk')).order_by().values(
+            'classroom').annotate(n=models.Count('id')).values('n')
+        average_grade = Grade.objects.filter(subject__classroom=models.OuterRef('pk')).values(
+            'subject__classroom').annotate(a=models.Avg('score')).values('a')
+        return self.annotate(
+            subject_count=Coalesce(models.Subquery(subject_count), 0),
+            student_count=Coalesce(models.Subquery(student_count), 0),
+            average_grade=Round(models.Subquery(average_grade, output_field=models.FloatField()), 2),
+        )
+
 
 class SchoolClass(models.Model):
     name = models.CharField("نام کلاس", max_length=150, unique=True)
+    # classes of the same grade level share a leaderboard (see grades.rankings)
+    grade_level = models.PositiveSmallIntegerField("پایه", null=True, blank=True)
+
+    objects = SchoolClassQuerySet.as_manager()
 
     class Meta:
         verbose_name = "کلاس"
@@ -15,11 +42,13 @@ class SchoolClass(models.Model):
 
     def average(self):
         # compute average across all grades in this class
-        grades = Grade.objects.filter(subject__classroom=self)
-        if not grades.exists():
+        if hasattr(self, 'average_grade'):
+            # already annotated by SchoolClass.objects.with_stats()
+            return self.average_grade
+        avg = Grade.objects.filter(subject__classroom=self).aggregate(a=models.Avg('score'))['a']
+        if avg is None:
             return None
-        total = sum([float(g.score) for g in grades])
-        return round(total / grades.count(), 2)
+        return round(float(avg), 2)
 
 
 class Subject(models.Model):
@@ -46,7 +75,7 @@ class Student(models.Model):
     national_id = models.CharField("کد ملی", max_length=20, null=True, blank=False, validators=[
         RegexValidator(regex=r"^\d{8,20}$", message="کد ملی باید فقط شامل ارقام باشد (۸ تا ۲۰ رقم).")
     ])
-    # Student password for login
+    # Student password for login, stored hashed (see grades.auth)
     password = models.CharField("رمز عبور", max_length=128, blank=True, null=True, help_text="رمز عبور برای ورود دانش‌آموز به سیستم")
     # Up to 3 phone numbers (optional)
     phone1 = models.CharField("شماره تلفن ۱", max_length=20, blank=True, null=True, validators=[
@@ -67,68 +96,35 @@ class Student(models.Model):
         verbose_name_plural = "دانش‌آموزان"
         unique_together = ('classroom', 'roll_number')
         ordering = ['roll_number', 'full_name']
+        constraints = [
+            # unique index used by the portal login; a partial index is created
+            # in place on SQLite (unique=True would rebuild the table)
+            models.UniqueConstraint(fields=['national_id'], condition=models.Q(national_id__isnull=False),
+                                    name='student_national_id_uniq',
+                                    violation_error_message='دانش‌آموزی با این کد ملی قبلاً ثبت شده است.'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.roll_number})"
 
     def clean(self):
         # Ensure at least one of phone or email can be blank, but all formats are validated via field validators
-        # Additional simple safeguard: prevent duplicate national_id (field-level unique already enforces at DB)
+        # Additional simple safeguard: duplicate national_id is rejected by the student_national_id_uniq constraint
         return super().clean()
 
-    def average(self):
-        # For each subject, compute effective score taking into account gradebook entries
-        subjects = self.classroom.subjects.all()
-        scores = []
-        for subj in subjects:
-            # base grade if exists
-            try:
-                g = self.grades.get(subject=subj)
-                base = float(g.score)
-            except Grade.DoesNotExist:
-                base = None
-
-            # apply gradebook entries for this student+subject (ordered oldest->newest)
-            entries = list(self.gradebook_entries.filter(subject=subj).order_by('created_at'))
-            # if there's any 'num' entry, take the latest as override
-            num_entries = [e for e in entries if e.entry_type == 'num' and e.value is not None]
-            if num_entries:
-                effective = float(num_entries[-1].value)
-            else:
-                effective = base
-
-            # apply pos/neg adjustments (sum) to effective
-            adjustments = 0.0
-            for e in entries:
-                if e.value is None:
-                    continue
-                if e.entry_type == 'pos':
-                    adjustments += abs(float(e.value))
-                elif e.entry_type == 'neg':
-                    adjustments -= abs(float(e.value))
-
-            if effective is not None:
-                effective = effective + adjustments
-
-            if effective is not None:
-                scores.append(effective)
-
-        if not scores:
-            return None
-
-        avg = float(sum(scores)) / len(scores)
-
-        # apply absences penalty using the related manager (attendances)
-        ABSENCE_PENALTY = 0.2  # each absence reduces average by 0.2 by default
-        try:
-            abs_count = self.attendances.filter(present=False).count()
-        except Exception:
-            # fall back if Attendance model/table isn't available
-            abs_count = 0
+    def save(self, *args, **kwargs):
+        # never store a plaintext password; values that are already hashed are kept
+        from .auth import is_hashed
+        if self.password and not is_hashed(self.password):
+            self.password = make_password(self.password)
+        return super().save(*args, **kwargs)
 
-        adjusted = avg - (abs_count * ABSENCE_PENALTY)
-        adjusted = max(0.0, min(20.0, adjusted))
-        return round(adjusted, 2)
+    def average(self):
+        # Effective score per subject (latest 'num' override plus pos/neg
+        # adjustments), averaged and reduced by the absence penalty.
+        # The computation lives in grades.scoring so class pages can run it set-based.
+        from .scoring import student_scores
+        return student_scores(self)['average']
 
 
 class Grade(models.Model):
@@ -187,8 +183,7 @@ class GradebookEntry(models.Model):
         try:
             if self.date:
                 # convert Gregorian date to Jalali string YYYY/MM/DD
-                jd = jdatetime.date.fromgregorian(date=self.date)
-                self.date_jalali = f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+                self.date_jalali = to_jalali(self.date)
             else:
                 self.date_jalali = None
         except Exception:
@@ -215,8 +210,7 @@ class Attendance(models.Model):
     def save(self, *args, **kwargs):
         try:
             if self.date:
-                jd = jdatetime.date.fromgregorian(date=self.date)
-                self.date_jalali = f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+                self.date_jalali = to_jalali(self.date)
             else:
                 self.date_jalali = None
         except Exception:
@@ -224,6 +218,24 @@ class Attendance(models.Model):
         return super().save(*args, **kwargs)
 
 
+class AttendanceBitmap(models.Model):
+    """Attendance of one student in one school year as two bitsets.
+
+    Bit ``i`` stands for the ``i``-th day after 1 Mehr of ``term``: set in
+    ``recorded`` when an Attendance row exists for that day and in ``absent``
+    when the student was absent. Derived from Attendance and rebuilt whenever
+    it changes (see grades.attendance).
+    """
+    student = models.ForeignKey(Student, related_name='attendance_bitmaps', on_delete=models.CASCADE)
+    # Jalali year in which the school year starts
+    term = models.PositiveSmallIntegerField('سال تحصیلی')
+    recorded = models.BinaryField()
+    absent = models.BinaryField()
+
+    class Meta:
+        unique_together = ('student', 'term')
+
+
 class AttendanceHistory(models.Model):
     """Historical snapshots of Attendance at reset times."""
     student = models.ForeignKey(Student, related_name='attendance_history', on_delete=models.CASCADE)
@@ -236,6 +248,13 @@ class AttendanceHistory(models.Model):
         verbose_name = 'تاریخچه حضور/غیاب'
         verbose_name_plural = 'تاریخچه حضور/غیاب'
         ordering = ['-archived_at', '-date']
+        # keyset pagination on (archived_at, id), alone or after the filters
+        indexes = [
+            models.Index(fields=['-archived_at', '-id'], name='att_hist_archived_idx'),
+            models.Index(fields=['present', '-archived_at', '-id'], name='att_hist_present_idx'),
+            models.Index(fields=['date'], name='att_hist_date_idx'),
+            models.Index(fields=['student', '-archived_at', '-id'], name='att_hist_student_idx'),
+        ]
 
 
 class GradebookEntryHistory(models.Model):
@@ -252,4 +271,131 @@ class GradebookEntryHistory(models.Model):
     class Meta:
         verbose_name = 'تاریخچه دفتر نمره'
         verbose_name_plural = 'تاریخچه دفتر نمره'
-        ordering = ['-archived_at', '-date']
\ No newline at end of file
+        ordering = ['-archived_at', '-date']
+        indexes = [
+            models.Index(fields=['-archived_at', '-id'], name='gb_hist_archived_idx'),
+            models.Index(fields=['entry_type', '-archived_at', '-id'], name='gb_hist_type_idx'),
+            models.Index(fields=['date'], name='gb_hist_date_idx'),
+            models.Index(fields=['student', '-archived_at', '-id'], name='gb_hist_student_idx'),
+        ]
+
+class StudentSubjectScore(models.Model):
+    """Materialized effective score of a student in one subject.
+
+    Kept in sync by grades.signals; see grades.scoring.refresh_student_scores.
+    """
+    student = models.ForeignKey(Student, related_name='subject_scores', on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, related_name='student_scores', on_delete=models.CASCADE)
+    score = models.FloatField('نمره مؤثر')
+
+    class Meta:
+        verbose_name = 'نمره مؤثر'
+        verbose_name_plural = 'نمرات مؤثر'
+        unique_together = ('student', 'subject')
+
+
+class StudentAverage(models.Model):
+    """Materialized result of Student.average() for one student."""
+    student = models.OneToOneField(Student, related_name='score_average', on_delete=models.CASCADE, primary_key=True)
+    average = models.FloatField('معدل', null=True, blank=True)
+    absences = models.PositiveIntegerField('تعداد غیبت', default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'معدل دانش‌آموز'
+        verbose_name_plural = 'معدل دانش‌آموزان'
+
+
+class ScoreBucket(models.Model):
+    """Number of students of a class or grade level with a given average.
+
+    ``scope`` is ``class:<id>`` or ``level:<n>``; ``bucket`` is the average in
+    hundredths (0..2000). Maintained by grades.rankings.
+    """
+    scope = models.CharField(max_length=32)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'bucket')
+
+
+class StudentRank(models.Model):
+    """What one student currently contributes to the ScoreBucket counts.
+
+    ``student_id`` is a plain column rather than a foreign key, so the row
+    outlives a deleted student until its buckets have been decremented. The
+    ``reset_*`` ranks are snapshots taken before the last reset.
+    """
+    student_id = models.BigIntegerField(primary_key=True)
+    classroom_id = models.BigIntegerField(db_index=True)
+    grade_level = models.PositiveSmallIntegerField(null=True)
+    bucket = models.PositiveSmallIntegerField(null=True)
+    reset_class_rank = models.PositiveIntegerField(null=True)
+    reset_level_rank = models.PositiveIntegerField(null=True)
+
+
+class Job(models.Model):
+    """A long-running operation run outside the request (see grades.jobs).
+
+    ``kind`` names the handler in ``jobs.JOB_HANDLERS`` and ``params`` its
+    keyword arguments; ``done``/``total`` are the progress it reports. A
+    failed attempt puts the job back in the queue until ``run_after`` while
+    ``attempts < max_attempts``; ``heartbeat_at`` tells live workers from
+    dead ones.
+    """
+    STATUSES = [
+        ('pending', 'در صف'),
+        ('running', 'در حال اجرا'),
+        ('done', 'انجام شد'),
+        ('failed', 'ناموفق'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    label = models.CharField('عنوان', max_length=200)
+    params = models.JSONField(default=dict)
+    status = models.CharField('وضعیت', max_length=10, choices=STATUSES, default='pending')
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField('تلاش‌ها', default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'کار پس‌زمینه'
+        verbose_name_plural = 'کارهای پس‌زمینه'
+        ordering = ['-created_at']
+        # workers claim the oldest due pending job
+        indexes = [models.Index(fields=['status', 'run_after'], name='job_queue_idx')]
+
+    def __str__(self):
+        return f"{self.label} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        return int(100 * self.done / self.total) if self.total else 0
+
+
+class ResetSchedule(models.Model):
+    """Reset bookkeeping of one class (see grades.resets and grades.scheduler).
+
+    ``running_since`` is the per-class lock held while a reset runs;
+    ``last_success_at`` is when the last full (attendance and gradebook)
+    reset started, which tells the scheduler whether a slot was missed.
+    """
+    classroom = models.OneToOneField(SchoolClass, related_name='reset_schedule', on_delete=models.CASCADE, primary_key=True)
+    tracked_since = models.DateTimeField(default=timezone.now)
+    last_success_at = models.DateTimeField('آخرین ریست موفق', null=True, blank=True)
+    running_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'زمان‌بندی ریست'
+        verbose_name_plural = 'زمان‌بندی ریست'
@@ -0,0 +1,37 @@
+"""Work collected during a transaction and done once after it commits.
+
+Signals fire per row, so a bulk write inside one transaction would otherwise
+refresh the same students many times. ``PendingIds`` gathers the ids in
+per-thread sets and hands them to its ``flush`` function from a single
+``transaction.on_commit`` callback; outside a transaction it runs at once.
+"""
+import threading
+
+from django.db import transaction
+
+
+class PendingIds:
+    """Named per-thread id sets passed to ``flush(**sets)`` after commit.
+
+    ``flush`` is only called when at least one set is non-empty. The sets
+    are emptied before it runs, so it may schedule more work itself.
+    """
+
+    def __init__(self, flush, *names):
+        self.flush = flush
+        self.names = names
+        self._local = threading.local()
+
+    def add(self, **ids):
+        sets = getattr(self._local, 'sets', None)
+        if sets is None:
+            sets = self._local.sets = {name: set() for name in self.names}
+        for name, values in ids.items():
+            sets[name].update(values)
+        transaction.on_commit(self._flush)
+
+    def _flush(self):
+        sets = getattr(self._local, 'sets', None)
+        self._local.sets = None
+        if sets and any(sets.values()):
+            self.flush(**sets)
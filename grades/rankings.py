@@ -0,0 +1,233 @@
+"""Class and grade-level rankings by stored average.
+
+Instead of sorting every average on each request, the number of students per
+average (in hundredths, so at most 2001 buckets) is kept in ScoreBucket for
+every class and grade level. A student's rank is one plus the number of
+students in a higher bucket, i.e. one indexed range sum.
+
+When an average changes only the old and new buckets of the student's class
+and level are adjusted (a handful of indexed row updates, independent of the
+class size); no other student's row is touched. StudentRank remembers what
+each student currently contributes, so moves between classes, grade level
+changes and deletions are applied as the same kind of delta.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from .models import SchoolClass, ScoreBucket, Student, StudentRank
+from .pending import PendingIds
+from .scoring import stored_averages
+
+SYNC_CHUNK_SIZE = 500
+
+
+def _bucket(average):
+    return None if average is None else int(round(average * 100))
+
+
+def _scopes(classroom_id, grade_level):
+    scopes = [f'class:{classroom_id}']
+    if grade_level is not None:
+        scopes.append(f'level:{grade_level}')
+    return scopes
+
+
+def _percentile(rank, size):
+    # share of ranked students at or below this one
+    return round(100.0 * (size - rank + 1) / size) if size else None
+
+
+def sync_students(student_ids):
+    """Bring the bucket counts of the given students up to date.
+
+    Ids of deleted students are fine: their contribution is removed.
+    """
+    student_ids = list(set(student_ids))
+    for start in range(0, len(student_ids), SYNC_CHUNK_SIZE):
+        ids = student_ids[start:start + SYNC_CHUNK_SIZE]
+        with transaction.atomic():
+            current = {
+                sid: (class_id, level, _bucket(avg))
+                for sid, class_id, level, avg in Student.objects.filter(id__in=ids).values_list(
+                    'id', 'classroom_id', 'classroom__grade_level', 'score_average__average')
+            }
+            tracked = {
+                r.student_id: r for r in StudentRank.objects.filter(student_id__in=ids)
+            }
+            deltas = Counter()
+            changed = []
+            for sid in ids:
+                old = tracked.get(sid)
+                new = current.get(sid)
+                old_key = (old.classroom_id, old.grade_level, old.bucket) if old else None
+                if old_key == new:
+                    continue
+                if old_key and old_key[2] is not None:
+                    for scope in _scopes(*old_key[:2]):
+                        deltas[scope, old_key[2]] -= 1
+                if new and new[2] is not None:
+                    for scope in _scopes(*new[:2]):
+                        deltas[scope, new[2]] += 1
+                changed.append(sid)
+            if not changed:
+                continue
+
+            deltas = {key: d for key, d in deltas.items() if d}
+            ScoreBucket.objects.bulk_create(
+                [ScoreBucket(scope=scope, bucket=bucket) for scope, bucket in deltas],
+                ignore_conflicts=True,
+            )
+            for (scope, bucket), d in deltas.items():
+                ScoreBucket.objects.filter(scope=scope, bucket=bucket).update(count=F('count') + d)
+
+            gone = [sid for sid in changed if sid not in current]
+            if gone:
+                StudentRank.objects.filter(student_id__in=gone).delete()
+            StudentRank.objects.bulk_create(
+                [StudentRank(student_id=sid, classroom_id=current[sid][0], grade_level=current[sid][1],
+                             bucket=current[sid][2])
+                 for sid in changed if sid in current],
+                update_conflicts=True,
+                unique_fields=['student_id'],
+                update_fields=['classroom_id', 'grade_level', 'bucket'],
+            )
+
+
+def rebuild():
+    """Recompute every StudentRank row and all bucket counts from scratch.
+
+    Reset snapshots are kept. Used by ``rebuild_scores`` to repair drift.
+    """
+    with transaction.atomic():
+        snapshots = {sid: (class_rank, level_rank) for sid, class_rank, level_rank in
+                     StudentRank.objects.values_list('student_id', 'reset_class_rank', 'reset_level_rank')}
+        ScoreBucket.objects.all().delete()
+        StudentRank.objects.all().delete()
+        sync_students(Student.objects.values_list('id', flat=True))
+        rows = list(StudentRank.objects.filter(student_id__in=list(snapshots)))
+        for row in rows:
+            row.reset_class_rank, row.reset_level_rank = snapshots[row.student_id]
+        StudentRank.objects.bulk_update(rows, ['reset_class_rank', 'reset_level_rank'], batch_size=SYNC_CHUNK_SIZE)
+
+
+def _greater_counts(scope):
+    """{bucket: number of students in a higher bucket} and the scope size."""
+    greater = {}
+    seen = 0
+    for bucket, count in (ScoreBucket.objects.filter(scope=scope, count__gt=0)
+                          .order_by('-bucket').values_list('bucket', 'count')):
+        greater[bucket] = seen
+        seen += count
+    return greater, seen
+
+
+def _ensure_tracked(school_class):
+    """Track students of the class that have no StudentRank row yet (e.g. pre-existing data)."""
+    averages = stored_averages(school_class)
+    tracked = set(StudentRank.objects.filter(classroom_id=school_class.id).values_list('student_id', flat=True))
+    missing = [sid for sid, avg in averages.items() if avg is not None and sid not in tracked]
+    if missing:
+        sync_students(missing)
+
+
+def class_leaderboard(school_class):
+    """Students of a class ordered by rank, with class/level rank, percentile and change.
+
+    ``change`` is positive when the student moved up since the last reset.
+    Students without an average are listed last, unranked.
+    """
+    _ensure_tracked(school_class)
+    ranks = {r.student_id: r for r in StudentRank.objects.filter(classroom_id=school_class.id)}
+    class_greater, class_size = _greater_counts(f'class:{school_class.id}')
+    if school_class.grade_level is not None:
+        level_greater, level_size = _greater_counts(f'level:{school_class.grade_level}')
+    else:
+        level_greater, level_size = {}, 0
+
+    rows = []
+    for sid, full_name in school_class.students.order_by('roll_number', 'full_name').values_list('id', 'full_name'):
+        r = ranks.get(sid)
+        if r is None or r.bucket is None:
+            rows.append({'student_id': sid, 'full_name': full_name, 'average': None, 'rank': None})
+            continue
+        rank = class_greater.get(r.bucket, 0) + 1
+        level_rank = level_greater.get(r.bucket, 0) + 1 if level_size else None
+        rows.append({
+            'student_id': sid,
+            'full_name': full_name,
+            'average': r.bucket / 100,
+            'rank': rank,
+            'percentile': _percentile(rank, class_size),
+            'level_rank': level_rank,
+            'level_percentile': _percentile(level_rank, level_size) if level_rank else None,
+            'change': r.reset_class_rank - rank if r.reset_class_rank else None,
+        })
+    rows.sort(key=lambda row: (row['rank'] is None, row['rank'] or 0))
+    return {'rows': rows, 'size': class_size, 'level_size': level_size, 'grade_level': school_class.grade_level}
+
+
+def _rank_in(scope, bucket):
+    totals = ScoreBucket.objects.filter(scope=scope).aggregate(
+        above=Sum('count', filter=Q(bucket__gt=bucket)), size=Sum('count'))
+    rank = (totals['above'] or 0) + 1
+    return rank, totals['size'] or 0
+
+
+def standing(student_id):
+    """Class and grade-level rank of one student, or None while unranked."""
+    r = StudentRank.objects.filter(student_id=student_id).first()
+    if r is None or r.bucket is None:
+        return None
+    rank, size = _rank_in(f'class:{r.classroom_id}', r.bucket)
+    result = {
+        'rank': rank,
+        'size': size,
+        'percentile': _percentile(rank, size),
+        'change': r.reset_class_rank - rank if r.reset_class_rank else None,
+        'level_rank': None,
+    }
+    if r.grade_level is not None:
+        level_rank, level_size = _rank_in(f'level:{r.grade_level}', r.bucket)
+        result.update(level_rank=level_rank, level_size=level_size,
+                      level_percentile=_percentile(level_rank, level_size),
+                      level_change=r.reset_level_rank - level_rank if r.reset_level_rank else None)
+    return result
+
+
+def snapshot(class_id=None):
+    """Store current ranks as the baseline for "change since last reset"."""
+    classes = SchoolClass.objects.all()
+    if class_id:
+        classes = classes.filter(id=class_id)
+    for sc in classes:
+        _ensure_tracked(sc)
+    rows = list(StudentRank.objects.filter(classroom_id__in=[sc.id for sc in classes]))
+    greater = {}
+    for row in rows:
+        for scope in _scopes(row.classroom_id, row.grade_level):
+            if scope not in greater:
+                greater[scope] = _greater_counts(scope)[0]
+        if row.bucket is None:
+            row.reset_class_rank = row.reset_level_rank = None
+            continue
+        row.reset_class_rank = greater[f'class:{row.classroom_id}'].get(row.bucket, 0) + 1
+        row.reset_level_rank = (greater[f'level:{row.grade_level}'].get(row.bucket, 0) + 1
+                                if row.grade_level is not None else None)
+    StudentRank.objects.bulk_update(rows, ['reset_class_rank', 'reset_level_rank'], batch_size=SYNC_CHUNK_SIZE)
+
+
+def _flush_pending(student_ids, class_ids):
+    if class_ids:
+        student_ids.update(Student.objects.filter(classroom_id__in=class_ids).values_list('id', flat=True))
+    if student_ids:
+        sync_students(student_ids)
+
+
+_pending = PendingIds(_flush_pending, 'student_ids', 'class_ids')
+
+
+def schedule_sync(student_ids=(), class_ids=()):
+    """Sync the given students (or all students of the given classes) after commit."""
+    _pending.add(student_ids=student_ids, class_ids=class_ids)
@@ -0,0 +1,179 @@
+"""Batch report cards for a class or the whole school.
+
+The data of all cards of a class is loaded with a fixed number of queries
+(``scoring.class_scores`` plus one query each for grades, gradebook
+adjustments and the attendance bitmaps) into plain dicts. Rendering those needs no
+database, so batches of cards are rendered in a process pool and written
+into a zip archive, one file per student.
+
+The whole school is built by the ``report_cards`` background job
+(``build_report_cards``) into ``REPORT_CARD_DIR``; only a single class is
+rendered inside a request.
+"""
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Abs
+from django.template.loader import render_to_string
+from django.utils.text import get_valid_filename
+
+from . import jobs
+from .jalali import today_jalali
+from .attendance import student_totals
+from .models import Grade, GradebookEntry, SchoolClass
+from .scoring import ABSENCE_PENALTY, class_scores
+
+# process pool size; None uses every CPU
+REPORT_CARD_WORKERS = getattr(settings, 'REPORT_CARD_WORKERS', None)
+# cards rendered per pool task (fewer, larger tasks keep pickling overhead low)
+REPORT_CARD_BATCH = 100
+# where the report_cards job leaves its zips, and for how long
+REPORT_CARD_DIR = getattr(settings, 'REPORT_CARD_DIR', settings.BASE_DIR / 'report_cards')
+REPORT_CARD_KEEP_DAYS = getattr(settings, 'REPORT_CARD_KEEP_DAYS', 7)
+
+FORMATS = ['html', 'print']
+
+
+def class_cards(school_class, issued=None):
+    """Return the card data of every student in ``school_class`` as plain dicts."""
+    issued = issued or today_jalali()
+    students = list(school_class.students.order_by('roll_number', 'full_name')
+                    .values('id', 'full_name', 'roll_number', 'national_id'))
+    if not students:
+        return []
+    subjects = list(school_class.subjects.order_by('id').values('id', 'name', 'teacher_name'))
+    scores = class_scores(school_class)
+    scope = {'student__classroom': school_class}
+
+    bases = {(sid, subj): float(score) for sid, subj, score in
+             Grade.objects.filter(**scope).values_list('student_id', 'subject_id', 'score')}
+
+    adjustments = {}
+    for row in (GradebookEntry.objects.filter(subject__isnull=False, **scope)
+                .values('student_id', 'subject_id')
+                .annotate(entries=Count('id'),
+                          pos=Sum(Abs('value'), filter=Q(entry_type='pos')),
+                          neg=Sum(Abs('value'), filter=Q(entry_type='neg')))):
+        adjustments[row['student_id'], row['subject_id']] = row
+
+    attendance = student_totals(school_class.students.values('id'))
+
+    cards = []
+    for student in students:
+        sid = student['id']
+        row = scores[sid]
+        lines = []
+        for subj in subjects:
+            adj = adjustments.get((sid, subj['id']), {})
+            lines.append({
+                'name': subj['name'],
+                'teacher': subj['teacher_name'] or '',
+                'base': bases.get((sid, subj['id'])),
+                'entries': adj.get('entries', 0),
+                'pos': float(adj['pos']) if adj.get('pos') is not None else None,
+                'neg': float(adj['neg']) if adj.get('neg') is not None else None,
+                'score': row['subjects'].get(subj['id']),
+            })
+        att = attendance.get(sid, {'days': 0, 'present': 0, 'absent': 0, 'rate': None, 'longest_absence': 0})
+        cards.append({
+            'filename': f"{school_class.id}-{get_valid_filename(school_class.name)}/"
+                        f"{student['roll_number']:03d}-{get_valid_filename(student['full_name']) or sid}",
+            'student': student,
+            'class_name': school_class.name,
+            'issued': issued,
+            'subjects': lines,
+            'attendance': att,
+            'absence_penalty': round(row['absences'] * ABSENCE_PENALTY, 2),
+            'average': row['average'],
+        })
+    return cards
+
+
+def render_card(card, fmt='html'):
+    """Render one card; ``print`` is the A4 layout meant for print/PDF conversion."""
+    return render_to_string('grades/report_card.html', {'card': card, 'printable': fmt == 'print'})
+
+
+def render_batch(cards, fmt):
+    """[(archive name, bytes)] for a list of cards; runs in the pool workers."""
+    return [(f"{card['filename']}.html", render_card(card, fmt).encode('utf-8')) for card in cards]
+
+
+def _init_worker():
+    import django
+
+    # no-op under fork; sets the app registry up under spawn/forkserver
+    django.setup()
+
+
+def write_report_cards(classes, fileobj, fmt='html', workers=None, batch_size=REPORT_CARD_BATCH, progress=None):
+    """Write the report cards of every student in ``classes`` as a zip to ``fileobj``.
+
+    ``progress(done, total)`` is called after each batch. Returns the number
+    of cards written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(fmt)
+    issued = today_jalali()
+    batches = []
+    for school_class in classes:
+        cards = class_cards(school_class, issued=issued)
+        batches.extend(cards[i:i + batch_size] for i in range(0, len(cards), batch_size))
+
+    total = sum(len(batch) for batch in batches)
+    workers = workers or REPORT_CARD_WORKERS or os.cpu_count() or 1
+    count = 0
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as archive:
+        if workers == 1 or len(batches) < 2:
+            results = map(render_batch, batches, repeat(fmt))
+            pool = None
+        else:
+            # the workers never query; don't hand them the open sqlite handles
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)), initializer=_init_worker)
+            results = pool.map(render_batch, batches, repeat(fmt))
+        try:
+            for files in results:
+                for name, content in files:
+                    archive.writestr(name, content)
+                    count += 1
+                if progress:
+                    progress(count, total)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    return count
+
+
+def report_card_path(filename):
+    return os.path.join(REPORT_CARD_DIR, os.path.basename(filename))
+
+
+def build_report_cards(filename, fmt='html', progress=None):
+    """``report_cards`` job: every class into ``REPORT_CARD_DIR/filename``.
+
+    The zip is written under a temporary name and renamed when complete, so
+    the download link never serves half a file. Zips older than
+    ``REPORT_CARD_KEEP_DAYS`` are removed. Run by ``JOBS_IN_PROCESS`` in
+    the web process, the cards are rendered in the job's thread. Returns the
+    number of cards.
+    """
+    os.makedirs(REPORT_CARD_DIR, exist_ok=True)
+    cutoff = time.time() - REPORT_CARD_KEEP_DAYS * 86400
+    for entry in os.scandir(REPORT_CARD_DIR):
+        if entry.name.endswith('.zip') and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+    path = report_card_path(filename)
+    # never fork a process pool from the (multi-threaded) web process
+    workers = 1 if jobs.in_web_process() else None
+    with open(path + '.tmp', 'wb') as fileobj:
+        count = write_report_cards(SchoolClass.objects.order_by('name'), fileobj, fmt=fmt, workers=workers,
+                                   progress=progress)
+    os.replace(path + '.tmp', path)
+    return count
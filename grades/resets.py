@@ -0,0 +1,147 @@
+"""Archive-and-reset engine shared by the reset views, ``auto_reset`` and the scheduler.
+
+Rows are moved into the history tables in bounded chunks. Each chunk is one
+transaction doing a set-based ``INSERT INTO history ... SELECT ... FROM live``
+followed by a ``DELETE`` of the same rows, so a crash leaves every row either
+fully archived or untouched: re-running simply continues with what is left,
+with nothing duplicated or lost.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Q, Value
+from django.utils import timezone
+
+from . import rankings
+from .models import Attendance, AttendanceHistory, GradebookEntry, GradebookEntryHistory, ResetSchedule, SchoolClass
+from .attendance import schedule_bitmap_refresh
+from .caching import bump_students
+from .scoring import schedule_refresh
+
+RESET_CHUNK_SIZE = 1000
+RESET_LOCK_TIMEOUT = timedelta(hours=1)
+
+# live column -> history column (all stored under the same name)
+ATTENDANCE_COLUMNS = ['student_id', 'date', 'date_jalali', 'present']
+GRADEBOOK_COLUMNS = ['student_id', 'subject_id', 'entry_type', 'value', 'date', 'date_jalali', 'notes']
+
+
+def _archive(model, history_model, columns, class_id=None, chunk_size=RESET_CHUNK_SIZE, progress=None):
+    qs = model.objects.order_by()
+    if class_id:
+        qs = qs.filter(student__classroom_id=class_id)
+    total = qs.count()
+    done = 0
+    live_table = connection.ops.quote_name(model._meta.db_table)
+    history_table = connection.ops.quote_name(history_model._meta.db_table)
+    target_cols = ', '.join(connection.ops.quote_name(c) for c in columns + ['archived_at'])
+    now = timezone.now()
+
+    while True:
+        with transaction.atomic():
+            # smallest remaining ids first: everything in scope with id <= the
+            # chunk's last id is exactly this chunk
+            ids = list(qs.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            chunk = qs.filter(id__lte=ids[-1])
+
+            select = chunk.annotate(
+                archive_ts=Value(now, output_field=DateTimeField())
+            ).values_list(*columns, 'archive_ts')
+            select_sql, select_params = select.query.sql_with_params()
+            id_sql, id_params = chunk.values('id').query.sql_with_params()
+            student_ids = set(chunk.values_list('student_id', flat=True).distinct())
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {history_table} ({target_cols}) {select_sql}", select_params)
+                cursor.execute(f"DELETE FROM {live_table} WHERE id IN ({id_sql})", id_params)
+                moved = cursor.rowcount
+
+            # raw SQL skips post_delete, so refresh materialized scores explicitly
+            schedule_refresh(student_ids)
+            if model is Attendance:
+                schedule_bitmap_refresh(student_ids)
+            bump_students(student_ids)
+        done += moved
+        if progress:
+            progress(done, total)
+    return done
+
+
+def archive_attendance(class_id=None, chunk_size=RESET_CHUNK_SIZE, progress=None):
+    """Move Attendance rows (optionally of one class) into AttendanceHistory.
+
+    Returns the number of rows moved. ``progress(done, total)`` is called
+    after every committed chunk.
+    """
+    return _archive(Attendance, AttendanceHistory, ATTENDANCE_COLUMNS, class_id, chunk_size, progress)
+
+
+def archive_gradebook(class_id=None, chunk_size=RESET_CHUNK_SIZE, progress=None):
+    """Move GradebookEntry rows (optionally of one class) into GradebookEntryHistory."""
+    return _archive(GradebookEntry, GradebookEntryHistory, GRADEBOOK_COLUMNS, class_id, chunk_size, progress)
+
+
+class ResetInProgress(Exception):
+    """Another reset of the same class holds its lock."""
+
+
+@contextmanager
+def class_lock(class_id):
+    """Hold the class's reset lock (``ResetSchedule.running_since``) for the block.
+
+    Raises ResetInProgress when another reset holds it; a lock older than
+    RESET_LOCK_TIMEOUT is taken to be left over from a crashed run.
+    """
+    now = timezone.now()
+    ResetSchedule.objects.bulk_create([ResetSchedule(classroom_id=class_id)], ignore_conflicts=True)
+    taken = ResetSchedule.objects.filter(classroom_id=class_id).filter(
+        Q(running_since__isnull=True) | Q(running_since__lt=now - RESET_LOCK_TIMEOUT)
+    ).update(running_since=now)
+    if not taken:
+        raise ResetInProgress(f'a reset of class {class_id} is already running')
+    try:
+        yield now
+    finally:
+        ResetSchedule.objects.filter(classroom_id=class_id, running_since=now).update(running_since=None)
+
+
+def reset(class_id=None, attendance=True, gradebook=True, chunk_size=RESET_CHUNK_SIZE, progress=None):
+    """Snapshot ranks, then archive attendance and/or gradebook, one class at a time.
+
+    This is what the reset buttons, ``auto_reset`` and the scheduler run.
+    Each class is reset under its lock, so two resets of the same class never
+    overlap, and the write lock is released between classes. Without
+    ``class_id`` every class is reset. Returns ``{'attendance': moved,
+    'gradebook': moved}`` for the parts that ran; ``progress(done, total)``
+    counts all classes and parts together.
+    """
+    parts = []
+    if attendance:
+        parts.append(('attendance', Attendance, archive_attendance))
+    if gradebook:
+        parts.append(('gradebook', GradebookEntry, archive_gradebook))
+    class_ids = [class_id] if class_id else list(SchoolClass.objects.order_by('id').values_list('id', flat=True))
+    totals = {
+        (cid, name): model.objects.filter(student__classroom_id=cid).count()
+        for cid in class_ids for name, model, _ in parts
+    }
+    total = sum(totals.values())
+
+    moved = {name: 0 for name, _, _ in parts}
+    offset = 0
+    for cid in class_ids:
+        with class_lock(cid) as started:
+            # baseline for the "rank change since last reset" on the leaderboards
+            rankings.snapshot(cid)
+            for name, _, archive in parts:
+                def report(done, _total, offset=offset):
+                    if progress:
+                        progress(min(offset + done, total), total)
+                moved[name] += archive(cid, chunk_size, progress=report)
+                offset += totals[cid, name]
+            if attendance and gradebook:
+                ResetSchedule.objects.filter(classroom_id=cid).update(last_success_at=started)
+    return moved
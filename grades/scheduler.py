@@ -0,0 +1,107 @@
+"""Staggered automatic resets, one class at a time.
+
+Every class is reset once per ``AUTO_RESET_INTERVAL_HOURS``, at a fixed
+offset inside a window of ``AUTO_RESET_WINDOW_MINUTES`` after each interval
+boundary (midnight, noon, ... local time). The offset comes from a hash of
+the class id, so it stays put as classes come and go and the resets are
+spread over the window instead of all starting at once.
+
+``tick()`` enqueues a reset job for every class whose latest slot is later
+than its last successful reset; after downtime that is one catch-up reset
+per class (a reset moves everything, so missed slots need not be replayed),
+at most ``AUTO_RESET_MAX_PER_TICK`` per tick. A class with a reset already
+queued or running gets none, and the per-class lock in ``resets.reset``
+keeps a manual reset and a scheduled one from overlapping. ``run_workers
+--schedule`` calls ``tick()`` once a minute.
+"""
+from datetime import datetime, timedelta
+from zlib import crc32
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import jobs
+from .models import Job, ResetSchedule, SchoolClass
+
+AUTO_RESET_INTERVAL = timedelta(hours=getattr(settings, 'AUTO_RESET_INTERVAL_HOURS', 12))
+AUTO_RESET_WINDOW = timedelta(minutes=getattr(settings, 'AUTO_RESET_WINDOW_MINUTES', 60))
+AUTO_RESET_MAX_PER_TICK = getattr(settings, 'AUTO_RESET_MAX_PER_TICK', 5)
+
+
+def _anchor():
+    # interval boundaries are counted from a local midnight
+    return timezone.make_aware(datetime(2000, 1, 1))
+
+
+def slot_offset(class_id):
+    """Where in the window this class's reset falls."""
+    return AUTO_RESET_WINDOW * (crc32(str(class_id).encode()) / 2 ** 32)
+
+
+def last_slot(class_id, now=None):
+    """The latest scheduled reset time of the class at or before ``now``."""
+    now = now or timezone.now()
+    start = _anchor() + slot_offset(class_id)
+    return start + ((now - start) // AUTO_RESET_INTERVAL) * AUTO_RESET_INTERVAL
+
+
+def next_slot(class_id, now=None):
+    return last_slot(class_id, now) + AUTO_RESET_INTERVAL
+
+
+def _active_resets():
+    """Class ids with a reset job queued or running."""
+    return {
+        params.get('class_id') for params in
+        Job.objects.filter(kind='reset', status__in=['pending', 'running']).values_list('params', flat=True)
+    }
+
+
+def due(now=None):
+    """Ids of classes whose latest slot has no successful reset yet, most overdue first."""
+    now = now or timezone.now()
+    class_ids = list(SchoolClass.objects.values_list('id', flat=True))
+    # classes seen for the first time start with the next slot, not a reset right away
+    ResetSchedule.objects.bulk_create([ResetSchedule(classroom_id=cid, tracked_since=now) for cid in class_ids],
+                                      ignore_conflicts=True)
+    states = {s.classroom_id: s for s in ResetSchedule.objects.filter(classroom_id__in=class_ids)}
+    overdue = []
+    for cid in class_ids:
+        state = states[cid]
+        slot = last_slot(cid, now)
+        if max(filter(None, [state.last_success_at, state.tracked_since])) < slot:
+            overdue.append((slot, cid))
+    return [cid for _, cid in sorted(overdue)]
+
+
+def tick(now=None, limit=AUTO_RESET_MAX_PER_TICK):
+    """Queue resets for due classes; returns the queued jobs."""
+    active = _active_resets()
+    names = dict(SchoolClass.objects.values_list('id', 'name'))
+    queued = []
+    for cid in due(now):
+        if len(queued) >= limit:
+            break
+        if cid in active:
+            continue
+        queued.append(jobs.enqueue('reset', f'ریست خودکار کلاس "{names.get(cid, cid)}"', class_id=cid))
+    return queued
+
+
+def overview(now=None):
+    """Schedule of every class for the jobs page."""
+    now = now or timezone.now()
+    states = {s.classroom_id: s for s in ResetSchedule.objects.all()}
+    active = _active_resets()
+    rows = []
+    for cid, name in SchoolClass.objects.order_by('name').values_list('id', 'name'):
+        state = states.get(cid)
+        rows.append({
+            'class_id': cid,
+            'name': name,
+            'last_success_at': state.last_success_at if state else None,
+            'running': bool(state and state.running_since),
+            'queued': cid in active,
+            'next_slot': next_slot(cid, now),
+        })
+    return rows
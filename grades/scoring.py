@@ -0,0 +1,221 @@
+"""Class-level scoring engine.
+
+Computes every student's effective per-subject score and average for a
+``SchoolClass`` with a fixed number of queries, using the same rules as
+``Student.average()``:
+
+* the latest ``num`` gradebook entry overrides the base ``Grade``;
+* ``pos``/``neg`` entries are added/subtracted (by absolute value);
+* each absence lowers the average by ``ABSENCE_PENALTY``, clamped to 0..20.
+"""
+from django.db import transaction
+from django.db.models import Count
+
+from .pending import PendingIds
+
+ABSENCE_PENALTY = 0.2  # each absence reduces average by 0.2 by default
+
+
+def effective_score(base, entries):
+    """Return the effective score for one subject.
+
+    ``base`` is the Grade score as float (or None) and ``entries`` is a list of
+    ``(entry_type, value)`` tuples ordered oldest -> newest.
+    """
+    effective = base
+    adjustments = 0.0
+    for entry_type, value in entries:
+        if value is None:
+            continue
+        if entry_type == 'num':
+            # the latest 'num' entry wins
+            effective = float(value)
+        elif entry_type == 'pos':
+            adjustments += abs(float(value))
+        elif entry_type == 'neg':
+            adjustments -= abs(float(value))
+    if effective is None:
+        return None
+    return effective + adjustments
+
+
+def average_from_scores(scores, absences):
+    """Average a list of effective scores and apply the absence penalty."""
+    if not scores:
+        return None
+    avg = float(sum(scores)) / len(scores)
+    adjusted = avg - (absences * ABSENCE_PENALTY)
+    adjusted = max(0.0, min(20.0, adjusted))
+    return round(adjusted, 2)
+
+
+def class_scores(school_class, student_ids=None):
+    """Compute scores for the students of ``school_class``.
+
+    Returns a dict keyed by student id. Each value is a dict with:
+      - ``subjects``: {subject_id: effective score or None}
+      - ``average``: the same value ``Student.average()`` returns
+      - ``absences``: number of absences counted in the penalty
+      - ``grade_total`` / ``grade_count``: sum and count of raw Grade scores
+
+    Pass ``student_ids`` to restrict the computation to a subset of students.
+    """
+    from .models import Student, Grade, GradebookEntry, Attendance
+
+    if student_ids is None:
+        student_ids = list(
+            Student.objects.filter(classroom=school_class).values_list('id', flat=True)
+        )
+        # filter through the join so large classes don't hit SQLite's parameter limit
+        scope = {'student__classroom': school_class}
+    else:
+        student_ids = list(student_ids)
+        scope = {'student_id__in': student_ids}
+    subject_ids = list(school_class.subjects.order_by('id').values_list('id', flat=True))
+    subject_set = set(subject_ids)
+
+    bases = {}
+    result = {}
+    for sid in student_ids:
+        result[sid] = {'subjects': {}, 'average': None, 'absences': 0,
+                       'grade_total': 0.0, 'grade_count': 0}
+    if not student_ids:
+        return result
+
+    for student_id, subject_id, score in Grade.objects.filter(
+            **scope).values_list('student_id', 'subject_id', 'score'):
+        row = result[student_id]
+        row['grade_total'] += float(score)
+        row['grade_count'] += 1
+        if subject_id in subject_set:
+            bases[(student_id, subject_id)] = float(score)
+
+    entries = {}
+    for student_id, subject_id, entry_type, value in GradebookEntry.objects.filter(
+            subject_id__in=subject_ids, **scope).order_by(
+            'created_at', 'id').values_list('student_id', 'subject_id', 'entry_type', 'value'):
+        entries.setdefault((student_id, subject_id), []).append((entry_type, value))
+
+    absences = dict(
+        Attendance.objects.filter(present=False, **scope)
+        .values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+    )
+
+    for sid in student_ids:
+        row = result[sid]
+        scores = []
+        for subj_id in subject_ids:
+            eff = effective_score(bases.get((sid, subj_id)), entries.get((sid, subj_id), []))
+            row['subjects'][subj_id] = eff
+            if eff is not None:
+                scores.append(eff)
+        row['absences'] = absences.get(sid, 0)
+        row['average'] = average_from_scores(scores, row['absences'])
+    return result
+
+
+def student_scores(student):
+    """Convenience wrapper returning the ``class_scores`` row for one student."""
+    return class_scores(student.classroom, student_ids=[student.id])[student.id]
+
+
+# --- materialized scores -------------------------------------------------
+
+def store_scores(rows):
+    """Write ``class_scores`` rows into StudentSubjectScore / StudentAverage."""
+    from .models import StudentSubjectScore, StudentAverage
+
+    ids = list(rows)
+    with transaction.atomic():
+        StudentSubjectScore.objects.filter(student_id__in=ids).delete()
+        StudentSubjectScore.objects.bulk_create([
+            StudentSubjectScore(student_id=sid, subject_id=subj_id, score=score)
+            for sid, row in rows.items()
+            for subj_id, score in row['subjects'].items()
+            if score is not None
+        ])
+        StudentAverage.objects.bulk_create(
+            [StudentAverage(student_id=sid, average=row['average'], absences=row['absences'])
+             for sid, row in rows.items()],
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['average', 'absences', 'updated_at'],
+        )
+        # move the students between rank buckets (see grades.rankings)
+        from .rankings import sync_students
+        sync_students(ids)
+
+
+def refresh_student_scores(student_ids):
+    """Recompute and store the materialized scores of the given students.
+
+    Ids of students that no longer exist are ignored (their rows cascade away).
+    """
+    from .models import Student, SchoolClass
+
+    by_class = {}
+    for sid, class_id in Student.objects.filter(id__in=set(student_ids)).values_list('id', 'classroom_id'):
+        by_class.setdefault(class_id, []).append(sid)
+    for sc in SchoolClass.objects.filter(id__in=by_class):
+        store_scores(class_scores(sc, student_ids=by_class[sc.id]))
+
+
+def refresh_class_scores(school_class):
+    """Recompute and store the materialized scores of a whole class."""
+    store_scores(class_scores(school_class))
+
+
+_pending = PendingIds(refresh_student_scores, 'student_ids')
+
+
+def schedule_refresh(student_ids):
+    """Refresh the given students once the current transaction commits.
+
+    Many writes inside one transaction (e.g. a bulk delete firing post_delete
+    per row) are collapsed into a single recomputation per student. Outside a
+    transaction the refresh runs immediately.
+    """
+    _pending.add(student_ids=student_ids)
+
+
+def stored_averages(school_class, student_ids=None):
+    """Return {student_id: average} from the materialized StudentAverage table.
+
+    Students without a stored row yet (e.g. data created before the table
+    existed) are computed live and stored on the fly.
+    """
+    from .models import Student, StudentAverage
+
+    students = Student.objects.filter(classroom=school_class)
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+    averages = {}
+    missing = []
+    for sid, avg_id, avg in students.values_list('id', 'score_average__student_id', 'score_average__average'):
+        if avg_id is None:
+            missing.append(sid)
+        else:
+            averages[sid] = avg
+    if missing:
+        rows = class_scores(school_class, student_ids=missing)
+        store_scores(rows)
+        for sid, row in rows.items():
+            averages[sid] = row['average']
+    return averages
+
+
+def stored_average(student):
+    """Materialized average for a single student."""
+    return stored_averages(student.classroom, student_ids=[student.id]).get(student.id)
+
+
+async def astored_average(student):
+    """Async stored_average(); reads the materialized row with the async ORM."""
+    from asgiref.sync import sync_to_async
+
+    from .models import StudentAverage
+
+    row = await StudentAverage.objects.filter(student_id=student.id).values('average').afirst()
+    if row is not None:
+        return row['average']
+    return await sync_to_async(stored_average)(student)
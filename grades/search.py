@@ -0,0 +1,73 @@
+"""Student directory search.
+
+On SQLite the ``grades_student_fts`` FTS5 table (created and kept in sync by
+triggers, see migration 0011) answers prefix queries over name, national id,
+phones, emails and class name. Other databases fall back to ``icontains``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Student
+
+FTS_TABLE = 'grades_student_fts'
+
+_TOKEN_RE = re.compile(r'[\w@.+-]+', re.UNICODE)
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(q):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    tokens = _TOKEN_RE.findall(q or '')
+    # quote each token so FTS5 operators in user input are taken literally
+    return ' '.join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+
+
+def text_matches(q, *texts):
+    """Python counterpart of ``match_expression`` for text already in memory:
+    every word of ``q`` must be a prefix of a word of ``texts``."""
+    words = [w.casefold() for text in texts if text for w in _TOKEN_RE.findall(text)]
+    return all(any(w.startswith(t) for w in words) for t in (t.casefold() for t in _TOKEN_RE.findall(q or '')))
+
+
+def matching_ids(q):
+    """Expression usable as ``student_id__in=`` for students matching ``q``."""
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_expression(q)])
+
+
+def student_q(q, prefix='student__'):
+    """Q object filtering a queryset by a student directory search."""
+    if not match_expression(q):
+        return Q()
+    if fts_enabled():
+        return Q(**{f'{prefix}id__in': matching_ids(q)})
+    return (Q(**{f'{prefix}full_name__icontains': q}) | Q(**{f'{prefix}national_id__icontains': q})
+            | Q(**{f'{prefix}phone1__icontains': q}) | Q(**{f'{prefix}email1__icontains': q}))
+
+
+def search_students(q, limit=20, ranked=True):
+    """Matching students (with classroom).
+
+    With ``ranked`` the results are ordered by FTS5 relevance (bm25), which
+    scores every hit; autocomplete passes ``ranked=False`` to stop at the first
+    ``limit`` hits so short prefixes stay fast on large directories.
+    """
+    match = match_expression(q)
+    if not match:
+        return []
+    if not fts_enabled():
+        return list(Student.objects.filter(student_q(q, prefix='')).select_related('classroom')[:limit])
+    order = 'ORDER BY rank' if ranked else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s {order} LIMIT %s",
+            [match, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    students = Student.objects.select_related('classroom').in_bulk(ids)
+    return [students[i] for i in ids if i in students]
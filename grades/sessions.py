@@ -0,0 +1,77 @@
+"""Separate session for the student portal.
+
+Portal logins are attached to ``request.student_session`` instead of
+``request.session``. It lives in its own cookie and, by default, in a signed
+cookie store, so a surge of student logins and dashboard visits never writes
+to the ``django_session`` table. Staff sessions are unaffected. A
+cache-backed store can be used instead via ``STUDENT_SESSION_ENGINE``.
+"""
+import time
+from importlib import import_module
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+STUDENT_SESSION_ENGINE = getattr(settings, 'STUDENT_SESSION_ENGINE', 'django.contrib.sessions.backends.signed_cookies')
+STUDENT_SESSION_COOKIE_NAME = getattr(settings, 'STUDENT_SESSION_COOKIE_NAME', 'studentsessionid')
+
+
+class StudentSessionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.SessionStore = import_module(STUDENT_SESSION_ENGINE).SessionStore
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.student_session = self.SessionStore(request.COOKIES.get(STUDENT_SESSION_COOKIE_NAME))
+        response = self.get_response(request)
+        if self._needs_save(request, response):
+            max_age = request.student_session.get_expiry_age()
+            request.student_session.save()
+            self._set_cookie(request, response, max_age)
+        return response
+
+    async def __acall__(self, request):
+        request.student_session = self.SessionStore(request.COOKIES.get(STUDENT_SESSION_COOKIE_NAME))
+        response = await self.get_response(request)
+        if self._needs_save(request, response):
+            max_age = await request.student_session.aget_expiry_age()
+            await request.student_session.asave()
+            self._set_cookie(request, response, max_age)
+        return response
+
+    def _needs_save(self, request, response):
+        """Patch headers / drop an emptied cookie; True if the session must be saved."""
+        session = request.student_session
+        if not session.accessed:
+            return False
+        patch_vary_headers(response, ('Cookie',))
+        if session.is_empty():
+            if STUDENT_SESSION_COOKIE_NAME in request.COOKIES:
+                response.delete_cookie(STUDENT_SESSION_COOKIE_NAME, path=settings.SESSION_COOKIE_PATH,
+                                       domain=settings.SESSION_COOKIE_DOMAIN,
+                                       samesite=settings.SESSION_COOKIE_SAMESITE)
+            return False
+        return session.modified and response.status_code < 500
+
+    def _set_cookie(self, request, response, max_age):
+        session = request.student_session
+        response.set_cookie(
+            STUDENT_SESSION_COOKIE_NAME,
+            session.session_key,
+            max_age=max_age,
+            expires=http_date(time.time() + max_age),
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            path=settings.SESSION_COOKIE_PATH,
+            secure=settings.SESSION_COOKIE_SECURE or None,
+            httponly=settings.SESSION_COOKIE_HTTPONLY or None,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
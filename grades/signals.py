@@ -0,0 +1,56 @@
+"""Signal handlers keeping the materialized score tables and cache versions in sync."""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .caching import bump_students, bump_roster, bump_class
+from .attendance import schedule_bitmap_refresh
+from .rankings import schedule_sync
+from .models import SchoolClass, Subject, Student, Grade, GradebookEntry, Attendance
+from .scoring import schedule_refresh
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+@receiver(post_save, sender=GradebookEntry)
+@receiver(post_delete, sender=GradebookEntry)
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_scores_on_change(sender, instance, **kwargs):
+    schedule_refresh([instance.student_id])
+    bump_students([instance.student_id])
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_bitmap_on_attendance_change(sender, instance, **kwargs):
+    schedule_bitmap_refresh([instance.student_id])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def bump_student_on_change(sender, instance, **kwargs):
+    bump_students([instance.pk])
+    # a deleted student can no longer be mapped to its class at commit time
+    bump_roster(instance.classroom_id)
+    # class moves and deletions change which leaderboards count the student
+    schedule_sync(student_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Student)
+def refresh_scores_on_student_save(sender, instance, raw=False, **kwargs):
+    # a student moved to another class is scored against that class's subjects
+    if not raw:
+        schedule_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def bump_class_on_subject_change(sender, instance, **kwargs):
+    bump_class(instance.classroom_id)
+
+
+@receiver(post_save, sender=SchoolClass)
+def bump_class_on_rename(sender, instance, **kwargs):
+    bump_class(instance.pk)
+    # the grade level decides which level leaderboard the students are in
+    schedule_sync(class_ids=[instance.pk])
@@ -0,0 +1,114 @@
+"""Synthetic school generator used by ``seed_synthetic`` and ``benchmark``.
+
+Everything is written with ``bulk_create`` and the materialized scores and
+attendance bitmaps are refreshed once per class at the end.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from .jalali import to_jalali
+from .models import SchoolClass, Subject, Student, Grade, GradebookEntry, Attendance
+from .attendance import refresh_bitmaps
+from .scoring import refresh_class_scores
+
+FIRST_NAMES = ['علی', 'محمد', 'رضا', 'حسین', 'امیر', 'مهدی', 'زهرا', 'فاطمه', 'مریم', 'سارا', 'نگار', 'الهام']
+LAST_NAMES = ['محمدی', 'حسینی', 'رضایی', 'احمدی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'رحیمی', 'کاظمی']
+SUBJECT_NAMES = ['ریاضی', 'علوم', 'ادبیات فارسی', 'عربی', 'زبان انگلیسی', 'مطالعات اجتماعی', 'قرآن',
+                 'پیام‌های آسمان', 'تفکر و سبک زندگی', 'کار و فناوری', 'ورزش', 'هنر', 'فیزیک', 'شیمی', 'زیست']
+BATCH_SIZE = 2000
+# portal password of every synthetic student
+SYNTHETIC_PASSWORD = 'synthetic'
+# synthetic national IDs are '99' + a 10-digit serial, two digits longer than real ones
+SYNTHETIC_NID_PREFIX = '99'
+SYNTHETIC_NID_DIGITS = 10
+
+
+def _next_serial():
+    """Serial of the next synthetic national ID, after those of earlier runs."""
+    last = (Student.objects.filter(national_id__regex=rf'^{SYNTHETIC_NID_PREFIX}\d{{{SYNTHETIC_NID_DIGITS}}}$')
+            .aggregate(last=Max('national_id'))['last'])
+    return int(last[len(SYNTHETIC_NID_PREFIX):]) + 1 if last else 0
+
+
+def _score(rng, lo=0, hi=20):
+    # roughly bell-shaped around 15, like real report cards
+    return Decimal(str(round(min(hi, max(lo, rng.gauss(15, 3))), 2)))
+
+
+def generate(classes=3, students=30, subjects=10, entries=5, days=30, seed=0, prefix='Synthetic', start=None):
+    """Create ``classes`` classes with the given number of students and subjects.
+
+    Each student gets a grade in every subject, ``entries`` gradebook entries
+    and ``days`` school days of attendance (weekdays back from ``start``).
+    Returns the list of created SchoolClass objects.
+    """
+    rng = random.Random(seed)
+    start = start or date.today()
+    school_days = []
+    d = start
+    while len(school_days) < days:
+        if d.weekday() != 4:  # Friday is the weekend
+            school_days.append(d)
+        d -= timedelta(days=1)
+    jalali_days = {d: to_jalali(d) for d in school_days}
+    subject_names = [SUBJECT_NAMES[i % len(SUBJECT_NAMES)] + ('' if i < len(SUBJECT_NAMES) else f' {i}')
+                     for i in range(subjects)]
+
+    # hashed once: bulk_create skips Student.save() and hashing per row is slow
+    password = make_password(SYNTHETIC_PASSWORD)
+    created = []
+    with transaction.atomic():
+        offset = SchoolClass.objects.filter(name__startswith=prefix).count()
+        # not drawn from rng: the same seed on a second run would repeat the IDs
+        serial = _next_serial()
+        for c in range(classes):
+            sc = SchoolClass.objects.create(name=f'{prefix} {offset + c + 1}')
+            created.append(sc)
+            Subject.objects.bulk_create([
+                Subject(classroom=sc, name=name, teacher_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}')
+                for name in subject_names
+            ])
+            Student.objects.bulk_create([
+                Student(
+                    classroom=sc,
+                    full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    roll_number=n + 1,
+                    national_id=f'{SYNTHETIC_NID_PREFIX}{serial + n:0{SYNTHETIC_NID_DIGITS}d}',
+                    password=password,
+                    phone1=f'+98912{rng.randrange(10**6, 10**7)}',
+                ) for n in range(students)
+            ], batch_size=BATCH_SIZE)
+            serial += students
+            # re-read ids: not every backend returns pks from bulk_create
+            student_ids = list(Student.objects.filter(classroom=sc).values_list('id', flat=True))
+            subj_ids = list(Subject.objects.filter(classroom=sc).values_list('id', flat=True))
+
+            Grade.objects.bulk_create([
+                Grade(student_id=sid, subject_id=subj_id, score=_score(rng))
+                for sid in student_ids for subj_id in subj_ids
+            ], batch_size=BATCH_SIZE)
+
+            gb = []
+            for sid in student_ids:
+                for _ in range(entries):
+                    entry_type = rng.choice(['pos', 'pos', 'neg', 'num'])
+                    value = _score(rng) if entry_type == 'num' else Decimal(rng.choice(['0.25', '0.5', '1']))
+                    day = rng.choice(school_days) if school_days else start
+                    gb.append(GradebookEntry(student_id=sid, subject_id=rng.choice(subj_ids) if subj_ids else None,
+                                             entry_type=entry_type, value=value, date=day,
+                                             date_jalali=to_jalali(day)))
+            GradebookEntry.objects.bulk_create(gb, batch_size=BATCH_SIZE)
+
+            Attendance.objects.bulk_create([
+                Attendance(student_id=sid, date=day, date_jalali=jalali_days[day], present=rng.random() > 0.05)
+                for sid in student_ids for day in school_days
+            ], batch_size=BATCH_SIZE)
+
+            refresh_class_scores(sc)
+            refresh_bitmaps(student_ids)
+    return created
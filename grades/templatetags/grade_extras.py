@@ -1,5 +1,5 @@
 from django import template
-import jdatetime
+from grades.jalali import to_jalali
 
 from datetime import date as _date
 
@@ -34,8 +34,7 @@ def jalali(d):
     # if it's a date object
     if isinstance(d, _date):
         try:
-            jd = jdatetime.date.fromgregorian(date=d)
-            return f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+            return to_jalali(d)
         except Exception:
             return d.isoformat()
     # otherwise fallback to str
@@ -0,0 +1,130 @@
+import random
+from datetime import date, timedelta
+from importlib import import_module
+
+from django.apps import apps
+from django.test import SimpleTestCase, TestCase
+
+from grades import attendance
+from grades.jalali import school_year_start
+from grades.models import Attendance, AttendanceBitmap
+
+from .utils import SchoolFixture
+
+build_bitmaps = import_module('grades.migrations.0014_attendancebitmap').build_bitmaps
+
+
+def naive_longest_run(absences):
+    """Longest absence streak over a list of recorded days (True = absent)."""
+    best = run = 0
+    for absent in absences:
+        run = run + 1 if absent else 0
+        best = max(best, run)
+    return best
+
+
+def recount():
+    """{(student, term): (recorded dates, absent dates)} straight from the Attendance rows."""
+    from grades.jalali import school_year
+    days = {}
+    for sid, d, present in Attendance.objects.values_list('student_id', 'date', 'present'):
+        recorded, absent = days.setdefault((sid, school_year(d)), (set(), set()))
+        recorded.add(d)
+        if not present:
+            absent.add(d)
+    return days
+
+
+def decoded():
+    """The same shape, decoded from the stored AttendanceBitmap rows."""
+    days = {}
+    for sid, term, rec, ab in AttendanceBitmap.objects.values_list('student_id', 'term', 'recorded', 'absent'):
+        start = school_year_start(term)
+        days[sid, term] = tuple({start + timedelta(days=i) for i in range(bits.bit_length()) if bits >> i & 1}
+                                for bits in (attendance._to_int(rec), attendance._to_int(ab)))
+    return days
+
+
+class LongestRunTests(SimpleTestCase):
+    def test_examples(self):
+        self.assertEqual(attendance.longest_run(0, 0), 0)
+        self.assertEqual(attendance.longest_run(0b1011, 0b1111), 2)
+        # day 2 has no record: it neither breaks nor extends the streak
+        self.assertEqual(attendance.longest_run(0b1011, 0b1011), 3)
+        self.assertEqual(attendance.longest_run(0b10001, 0b11111), 1)
+
+    def test_matches_naive_count(self):
+        rnd = random.Random(4)
+        for _ in range(500):
+            width = rnd.randint(1, 200)
+            recorded = rnd.getrandbits(width)
+            absent = recorded & rnd.getrandbits(width)
+            days = [bool(absent >> i & 1) for i in range(width) if recorded >> i & 1]
+            self.assertEqual(attendance.longest_run(absent, recorded), naive_longest_run(days), (recorded, absent))
+
+
+class BitmapTests(SchoolFixture, TestCase):
+    """AttendanceBitmap rows always decode back to the Attendance rows."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school()
+        self.b, self.d = self.students[1], self.students[3]
+        self.term_start = school_year_start(1403)
+
+    def test_after_create(self):
+        self.assertEqual(decoded(), recount())
+        self.assertEqual(set(decoded()), {(self.b.id, 1403), (self.d.id, 1403)})
+
+    def test_term_boundary(self):
+        last_day = self.term_start - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=self.d, date=last_day, present=False)
+            Attendance.objects.create(student=self.d, date=self.term_start, present=False)
+        self.assertEqual(decoded(), recount())
+        self.assertEqual(attendance.day_index(last_day), (1402, (last_day - school_year_start(1402)).days))
+        self.assertEqual(attendance.day_index(self.term_start), (1403, 0))
+        # unrecorded days up to 1 Mehr don't break the streak, but the end of the school year does
+        totals = attendance.student_totals([self.d.id])[self.d.id]
+        self.assertEqual((totals['days'], totals['absent'], totals['longest_absence']), (17, 17, 16))
+
+    def test_upsert_roster(self):
+        days = [date(2024, 10, 2), date(2024, 10, 20)]
+        marks = {s.id: s.roll_number % 2 == 0 for s in self.students}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(attendance.upsert_roster(marks, days), 10)
+        rows = {(sid, d): present for sid, d, present in Attendance.objects.values_list('student_id', 'date', 'present')}
+        self.assertEqual(len(rows), 3 + 15 + 5 * 2 - 2)  # two (student, date) pairs already existed
+        for sid, present in marks.items():
+            for d in days:
+                self.assertEqual(rows[sid, d], present)
+        self.assertEqual(decoded(), recount())
+
+        totals = attendance.student_totals(list(marks))
+        d_absences = sorted(Attendance.objects.filter(student=self.d, present=False).values_list('date', flat=True))
+        self.assertEqual(totals[self.d.id]['absent'], len(d_absences))
+        self.assertEqual(totals[self.d.id]['longest_absence'], 13)  # present again on Oct 2
+        self.assertEqual(totals[self.b.id]['absent'], 1)
+
+    def test_after_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(student=self.d, date__gt=date(2024, 10, 10)).delete()
+            row = Attendance.objects.get(student=self.b, date=date(2024, 10, 1))
+            row.present = False
+            row.save()
+        self.assertEqual(decoded(), recount())
+        summary = attendance.class_term_summary(self.sc, 1403)
+        by_student = {row['student_id']: row for row in summary['students']}
+        self.assertEqual(by_student[self.d.id]['absent'], 10)
+        self.assertEqual(by_student[self.b.id]['longest_absence'], 3)
+        self.assertEqual([(day['date'], day['absent']) for day in summary['days']][:3],
+                         [(date(2024, 10, 1), 2), (date(2024, 10, 2), 2), (date(2024, 10, 3), 2)])
+
+    def test_migration_backfill(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=self.d, date=self.term_start - timedelta(days=3), present=False)
+        expected = decoded()
+        self.assertEqual(expected, recount())
+        AttendanceBitmap.objects.all().delete()
+        build_bitmaps(apps, None)
+        self.assertEqual(decoded(), expected)
@@ -0,0 +1,123 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from grades.auth import StudentBackend, is_hashed
+from grades.models import Student
+from grades.sessions import STUDENT_SESSION_COOKIE_NAME
+
+from .utils import SchoolFixture
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class StudentBackendTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, students = self.make_school()
+        self.student = students[0]
+        self.student.national_id = '0012345678'
+        self.student.password = 'secret'
+        self.student.save()
+
+    def authenticate(self, national_id, password):
+        sync = StudentBackend().authenticate(None, national_id=national_id, password=password)
+        asynchronous = async_to_sync(StudentBackend().aauthenticate)(None, national_id=national_id, password=password)
+        self.assertEqual(sync, asynchronous)
+        return sync
+
+    def stored(self):
+        return Student.objects.values_list('password', flat=True).get(pk=self.student.pk)
+
+    def test_hashed_password(self):
+        self.assertTrue(is_hashed(self.stored()))
+        self.assertEqual(self.authenticate('0012345678', 'secret'), self.student)
+        self.assertIsNone(self.authenticate('0012345678', 'wrong'))
+        self.assertIsNone(self.authenticate('0099999999', 'secret'))
+        self.assertIsNone(self.authenticate('0012345678', ''))
+
+    def test_legacy_plaintext_is_upgraded(self):
+        Student.objects.filter(pk=self.student.pk).update(password='legacy')  # as raw SQL would leave it
+        self.assertIsNone(self.authenticate('0012345678', 'wrong'))
+        self.assertEqual(self.stored(), 'legacy')
+        self.assertEqual(self.authenticate('0012345678', 'legacy'), self.student)
+        self.assertTrue(check_password('legacy', self.stored()))
+
+    def test_legacy_plaintext_is_upgraded_async(self):
+        Student.objects.filter(pk=self.student.pk).update(password='legacy')
+        student = async_to_sync(StudentBackend().aauthenticate)(None, national_id='0012345678', password='legacy')
+        self.assertEqual(student, self.student)
+        self.assertTrue(check_password('legacy', self.stored()))
+
+    def test_rehash_after_hasher_change(self):
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher'] + FAST_HASHERS):
+            self.assertTrue(self.stored().startswith('md5$'))
+            self.assertEqual(self.authenticate('0012345678', 'secret'), self.student)
+            self.assertTrue(self.stored().startswith('pbkdf2_sha256$'))
+            self.assertTrue(check_password('secret', self.stored()))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class StudentSessionTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, students = self.make_school()
+        Student.objects.filter(pk=students[0].pk).update(national_id='0012345678', password=make_password('secret'))
+
+    def login(self):
+        response = self.client.post(reverse('grades:student_login'),
+                                    {'national_id': '0012345678', 'password': 'secret'})
+        self.assertRedirects(response, reverse('grades:student_dashboard'), fetch_redirect_response=False)
+        return response.cookies[STUDENT_SESSION_COOKIE_NAME].value
+
+    def test_login_uses_signed_cookie_only(self):
+        self.login()
+        self.assertEqual(self.client.get(reverse('grades:student_dashboard')).status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.client.get(reverse('grades:student_logout'))
+        self.assertRedirects(self.client.get(reverse('grades:student_dashboard')), reverse('grades:student_login'))
+
+    def test_tampered_cookie_is_rejected(self):
+        value = self.login()
+        self.client.cookies[STUDENT_SESSION_COOKIE_NAME] = value[:-3] + ('aaa' if value[-3:] != 'aaa' else 'bbb')
+        self.assertRedirects(self.client.get(reverse('grades:student_dashboard')), reverse('grades:student_login'))
+
+    def test_expired_cookie_is_rejected(self):
+        self.login()
+        later = time.time() + settings.SESSION_COOKIE_AGE + 60
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            response = self.client.get(reverse('grades:student_dashboard'))
+        self.assertRedirects(response, reverse('grades:student_login'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class HashStudentPasswordsTests(SchoolFixture, TestCase):
+    def test_hashes_plaintext_once(self):
+        sc, students = self.make_school()
+        Student.objects.filter(pk=students[0].pk).update(password=make_password('kept'))
+        for n, student in enumerate(students[1:4]):
+            Student.objects.filter(pk=student.pk).update(password=f'plain{n}')
+        out = StringIO()
+        call_command('hash_student_passwords', '--dry-run', stdout=out)
+        self.assertIn('3 of 4', out.getvalue())
+        self.assertEqual(Student.objects.filter(password__startswith='plain').count(), 3)
+
+        call_command('hash_student_passwords', '--batch-size', '2', stdout=StringIO())
+        stored = dict(Student.objects.values_list('pk', 'password'))
+        self.assertTrue(check_password('kept', stored[students[0].pk]))
+        for n, student in enumerate(students[1:4]):
+            self.assertTrue(check_password(f'plain{n}', stored[student.pk]))
+        self.assertIsNone(stored[students[4].pk])
+
+        out = StringIO()
+        call_command('hash_student_passwords', stdout=out)
+        self.assertIn('Hashed 0 of 4', out.getvalue())
+        self.assertEqual(dict(Student.objects.values_list('pk', 'password')), stored)
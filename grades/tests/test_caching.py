@@ -0,0 +1,48 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from grades import caching
+from grades.models import Grade
+
+from .utils import SchoolFixture
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class SharedCacheTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+        self.student = self.students[0]
+
+    def test_bumps_reach_other_processes(self):
+        # a second backend instance reads the same store, like another process would
+        other = caches.create_connection('default')
+        self.addCleanup(other.close)
+        key = caching.dashboard_key(self.student.id, self.sc.id)
+        version_keys = [caching._student_key(self.student.id), caching._class_key(self.sc.id)]
+        self.assertEqual(other.get_many(version_keys), caching.versions(version_keys))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.filter(student=self.student).update(score=Decimal('5'))
+            caching.bump_students([self.student.id])
+            # nothing changes before the commit
+            self.assertEqual(caching.dashboard_key(self.student.id, self.sc.id), key)
+        self.assertNotEqual(caching.dashboard_key(self.student.id, self.sc.id), key)
+        self.assertEqual(other.get_many(version_keys), caching.versions(version_keys))
+
+    def test_locmem_refused_for_other_processes(self):
+        caching.require_shared_cache('test')
+        with override_settings(CACHES=LOCMEM):
+            with self.assertRaises(ImproperlyConfigured):
+                caching.require_shared_cache('test')
+            with self.assertRaisesMessage(CommandError, 'run_workers'):
+                call_command('run_workers', '--once', stdout=StringIO())
+            with self.assertRaisesMessage(CommandError, 'auto_reset'):
+                call_command('auto_reset', stdout=StringIO())
+            # queueing only writes the job row
+            call_command('auto_reset', '--enqueue', stdout=StringIO())
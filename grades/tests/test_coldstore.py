@@ -0,0 +1,131 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from grades import coldstore, exports, resets
+from grades.models import AttendanceHistory, GradebookEntryHistory, Student
+from grades.pagination import keyset_page
+
+from .utils import SchoolFixture
+
+
+class ColdStoreTests(SchoolFixture, TestCase):
+    """Archived segment rows read back merged with the live history table."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(coldstore, 'HISTORY_ARCHIVE_DIR', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sc, self.students = self.make_school()
+        self.make_school(name='کلاس ۲')
+        Student.objects.filter(id=self.students[1].id).update(full_name='رضا کریمی')
+        resets.archive_attendance()
+        resets.archive_gradebook()
+        now = timezone.now()
+        # every other row from an old reset, so one student's rows end up on both sides
+        old = sorted(AttendanceHistory.objects.values_list('id', flat=True))[::2]
+        AttendanceHistory.objects.filter(id__in=old).update(archived_at=now - timedelta(days=400))
+        GradebookEntryHistory.objects.update(archived_at=now - timedelta(days=400))
+        self.attendance = list(AttendanceHistory.objects.order_by('-archived_at', '-id').values_list('archived_at', 'id'))
+        self.gradebook = sorted(GradebookEntryHistory.objects.values_list('id', flat=True))
+        self.assertEqual(coldstore.archive('attendance', now - timedelta(days=200), chunk_size=4), len(old))
+        coldstore.archive('gradebook', now, chunk_size=3)
+
+    def page(self, **cursor):
+        return keyset_page(AttendanceHistory.objects.all(), size=5, archived=coldstore.ArchiveQuery('attendance'),
+                           **cursor)
+
+    def search(self, q):
+        return sorted(row['id'] for row in exports.iter_rows(
+            exports.attendance_history_queryset(q), exports.ATTENDANCE_FIELDS,
+            archived=coldstore.ArchiveQuery('attendance', q)))
+
+    def test_pages_merge_live_and_archived(self):
+        self.assertTrue(AttendanceHistory.objects.exists())
+        seen, before = [], None
+        while True:
+            items, before, _ = self.page(before=before)
+            seen.extend((row.archived_at, row.id) for row in items)
+            if not before:
+                break
+        self.assertEqual(seen, self.attendance)
+        # and back from the second page to the first
+        first, older, _ = self.page()
+        _, _, newer = self.page(before=older)
+        self.assertEqual([row.id for row in self.page(after=newer)[0]], [row.id for row in first])
+
+    def test_exports_merge_in_id_order(self):
+        self.assertFalse(GradebookEntryHistory.objects.exists())
+        rows = list(exports.iter_rows(GradebookEntryHistory.objects.all(), exports.GRADEBOOK_FIELDS, chunk_size=4,
+                                      archived=coldstore.ArchiveQuery('gradebook')))
+        self.assertEqual([row['id'] for row in rows], self.gradebook)
+        rows = list(exports.iter_rows(AttendanceHistory.objects.all(), exports.ATTENDANCE_FIELDS, chunk_size=4,
+                                      after_id=10, archived=coldstore.ArchiveQuery('attendance')))
+        self.assertEqual([row['id'] for row in rows], sorted(pk for _, pk in self.attendance if pk > 10))
+
+    def test_search_covers_deleted_students(self):
+        student = self.students[1]
+        live = list(AttendanceHistory.objects.filter(student=student).values_list('id', flat=True))
+        archived = [row['id'] for b in coldstore.blocks('attendance') for row in coldstore.read_block(b)
+                    if row['student_id'] == student.id]
+        self.assertTrue(live and archived)
+        self.assertEqual(self.search('رضا کر'), sorted(live + archived))
+        student.delete()
+        # the name stored in the segment still matches, word by word and only as a prefix
+        self.assertEqual(self.search('رضا کر'), sorted(archived))
+        self.assertEqual(self.search('کریمی رض'), sorted(archived))
+        self.assertEqual(self.search('ضا'), [])
+
+    def test_rows_both_archived_and_live_are_listed_once(self):
+        # a crash between writing the last batch and deleting its rows
+        rows = [row for b in coldstore.blocks('attendance') for row in coldstore.read_block(b)]
+        AttendanceHistory.objects.bulk_create([
+            AttendanceHistory(id=row['id'], student_id=row['student_id'], date=row['date'], present=row['present'],
+                              archived_at=row['archived_at'])
+            for row in rows[:3]])
+        ids = [row['id'] for row in exports.iter_rows(AttendanceHistory.objects.all(), exports.ATTENDANCE_FIELDS,
+                                                      archived=coldstore.ArchiveQuery('attendance'))]
+        self.assertEqual(ids, sorted(pk for _, pk in self.attendance))
+        seen, before = [], None
+        while True:
+            items, before, _ = self.page(before=before)
+            seen.extend(row.id for row in items)
+            if not before:
+                break
+        self.assertEqual(sorted(seen), sorted(pk for _, pk in self.attendance))
+
+    def test_rewrite_does_not_change_blocks_already_read(self):
+        gone = self.students[0].id
+        before = coldstore.blocks('gradebook')
+        expected = [row for b in before for row in coldstore.read_block(b)]
+        self.assertTrue(any(row['student_id'] == gone for row in expected))
+        self.assertTrue(coldstore.purge_students([gone]))
+        self.assertEqual([row for b in before for row in coldstore.read_block(b)], expected)
+        after = [row for b in coldstore.blocks('gradebook') for row in coldstore.read_block(b)]
+        self.assertEqual(after, [row for row in expected if row['student_id'] != gone])
+
+    def test_crash_after_the_switch(self):
+        gone = self.students[0].id
+        expected = [row for b in coldstore.blocks('gradebook') for row in coldstore.read_block(b)
+                    if row['student_id'] != gone]
+        real_replace = coldstore.os.replace
+
+        def crash(src, dst):
+            if str(src).endswith('.seg.tmp'):
+                raise OSError('crash')
+            real_replace(src, dst)
+
+        with mock.patch.object(coldstore.os, 'replace', crash), self.assertRaises(OSError):
+            coldstore.purge_students([gone])
+        # readers use the new segment, and the next writer moves it into place
+        self.assertEqual([row for b in coldstore.blocks('gradebook') for row in coldstore.read_block(b)], expected)
+        self.assertEqual(coldstore.purge_students([gone]), 0)
+        self.assertFalse(list(coldstore.HISTORY_ARCHIVE_DIR.glob('*.tmp')))
+        self.assertEqual([row for b in coldstore.blocks('gradebook') for row in coldstore.read_block(b)], expected)
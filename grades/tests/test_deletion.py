@@ -0,0 +1,98 @@
+import tempfile
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.apps import apps
+from django.db import models
+from django.test import TestCase
+from django.utils import timezone
+
+from grades import coldstore, deletion, resets
+from grades.models import Grade, SchoolClass, ScoreBucket, Student, StudentAverage, Subject
+
+from .utils import SchoolFixture, legacy_average
+
+
+def referencing(target, ids):
+    """{model label: rows} of every grades table pointing at ``target`` rows with these ids."""
+    found = Counter()
+    for model in apps.get_app_config('grades').get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.ForeignKey) and field.related_model is target:
+                count = model.objects.filter(**{f'{field.name}__in': ids}).count()
+                if count:
+                    found[model._meta.label] += count
+    return found
+
+
+@mock.patch.object(deletion, 'DELETE_PAUSE', 0)
+class DeleteClassTests(SchoolFixture, TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school(grade_level=7)
+            self.other, self.others = self.make_school(name='کلاس ۲', grade_level=7)
+            resets.archive_gradebook(self.sc.id)
+            # a student of another class (moved away) with a grade in one of this class's subjects
+            self.moved = self.others[0]
+            Grade.objects.create(student=self.moved, subject=self.sc.subjects.get(name='ریاضی'), score=Decimal('4'))
+        self.student_ids = [s.id for s in self.students]
+        self.subject_ids = list(self.sc.subjects.values_list('id', flat=True))
+
+    def assertDeleted(self):
+        self.assertFalse(SchoolClass.objects.filter(id=self.sc.id).exists())
+        self.assertEqual(referencing(Student, self.student_ids), Counter())
+        self.assertEqual(referencing(Subject, self.subject_ids), Counter())
+        self.assertEqual(referencing(SchoolClass, [self.sc.id]), Counter())
+        self.assertFalse(ScoreBucket.objects.filter(scope=f'class:{self.sc.id}', count__gt=0).exists())
+        # the other class is untouched, apart from the moved student's grade
+        self.assertEqual(Student.objects.filter(classroom=self.other).count(), 5)
+        self.assertEqual(StudentAverage.objects.get(student=self.moved).average, legacy_average(self.moved))
+
+    def test_removes_every_dependent_row(self):
+        self.assertTrue(referencing(Student, self.student_ids)['grades.GradebookEntryHistory'])
+        reports = []
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion.delete_class(self.sc.id, chunk_size=3, progress=lambda *p: reports.append(p))
+        self.assertDeleted()
+        self.assertEqual(reports[-1][0], reports[-1][1])
+        self.assertEqual([done for done, _ in reports], sorted(done for done, _ in reports))
+
+    def test_interrupted_run_is_finished_by_the_next(self):
+        delete_chunk = deletion.delete_chunk
+        calls = []
+
+        def flaky(qs, chunk_size):
+            calls.append(qs.model)
+            if len(calls) == 6:
+                raise RuntimeError('crash')
+            return delete_chunk(qs, chunk_size)
+
+        with mock.patch.object(deletion, 'delete_chunk', flaky), self.assertRaises(RuntimeError):
+            deletion.delete_class(self.sc.id, chunk_size=4)
+        self.assertTrue(SchoolClass.objects.filter(id=self.sc.id).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion.delete_class(self.sc.id, chunk_size=4)
+        self.assertDeleted()
+
+    def test_removes_archived_rows(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch.object(coldstore, 'HISTORY_ARCHIVE_DIR', Path(tmp.name)):
+            resets.archive_attendance()
+            resets.archive_gradebook()
+            for kind in coldstore.KINDS:
+                coldstore.archive(kind, timezone.now(), chunk_size=4)
+
+            def archived(kind):
+                return Counter(row['student_id'] in self.student_ids
+                               for block in coldstore.blocks(kind) for row in coldstore.read_block(block))
+
+            before = {kind: archived(kind) for kind in coldstore.KINDS}
+            self.assertTrue(all(counts[True] and counts[False] for counts in before.values()))
+            with self.captureOnCommitCallbacks(execute=True):
+                deletion.delete_class(self.sc.id, chunk_size=3)
+            for kind in coldstore.KINDS:
+                self.assertEqual(archived(kind), Counter({False: before[kind][False]}))
+        self.assertDeleted()
@@ -0,0 +1,39 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+
+from grades import exports, resets
+from grades.models import AttendanceHistory
+
+from .utils import SchoolFixture
+
+
+class ExportStreamingTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+        resets.archive_attendance()
+        self.user = User.objects.create_user('staff', password='x')
+
+    def test_asgi_export_streams_in_batches(self):
+        url = reverse('grades:export_attendance_history')
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'format': 'jsonl'})
+        self.assertFalse(response.is_async)
+        expected = b''.join(response.streaming_content)
+        self.assertEqual(expected.count(b'\n'), AttendanceHistory.objects.count())
+
+        async def fetch():
+            client = AsyncClient()
+            await client.aforce_login(self.user)
+            response = await client.get(url, {'format': 'jsonl'})
+            return response.is_async, [chunk async for chunk in response]
+
+        with mock.patch.object(exports, 'EXPORT_ASYNC_LINES', 5):
+            is_async, chunks = async_to_sync(fetch)()
+        # an async iterator is sent chunk by chunk instead of being read into a list first
+        self.assertTrue(is_async)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), expected)
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from io import BytesIO
+
+from django.test import TestCase
+
+from grades.imports import import_grades, import_roster, read_table
+from grades.models import Grade, Student, StudentAverage, Subject
+
+from .utils import SchoolFixture, legacy_average
+
+
+def table(text):
+    return read_table(BytesIO(text.encode('utf-8-sig')), 'sheet.csv')
+
+
+class RosterImportTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+
+    def test_creates_and_updates_by_roll_number(self):
+        rows = table('شماره دانش‌آموزی,نام و نام خانوادگی,کد ملی\n'
+                     '1,علی احمدی,0012345678\n'
+                     '\n'
+                     '6,سارا رضایی,0012345679\n')
+        self.assertEqual(rows[0], {'roll_number': '1', 'full_name': 'علی احمدی', 'national_id': '0012345678'})
+        result = import_roster(self.sc, rows)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Student.objects.get(pk=self.students[0].pk).full_name, 'علی احمدی')
+        self.assertEqual(Student.objects.get(classroom=self.sc, roll_number=6).national_id, '0012345679')
+
+    def test_any_bad_row_writes_nothing(self):
+        rows = table('roll_number,full_name,national_id\n'
+                     '7,الف,0012345670\n'
+                     '8,ب,abc\n'
+                     '7,ج,0012345671\n')
+        result = import_roster(self.sc, rows)
+        self.assertFalse(result.ok)
+        self.assertEqual([n for n, _ in result.errors], [3, 4])
+        self.assertEqual(Student.objects.filter(classroom=self.sc).count(), 5)
+
+    def test_repeated_national_id(self):
+        Student.objects.filter(pk=self.students[0].pk).update(national_id='0012345678')
+        rows = table('roll_number,full_name,national_id\n'
+                     '7,الف,0012345670\n'
+                     '8,ب,0012345670\n'
+                     '9,ج,0012345678\n')
+        result = import_roster(self.sc, rows)
+        self.assertEqual([n for n, _ in result.errors], [3, 4])
+        self.assertEqual(Student.objects.filter(classroom=self.sc).count(), 5)
+
+
+class GradeImportTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+
+    def test_creates_updates_and_refreshes_scores(self):
+        a, b, *_ = self.students
+        result = import_grades(self.sc, table('roll_number,ریاضی,علوم\n1,10,\n2,,17.5\n'))
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(Grade.objects.get(student=a, subject__name='ریاضی').score, Decimal('10'))
+        self.assertEqual(Grade.objects.get(student=b, subject__name='علوم').score, Decimal('17.5'))
+        self.assertEqual(StudentAverage.objects.get(student=a).average, legacy_average(a))
+
+    def test_unknown_subjects_and_students(self):
+        rows = table('roll_number,ریاضی,ادبیات\n1,10,12\n')
+        result = import_grades(self.sc, rows)
+        self.assertEqual([n for n, _ in result.errors], [1])
+        self.assertFalse(Subject.objects.filter(name='ادبیات').exists())
+
+        result = import_grades(self.sc, table('roll_number,ریاضی\n1,30\n99,10\n'))
+        self.assertEqual([n for n, _ in result.errors], [2, 3])
+        self.assertEqual(Grade.objects.get(student=self.students[0], subject__name='ریاضی').score, Decimal('18.5'))
+
+        result = import_grades(self.sc, rows, create_subjects=True)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(Grade.objects.get(student=self.students[0], subject__name='ادبیات').score, Decimal('12'))
+
+    def test_repeated_student(self):
+        a = self.students[0]
+        Student.objects.filter(pk=a.pk).update(national_id='0012345678')
+        # a new grade twice, and the same student by roll number and by national ID
+        for sheet in ('roll_number,علوم\n2,10\n2,11\n',
+                      'roll_number,national_id,ریاضی\n1,,10\n,0012345678,11\n'):
+            with self.subTest(sheet=sheet):
+                result = import_grades(self.sc, table(sheet))
+                self.assertEqual([n for n, _ in result.errors], [3])
+        self.assertEqual(Grade.objects.get(student=a, subject__name='ریاضی').score, Decimal('18.5'))
+        self.assertFalse(Grade.objects.filter(student=self.students[1], subject__name='علوم').exists())
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from grades import jobs
+from grades.models import Job
+
+
+def sample_job(progress, fail=False):
+    if fail:
+        raise RuntimeError('boom')
+    progress(1, 1)
+
+
+@mock.patch.object(jobs, 'JOBS_IN_PROCESS', False)
+@mock.patch.dict(jobs.JOB_HANDLERS, {'sample': 'grades.tests.test_jobs.sample_job'})
+class JobQueueTests(TestCase):
+    def test_claim_takes_each_due_job_once(self):
+        first = jobs.enqueue('sample', 'first')
+        later = jobs.enqueue('sample', 'later')
+        Job.objects.filter(id=later.id).update(run_after=timezone.now() + timedelta(hours=1))
+        second = jobs.enqueue('sample', 'second')
+        claimed = [jobs.claim('w1'), jobs.claim('w2'), jobs.claim('w3')]
+        self.assertEqual([job.id if job else None for job in claimed], [first.id, second.id, None])
+        self.assertEqual((claimed[0].status, claimed[0].worker, claimed[0].attempts), ('running', 'w1', 1))
+        self.assertIsNone(jobs.claim('w1', job_id=first.id))
+
+    def test_success(self):
+        jobs.enqueue('sample', 'ok')
+        jobs.execute(jobs.claim('w'))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.done, job.total, job.percent), ('done', 1, 1, 100))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_back_off_then_fail(self):
+        jobs.enqueue('sample', 'bad', max_attempts=2, fail=True)
+        started = timezone.now()
+        with self.assertLogs('grades.jobs', 'ERROR'):
+            jobs.execute(jobs.claim('w'))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), ('pending', 1, 'boom'))
+        self.assertGreaterEqual(job.run_after, started + timedelta(seconds=jobs.JOB_RETRY_DELAY))
+        self.assertIsNone(jobs.claim('w'))  # not due yet
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('grades.jobs', 'ERROR'):
+            jobs.execute(jobs.claim('w'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNone(jobs.claim('w'))
+
+        jobs.retry(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 0))
+        self.assertEqual(jobs.claim('w').id, job.id)
+
+    def test_requeue_stale(self):
+        for label in ('stalled', 'out of attempts', 'alive'):
+            jobs.enqueue('sample', label)
+        for _ in range(3):
+            jobs.claim('w')
+        old = timezone.now() - timedelta(seconds=jobs.JOB_STALE_AFTER + 1)
+        Job.objects.filter(label__in=['stalled', 'out of attempts']).update(heartbeat_at=old)
+        Job.objects.filter(label='out of attempts').update(attempts=3, max_attempts=3)
+        self.assertEqual(jobs.requeue_stale(), 2)
+        self.assertEqual(dict(Job.objects.values_list('label', 'status')),
+                         {'stalled': 'pending', 'out of attempts': 'failed', 'alive': 'running'})
+        self.assertEqual(jobs.claim('w2').label, 'stalled')
+
+    def test_resume_restarts_stalled_job_in_process(self):
+        job = jobs.enqueue('sample', 'cut off by a restart')
+        jobs.claim('web')
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(seconds=jobs.JOB_STALE_AFTER + 1))
+        job.refresh_from_db()
+        self.assertIs(jobs.resume(job), job)  # nothing without JOBS_IN_PROCESS
+        self.assertEqual(job.status, 'running')
+        with mock.patch.object(jobs, 'JOBS_IN_PROCESS', True), mock.patch.object(jobs, '_start') as start:
+            jobs.resume(job)
+        self.assertEqual(job.status, 'pending')
+        start.assert_called_once_with(job.id)
+
+    def test_failed_in_process_attempt_is_retried_when_due(self):
+        job = jobs.enqueue('sample', 'bad', fail=True)
+        with mock.patch.object(jobs.threading, 'Timer') as timer, self.assertLogs('grades.jobs', 'ERROR'):
+            jobs.run_in_thread(job.id)
+        delay, target = timer.call_args.args[:2]
+        self.assertAlmostEqual(delay, jobs.JOB_RETRY_DELAY, delta=5)
+        self.assertIs(target, jobs.run_in_thread)
+        self.assertEqual(timer.call_args.kwargs['args'], (job.id,))
+        timer.return_value.start.assert_called_once_with()
+
+    def test_heartbeat_while_the_handler_runs(self):
+        jobs.enqueue('sample', 'long step')
+        job = jobs.claim('w')
+        old = timezone.now() - timedelta(seconds=jobs.JOB_STALE_AFTER + 1)
+        Job.objects.update(heartbeat_at=old)
+        stop = mock.Mock()
+        stop.wait.side_effect = [False, False, True]
+        jobs._heartbeat(job, stop)
+        stop.wait.assert_called_with(jobs.JOB_HEARTBEAT_INTERVAL)
+        self.assertGreater(Job.objects.get().heartbeat_at, old)
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        # a later attempt, claimed elsewhere after a requeue, is left alone
+        Job.objects.update(heartbeat_at=old, worker='w2', attempts=2)
+        stop.wait.side_effect = [False, True]
+        jobs._heartbeat(job, stop)
+        self.assertEqual(Job.objects.get().heartbeat_at, old)
+
+    def test_execute_runs_the_heartbeat_until_done(self):
+        jobs.enqueue('sample', 'ok')
+        job = jobs.claim('w')
+        seen = []
+
+        def heartbeat(beating, stop):
+            seen.append((beating.id, stop))
+            stop.wait()
+
+        with mock.patch.object(jobs, '_heartbeat', heartbeat):
+            jobs.execute(job)
+        [(job_id, stop)] = seen
+        self.assertEqual(job_id, job.id)
+        self.assertTrue(stop.is_set())
+        self.assertEqual(Job.objects.get().status, 'done')
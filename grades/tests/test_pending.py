@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.test import TestCase
+
+from grades.pending import PendingIds
+
+
+class PendingIdsTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.pending = PendingIds(lambda **sets: self.calls.append(sets), 'student_ids', 'class_ids')
+
+    def test_one_flush_per_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.pending.add(student_ids=[1, 2])
+                self.pending.add(student_ids=[2, 3], class_ids=[7])
+        self.assertEqual(self.calls, [{'student_ids': {1, 2, 3}, 'class_ids': {7}}])
+
+    def test_empty_sets_are_not_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.add(student_ids=[])
+        self.assertEqual(self.calls, [])
+
+    def test_flush_may_schedule_more(self):
+        def flush(student_ids):
+            self.calls.append(student_ids)
+            if 1 in student_ids:
+                self.pending.add(student_ids=[2])
+
+        self.pending = PendingIds(flush, 'student_ids')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.add(student_ids=[1])
+        self.assertEqual(self.calls, [{1}, {2}])
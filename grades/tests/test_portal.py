@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+
+from grades.models import Student
+
+from .utils import SchoolFixture, legacy_average
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncPortalTests(SchoolFixture, TestCase):
+    """The async login and dashboard views, driven through the ASGI request handler."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school()
+        self.student = self.students[0]
+        Student.objects.filter(pk=self.student.pk).update(national_id='0012345678', password=make_password('secret'))
+        self.async_client = AsyncClient()
+
+    async def login(self, password='secret'):
+        return await self.async_client.post(reverse('grades:student_login'),
+                                            {'national_id': '0012345678', 'password': password})
+
+    async def test_login_and_dashboard(self):
+        response = await self.async_client.get(reverse('grades:student_dashboard'))
+        self.assertRedirects(response, reverse('grades:student_login'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('grades:student_login'))
+        self.assertEqual(response.status_code, 200)
+
+        response = await self.login('wrong')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context['error'])
+
+        response = await self.login()
+        self.assertRedirects(response, reverse('grades:student_dashboard'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('grades:student_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['student'], self.student)
+        self.assertEqual(response.context['student_average'], await sync_to_async(legacy_average)(self.student))
+        self.assertEqual(len(response.context['grades']), 2)
+        self.assertEqual(response.context['gradebook_total'], 5)
+
+        # a logged-in student is sent straight on to the dashboard
+        response = await self.async_client.get(reverse('grades:student_login'))
+        self.assertRedirects(response, reverse('grades:student_dashboard'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('grades:student_logout'))
+        self.assertRedirects(response, reverse('grades:student_login'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('grades:student_dashboard'))
+        self.assertRedirects(response, reverse('grades:student_login'), fetch_redirect_response=False)
+
+    async def test_dashboard_for_deleted_student(self):
+        await self.login()
+        await Student.objects.filter(pk=self.student.pk).adelete()
+        response = await self.async_client.get(reverse('grades:student_dashboard'))
+        self.assertRedirects(response, reverse('grades:student_login'), fetch_redirect_response=False)
@@ -0,0 +1,75 @@
+from collections import Counter
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from grades import rankings
+from grades.models import Grade, ScoreBucket, Student, StudentAverage
+
+from .utils import SchoolFixture
+
+
+class RankingTests(SchoolFixture, TestCase):
+    """ScoreBucket counts stay equal to a recount of the stored averages."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school(grade_level=7)
+            self.other, self.others = self.make_school(name='کلاس ۲', grade_level=7)
+
+    def assertBucketsMatch(self):
+        expected = Counter()
+        for classroom_id, level, average in Student.objects.values_list(
+                'classroom_id', 'classroom__grade_level', 'score_average__average'):
+            if average is not None:
+                expected[f'class:{classroom_id}', round(average * 100)] += 1
+                if level is not None:
+                    expected[f'level:{level}', round(average * 100)] += 1
+        self.assertFalse(ScoreBucket.objects.filter(count__lt=0).exists())
+        stored = {(scope, bucket): count for scope, bucket, count in
+                  ScoreBucket.objects.filter(count__gt=0).values_list('scope', 'bucket', 'count')}
+        self.assertEqual(stored, dict(expected))
+
+    def test_leaderboard_ranks(self):
+        self.assertBucketsMatch()
+        averages = dict(StudentAverage.objects.filter(student__classroom=self.sc).values_list('student_id', 'average'))
+        for row in rankings.class_leaderboard(self.sc)['rows']:
+            average = averages[row['student_id']]
+            if average is None:
+                self.assertIsNone(row['rank'])
+            else:
+                self.assertEqual(row['rank'], 1 + sum(1 for a in averages.values() if a is not None and a > average))
+
+    def test_after_saves_and_moves(self):
+        a, b, *_ = self.students
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.filter(student=a).update(score=Decimal('3'))
+            a.save()  # the update skipped the signals
+            b.classroom = self.other
+            b.roll_number = 99
+            b.save()
+        self.assertBucketsMatch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.grade_level = 8
+            self.other.save()
+        self.assertBucketsMatch()
+
+    def test_after_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.students[0].delete()
+            self.others[2].grades.all().delete()
+        self.assertBucketsMatch()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertBucketsMatch()
+
+    def test_after_reset_and_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('auto_reset', '--class-id', str(self.sc.id), stdout=StringIO())
+        self.assertBucketsMatch()
+        before = sorted(ScoreBucket.objects.filter(count__gt=0).values_list('scope', 'bucket', 'count'))
+        rankings.rebuild()
+        self.assertEqual(sorted(ScoreBucket.objects.filter(count__gt=0).values_list('scope', 'bucket', 'count')),
+                         before)
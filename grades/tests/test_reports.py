@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import time
+import zipfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from grades import jobs, reports
+from grades.models import Job, Student
+
+from .utils import SchoolFixture, legacy_average
+
+
+class ReportCardTests(SchoolFixture, TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school()
+            self.other, self.others = self.make_school(name='کلاس ۲')
+
+    def cards(self, **kwargs):
+        buf = io.BytesIO()
+        count = reports.write_report_cards([self.sc, self.other], buf, **kwargs)
+        with zipfile.ZipFile(buf) as archive:
+            files = {name: archive.read(name).decode('utf-8') for name in archive.namelist()}
+        self.assertEqual(count, len(files))
+        return files
+
+    def test_one_card_per_student(self):
+        files = self.cards(workers=1)
+        self.assertEqual(len(files), Student.objects.count())
+        for student in self.students + self.others:
+            with self.subTest(student=student.id):
+                matching = [body for body in files.values() if student.full_name in body
+                            and student.classroom.name in body]
+                self.assertEqual(len(matching), 1)
+        card = next(c for c in reports.class_cards(self.sc) if c['student']['id'] == self.students[1].id)
+        self.assertEqual(card['average'], legacy_average(self.students[1]))
+        self.assertEqual(card['attendance'],
+                         {'days': 3, 'present': 1, 'absent': 2, 'rate': 33.3, 'longest_absence': 2})
+
+    def test_process_pool_matches_serial(self):
+        self.assertEqual(self.cards(workers=2, batch_size=2), self.cards(workers=1))
+        self.assertEqual(self.cards(fmt='print', workers=2, batch_size=3).keys(), self.cards(workers=1).keys())
+
+    def test_class_download(self):
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        response = self.client.get(reverse('grades:class_report_cards', args=[self.sc.id]), {'format': 'print'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(len(archive.namelist()), len(self.students))
+
+    @mock.patch.object(jobs, 'JOBS_IN_PROCESS', False)
+    def test_whole_school_job(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        stale = os.path.join(tmp.name, 'report_cards_old.zip')
+        open(stale, 'wb').close()
+        os.utime(stale, (time.time() - (reports.REPORT_CARD_KEEP_DAYS + 1) * 86400,) * 2)
+
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        response = self.client.post(reverse('grades:report_cards'))
+        job = Job.objects.get(kind='report_cards')
+        self.assertRedirects(response, reverse('grades:job_status', args=[job.id]))
+        self.assertEqual(self.client.get(reverse('grades:job_file', args=[job.id])).status_code, 404)
+
+        with mock.patch.object(reports, 'REPORT_CARD_DIR', tmp.name):
+            jobs.execute(jobs.claim('w'))
+            response = self.client.get(reverse('grades:job_file', args=[job.id]))
+            with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+                self.assertEqual(len(archive.namelist()), Student.objects.count())
+        self.assertEqual(Job.objects.get(id=job.id).status, 'done')
+        self.assertEqual(os.listdir(tmp.name), [job.params['filename']])
+
+    @mock.patch.object(jobs, 'JOBS_IN_PROCESS', False)
+    def test_no_process_pool_in_the_web_process(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client.force_login(User.objects.create_user('staff', password='x'))
+        dashboard = self.client.get(reverse('grades:dashboard')).content.decode()
+        for fmt, query in (('html', ''), ('print', '?format=print')):
+            url = reverse('grades:report_cards') + query
+            self.assertIn(f'action="{url}"', dashboard)
+            self.client.post(url)
+            self.assertEqual(Job.objects.latest('id').params['fmt'], fmt)
+
+        html = Job.objects.order_by('id').first()
+        with mock.patch.object(reports, 'REPORT_CARD_DIR', tmp.name), \
+                mock.patch.object(reports, 'write_report_cards', wraps=reports.write_report_cards) as write:
+            jobs.run_in_thread(html.id)  # what JOBS_IN_PROCESS starts in a thread of the web process
+            jobs.execute(jobs.claim('w'))  # run_workers
+        self.assertEqual([c.kwargs['workers'] for c in write.call_args_list], [1, None])
+        self.assertFalse(jobs.in_web_process())
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
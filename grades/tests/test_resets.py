@@ -0,0 +1,58 @@
+from collections import Counter
+from unittest import mock
+
+from django.test import TestCase
+
+from grades import resets
+from grades.models import Attendance, AttendanceHistory, GradebookEntry, GradebookEntryHistory
+
+from .utils import SchoolFixture
+
+
+class ArchiveTests(SchoolFixture, TestCase):
+    """resets._archive moves every row of the scope to history exactly once."""
+
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+        self.other, self.others = self.make_school(name='کلاس ۲')
+
+    def rows(self, model, classroom):
+        fields = ['student_id', 'date', 'present'] if model in (Attendance, AttendanceHistory) else \
+            ['student_id', 'subject_id', 'entry_type', 'value', 'date']
+        return Counter(model.objects.filter(student__classroom=classroom).values_list(*fields))
+
+    def test_moves_each_row_once(self):
+        attendance, gradebook = self.rows(Attendance, self.sc), self.rows(GradebookEntry, self.sc)
+        untouched = self.rows(Attendance, self.other)
+        reports = []
+        self.assertEqual(resets.archive_attendance(self.sc.id, chunk_size=4, progress=lambda *p: reports.append(p)),
+                         sum(attendance.values()))
+        self.assertEqual(resets.archive_gradebook(self.sc.id, chunk_size=3), sum(gradebook.values()))
+        self.assertEqual(self.rows(AttendanceHistory, self.sc), attendance)
+        self.assertEqual(self.rows(GradebookEntryHistory, self.sc), gradebook)
+        self.assertFalse(self.rows(Attendance, self.sc) or self.rows(GradebookEntry, self.sc))
+        self.assertEqual(self.rows(Attendance, self.other), untouched)
+        self.assertEqual(reports[-1], (sum(attendance.values()), sum(attendance.values())))
+        # nothing left to move on a second run
+        self.assertEqual(resets.archive_attendance(self.sc.id, chunk_size=4), 0)
+        self.assertEqual(self.rows(AttendanceHistory, self.sc), attendance)
+
+    def test_interrupted_run_is_finished_by_the_next(self):
+        attendance = Counter(Attendance.objects.values_list('student_id', 'date', 'present'))
+        calls = []
+
+        def flaky(ids):
+            calls.append(ids)
+            if len(calls) == 3:
+                raise RuntimeError('crash')
+
+        with mock.patch.object(resets, 'schedule_refresh', flaky), self.assertRaises(RuntimeError):
+            resets.archive_attendance(chunk_size=5)
+        # the failed chunk rolled back whole: every row is in exactly one of the tables
+        moved = Counter(AttendanceHistory.objects.values_list('student_id', 'date', 'present'))
+        left = Counter(Attendance.objects.values_list('student_id', 'date', 'present'))
+        self.assertEqual(sum(moved.values()), 10)
+        self.assertEqual(moved + left, attendance)
+        resets.archive_attendance(chunk_size=5)
+        self.assertEqual(Counter(AttendanceHistory.objects.values_list('student_id', 'date', 'present')), attendance)
+        self.assertFalse(Attendance.objects.exists())
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+from zlib import crc32
+
+from django.test import TestCase
+from django.utils import timezone
+
+from grades import jobs, resets, scheduler
+from grades.models import Job, ResetSchedule, SchoolClass
+
+
+@mock.patch.object(jobs, 'JOBS_IN_PROCESS', False)
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.classes = [SchoolClass.objects.create(name=f'کلاس {n}') for n in range(1, 5)]
+        self.now = timezone.now()
+        scheduler.due(self.now)  # start tracking every class now
+
+    def queued(self, jobs):
+        return sorted(job.params['class_id'] for job in jobs)
+
+    def backdate(self, days=2):
+        ResetSchedule.objects.update(tracked_since=self.now - timedelta(days=days))
+
+    def test_stagger_offset(self):
+        offsets = {sc.id: scheduler.slot_offset(sc.id) for sc in self.classes}
+        for sc in self.classes:
+            with self.subTest(class_id=sc.id):
+                expected = scheduler.AUTO_RESET_WINDOW * crc32(str(sc.id).encode()) / 2 ** 32
+                self.assertEqual(offsets[sc.id], expected)
+                self.assertTrue(timedelta(0) <= offsets[sc.id] < scheduler.AUTO_RESET_WINDOW)
+                slot = scheduler.last_slot(sc.id, self.now)
+                self.assertTrue(slot <= self.now < slot + scheduler.AUTO_RESET_INTERVAL)
+                self.assertEqual(scheduler.next_slot(sc.id, self.now), slot + scheduler.AUTO_RESET_INTERVAL)
+                self.assertEqual((slot - scheduler._anchor() - offsets[sc.id]) % scheduler.AUTO_RESET_INTERVAL,
+                                 timedelta(0))
+        self.assertEqual(len(set(offsets.values())), len(offsets))
+
+    def test_new_classes_wait_for_their_next_slot(self):
+        self.assertEqual(scheduler.tick(self.now), [])
+        slots = {sc.id: scheduler.next_slot(sc.id, self.now) for sc in self.classes}
+        first = min(slots.values())
+        self.assertEqual(scheduler.tick(first - timedelta(seconds=1)), [])
+        self.assertEqual(self.queued(scheduler.tick(first)), [cid for cid, slot in slots.items() if slot == first])
+
+    def test_one_catch_up_after_missed_slots(self):
+        self.backdate(days=3)  # six missed slots each
+        queued = scheduler.tick(self.now)
+        self.assertEqual(self.queued(queued), sorted(sc.id for sc in self.classes))
+        self.assertEqual(scheduler.tick(self.now), [])  # already queued
+
+        for _ in queued:
+            jobs.execute(jobs.claim('w'))
+        self.assertFalse(Job.objects.exclude(status='done').exists())
+        self.assertFalse(ResetSchedule.objects.filter(last_success_at__isnull=True).exists())
+        self.assertEqual(scheduler.tick(self.now), [])
+        later = self.now + scheduler.AUTO_RESET_INTERVAL + scheduler.AUTO_RESET_WINDOW
+        self.assertEqual(len(scheduler.tick(later)), len(self.classes))
+
+    def test_most_overdue_first_within_the_limit(self):
+        self.backdate()
+        expected = sorted(self.classes, key=lambda sc: scheduler.last_slot(sc.id, self.now))
+        first = scheduler.tick(self.now, limit=3)
+        self.assertEqual([job.params['class_id'] for job in first], [sc.id for sc in expected[:3]])
+        self.assertEqual(self.queued(scheduler.tick(self.now, limit=3)), [expected[3].id])
+
+    def test_skips_class_with_active_reset(self):
+        self.backdate()
+        pending, running, finished = self.classes[:3]
+        jobs.enqueue('reset', 'manual', class_id=pending.id)
+        jobs.enqueue('reset', 'manual', class_id=running.id)
+        jobs.claim('w')  # the oldest job, for `pending`, is now running
+        jobs.enqueue('reset', 'manual', class_id=running.id)
+        done = jobs.enqueue('reset', 'old', class_id=finished.id)
+        Job.objects.filter(id=done.id).update(status='done')
+        self.assertEqual(self.queued(scheduler.tick(self.now)), [finished.id, self.classes[3].id])
+        self.assertTrue(all(row['queued'] for row in scheduler.overview(self.now)))
+
+    def test_class_lock(self):
+        sc = self.classes[0]
+        with resets.class_lock(sc.id):
+            with self.assertRaises(resets.ResetInProgress):
+                resets.reset(class_id=sc.id)
+        resets.reset(class_id=sc.id)
+        state = ResetSchedule.objects.get(classroom=sc)
+        self.assertIsNone(state.running_since)
+        self.assertIsNotNone(state.last_success_at)
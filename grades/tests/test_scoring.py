@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from grades.models import Attendance, GradebookEntry, StudentAverage, StudentSubjectScore
+from grades.scoring import average_from_scores, class_scores, effective_score, stored_averages
+
+from .utils import SchoolFixture, legacy_average
+
+
+class ScoringTests(SchoolFixture, TestCase):
+    def setUp(self):
+        self.sc, self.students = self.make_school()
+
+    def test_effective_score(self):
+        self.assertIsNone(effective_score(None, []))
+        self.assertEqual(effective_score(12.0, []), 12.0)
+        # the latest 'num' wins; pos/neg apply by absolute value whatever their order
+        self.assertEqual(effective_score(12.0, [('num', 14), ('pos', Decimal('-1')), ('num', 16), ('neg', 2)]), 15.0)
+        self.assertEqual(effective_score(None, [('pos', 1)]), None)
+        self.assertEqual(effective_score(None, [('pos', 1), ('num', 10), ('pos', None)]), 11.0)
+
+    def test_average_from_scores(self):
+        self.assertIsNone(average_from_scores([], 3))
+        self.assertEqual(average_from_scores([15.0, 18.0], 2), 16.1)
+        self.assertEqual(average_from_scores([21.0], 0), 20.0)
+        self.assertEqual(average_from_scores([1.0], 10), 0.0)
+
+    def test_class_scores_match_legacy_average(self):
+        scores = class_scores(self.sc)
+        self.assertEqual(set(scores), {s.id for s in self.students})
+        for student in self.students:
+            with self.subTest(student=student.roll_number):
+                self.assertEqual(scores[student.id]['average'], legacy_average(student))
+                self.assertEqual(student.average(), legacy_average(student))
+        self.assertIsNone(scores[self.students[4].id]['average'])
+        self.assertEqual(scores[self.students[1].id]['absences'], 2)
+
+    def test_subset_matches_whole_class(self):
+        subset = [self.students[0].id, self.students[3].id]
+        whole = class_scores(self.sc)
+        self.assertEqual(class_scores(self.sc, student_ids=subset), {sid: whole[sid] for sid in subset})
+
+
+class MaterializedScoreTests(SchoolFixture, TestCase):
+    """StudentAverage / StudentSubjectScore follow every write (refreshed on commit)."""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sc, self.students = self.make_school()
+
+    def assertMaterialized(self):
+        live = class_scores(self.sc)
+        self.assertEqual(stored_averages(self.sc), {s.id: legacy_average(s) for s in self.students})
+        subject_scores = {(r.student_id, r.subject_id): r.score
+                          for r in StudentSubjectScore.objects.filter(student__classroom=self.sc)}
+        self.assertEqual(subject_scores, {(sid, subj): score for sid, row in live.items()
+                                          for subj, score in row['subjects'].items() if score is not None})
+
+    def test_after_create(self):
+        self.assertMaterialized()
+
+    def test_after_grade_and_entry_saves(self):
+        a, b, *_ = self.students
+        with self.captureOnCommitCallbacks(execute=True):
+            grade = a.grades.get(subject__name='ریاضی')
+            grade.score = Decimal('7')
+            grade.save()
+            GradebookEntry.objects.create(student=b, subject=grade.subject, entry_type='num', value=Decimal('20'),
+                                          date=date(2024, 10, 5))
+        self.assertMaterialized()
+        self.assertEqual(StudentAverage.objects.get(student=b).average, legacy_average(b))
+
+    def test_after_deletes(self):
+        a, b, c, d, _ = self.students
+        with self.captureOnCommitCallbacks(execute=True):
+            a.gradebook_entries.filter(entry_type='num').delete()
+            c.grades.all().delete()
+            d.attendances.filter(date__gt=date(2024, 10, 5)).delete()
+        self.assertMaterialized()
+        self.assertIsNone(StudentAverage.objects.get(student=c).average)
+
+    def test_after_attendance_change(self):
+        b = self.students[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(student=b).update(present=True)  # bypasses signals
+            Attendance.objects.create(student=b, date=date(2024, 11, 1), present=False)
+        self.assertMaterialized()
+        self.assertEqual(StudentAverage.objects.get(student=b).absences, 1)
+
+    def test_after_reset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('auto_reset', '--class-id', str(self.sc.id), stdout=StringIO())
+        self.assertFalse(GradebookEntry.objects.exists() or Attendance.objects.exists())
+        self.assertMaterialized()
+        self.assertFalse(StudentAverage.objects.filter(absences__gt=0).exists())
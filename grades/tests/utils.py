@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from grades.models import Attendance, Grade, GradebookEntry, SchoolClass, Student, Subject
+
+
+def legacy_average(student):
+    """Student.average() as it was before grades.scoring: one query per subject."""
+    scores = []
+    for subject in student.classroom.subjects.all():
+        grade = student.grades.filter(subject=subject).first()
+        base = float(grade.score) if grade else None
+        entries = list(student.gradebook_entries.filter(subject=subject).order_by('created_at'))
+        nums = [e for e in entries if e.entry_type == 'num' and e.value is not None]
+        effective = float(nums[-1].value) if nums else base
+        adjustments = sum(abs(float(e.value)) * (1 if e.entry_type == 'pos' else -1)
+                          for e in entries if e.value is not None and e.entry_type in ('pos', 'neg'))
+        if effective is not None:
+            scores.append(effective + adjustments)
+    if not scores:
+        return None
+    absences = student.attendances.filter(present=False).count()
+    return round(max(0.0, min(20.0, sum(scores) / len(scores) - absences * 0.2)), 2)
+
+
+class SchoolFixture:
+    """A class with two subjects and students covering the scoring rules."""
+
+    def make_school(self, name='کلاس ۱', grade_level=None):
+        sc = SchoolClass.objects.create(name=name, grade_level=grade_level)
+        math = Subject.objects.create(classroom=sc, name='ریاضی')
+        science = Subject.objects.create(classroom=sc, name='علوم')
+        students = [Student.objects.create(classroom=sc, full_name=f'دانش‌آموز {n}', roll_number=n)
+                    for n in range(1, 6)]
+        a, b, c, d, _ = students  # the last one has no grades at all
+        Grade.objects.create(student=a, subject=math, score=Decimal('18.5'))
+        Grade.objects.create(student=a, subject=science, score=Decimal('12'))
+        Grade.objects.create(student=b, subject=math, score=Decimal('15'))
+        Grade.objects.create(student=c, subject=math, score=Decimal('19.75'))
+        Grade.objects.create(student=d, subject=science, score=Decimal('2'))
+        day = date(2024, 10, 1)
+        for student, subject, entry_type, value in [
+            (a, math, 'pos', '1'), (a, math, 'neg', '-0.5'), (a, science, 'num', '14'),
+            (a, science, 'num', '16'), (a, science, 'pos', '0.25'),
+            (b, science, 'num', '11'),  # override without a base grade
+            (c, math, 'pos', '1'),  # above 20 before the clamp
+            (d, science, 'neg', '1'),
+        ]:
+            GradebookEntry.objects.create(student=student, subject=subject, entry_type=entry_type,
+                                          value=Decimal(value), date=day)
+        for n in range(3):
+            Attendance.objects.create(student=b, date=day + timedelta(days=n), present=n == 0)
+        for n in range(15):
+            Attendance.objects.create(student=d, date=day + timedelta(days=n), present=False)
+        return sc, students
@@ -12,9 +12,12 @@ urlpatterns = [
     path('class/add/', views.add_class, name='add_class'),
     path('class/<int:class_id>/', views.class_detail, name='class_detail'),
     path('class/<int:class_id>/student/add/', views.add_student, name='add_student'),
+    path('class/<int:class_id>/import/', views.import_data, name='import_data'),
     path('class/<int:class_id>/subject/add/', views.add_subject, name='add_subject'),
     path('class/<int:class_id>/subjects/', views.manage_subjects, name='manage_subjects'),
+    path('class/<int:class_id>/subject/<int:subject_id>/stats/', views.subject_statistics, name='subject_statistics'),
     path('class/<int:class_id>/attendance/', views.mark_attendance, name='mark_attendance'),
+    path('class/<int:class_id>/attendance/summary/', views.attendance_summary, name='attendance_summary'),
     path('class/<int:class_id>/delete/', views.delete_class, name='delete_class'),
     path('student/<int:student_id>/grades/', views.student_grades, name='student_grades'),
     path('student/<int:student_id>/delete/', views.delete_student, name='delete_student'),
@@ -26,11 +29,23 @@ urlpatterns = [
     path('attendance/<int:student_id>/<str:date>/delete/', views.delete_attendance_entry, name='delete_attendance_entry'),
     path('class/<int:class_id>/attendance/reset/', views.reset_attendance, name='reset_attendance'),
     path('class/<int:class_id>/gradebook/reset/', views.reset_gradebook, name='reset_gradebook'),
+    # report cards (zip)
+    path('class/<int:class_id>/report-cards/', views.report_cards, name='class_report_cards'),
+    path('report-cards/', views.report_cards, name='report_cards'),
+    # student directory search
+    path('search/', views.student_search, name='student_search'),
+    path('search/autocomplete/', views.student_autocomplete, name='student_autocomplete'),
     # histories
     path('attendance/history/', views.attendance_history, name='attendance_history'),
     path('gradebook/history/', views.gradebook_history, name='gradebook_history'),
+    path('attendance/history/export/', views.export_attendance_history, name='export_attendance_history'),
+    path('gradebook/history/export/', views.export_gradebook_history, name='export_gradebook_history'),
     path('attendance/history/clear/', views.clear_attendance_history, name='clear_attendance_history'),
     path('gradebook/history/clear/', views.clear_gradebook_history, name='clear_gradebook_history'),
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/retry/', views.retry_job, name='retry_job'),
+    path('jobs/<int:job_id>/file/', views.job_file, name='job_file'),
     
     # Student login and dashboard
     path('student/login/', views.student_login_view, name='student_login'),
@@ -1,3 +1,10 @@
+import asyncio
+import os
+import tempfile
+import uuid
+from datetime import date
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
@@ -6,10 +13,22 @@ from .models import SchoolClass, Student, Subject, Grade, Attendance
 from .forms import ClassForm, StudentForm, SubjectForm, GradeForm
 from .forms import GradebookEntryForm, AttendanceDateForm, StudentLoginForm
 from .models import GradebookEntry
-from .forms import StudentEditForm
-from .models import AttendanceHistory, GradebookEntryHistory
-from django.db.models import Q
-from django.contrib.sessions.models import Session
+from .forms import StudentEditForm, ImportForm
+from .models import Job
+from .scoring import stored_averages, stored_average, astored_average
+from . import analytics, caching, coldstore, exports, imports, jalali, jobs, rankings, reports, scheduler, search
+from . import attendance
+from .attendance import upsert_roster
+from .auth import StudentBackend
+from .pagination import keyset_page
+from django.db.models import Sum, Count
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.template.backends.utils import csrf_input
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 
 # Configurable maximum number of initial subjects when first adding students to a class
 MAX_INITIAL_SUBJECTS = 13
@@ -31,7 +50,7 @@ def login_view(request):
 
 @login_required
 def dashboard(request):
-    classes = SchoolClass.objects.all().order_by('name')
+    classes = SchoolClass.objects.with_stats().order_by('name')
     return render(request, 'grades/dashboard.html', {'classes': classes})
 
 @login_required
@@ -46,39 +65,103 @@ def add_class(request):
         form = ClassForm()
     return render(request, 'grades/add_class.html', {'form': form})
 
-@login_required
-def class_detail(request, class_id):
-    sc = get_object_or_404(SchoolClass, id=class_id)
-    students = sc.students.all().order_by('roll_number', 'full_name')
+CLASS_PAGE_CACHE_TIMEOUT = 60 * 60
+CLASS_PAGE_ATTENDANCE_ROWS = 200
+# stands in for {% csrf_token %} in the cached class page body (tokens are per session)
+CSRF_SLOT = '<!--csrf-->'
+
+
+def _url_pattern(name):
+    """'/student/{}/grades/'-style format string for a URL taking one id."""
+    return reverse(name, args=[987654321]).replace('987654321', '{}')
+
+
+def _class_page_context(sc):
+    """Precomputed rows for the class page body, so the template does no lookups."""
+    students = sc.students.order_by('roll_number', 'full_name').values_list('id', 'full_name')
     subjects = sc.subjects.all().order_by('id')
 
     # محاسبه معدل هر دانش‌آموز (server-side) و جمع/معدل کلاس
-    student_averages = {}
-    class_total = 0.0
-    class_grade_count = 0
-
-    for s in students:
-        avg = s.average()
-        student_averages[s.id] = avg
-        # اضافه کردن به آمار کلاس
-        grades = s.grades.all()
-        for g in grades:
-            class_total += float(g.score)
-            class_grade_count += 1
-
+    # averages come from the materialized StudentAverage table
+    student_averages = stored_averages(sc)
+    totals = Grade.objects.filter(student__classroom=sc).aggregate(total=Sum('score'), n=Count('id'))
+    class_total = float(totals['total'] or 0)
+    class_grade_count = totals['n']
     class_avg = round(class_total / class_grade_count, 2) if class_grade_count else None
-    class_total = round(class_total, 2)
+
+    urls = {name: _url_pattern(f'grades:{name}')
+            for name in ('student_grades', 'gradebook', 'edit_student', 'delete_student')}
+    roster = [
+        {
+            'number': n,
+            'full_name': full_name,
+            'average': student_averages.get(sid),
+            'grades_url': urls['student_grades'].format(sid),
+            'gradebook_url': urls['gradebook'].format(sid),
+            'edit_url': urls['edit_student'].format(sid),
+            'delete_url': urls['delete_student'].format(sid),
+        }
+        for n, (sid, full_name) in enumerate(students, start=1)
+    ]
+
+    # per-subject statistics (mean, median, spread, histogram)
+    subject_stats = analytics.subject_stats(analytics.load_matrix(sc))
+    stats_by_name = {st['subject']: st for st in subject_stats}
+    subject_stats = [dict(stats_by_name.get(subj.name, {}), subject_id=subj.id, subject=subj.name) for subj in subjects]
+
     # attendance records for this class (recent first)
-    attendances = Attendance.objects.filter(student__classroom=sc).order_by('-date', '-id')[:200]
+    delete_attendance = (reverse('grades:delete_attendance_entry', args=[987654321, 'DATE'])
+                         .replace('987654321', '{0}').replace('DATE', '{1}'))
+    attendance_rows = [
+        {
+            'date': date_j or d,
+            'full_name': full_name,
+            'present': present,
+            'delete_url': delete_attendance.format(sid, d.isoformat()),
+        }
+        for d, date_j, full_name, present, sid in Attendance.objects.filter(student__classroom=sc)
+        .order_by('-date', '-id')
+        .values_list('date', 'date_jalali', 'student__full_name', 'present', 'student_id')[:CLASS_PAGE_ATTENDANCE_ROWS]
+    ]
+    return {
+        'class': sc,
+        'roster': roster,
+        'class_avg': class_avg,
+        'subject_stats': subject_stats,
+        'attendance_rows': attendance_rows,
+        'csrf_slot': mark_safe(CSRF_SLOT),
+    }
+
 
+@login_required
+def class_detail(request, class_id):
+    sc = get_object_or_404(SchoolClass, id=class_id)
+    # The page body is cached per class version (bumped by signals and bulk
+    # writes), so repeated views of an unchanged class skip queries and rendering.
+    key = caching.class_page_key(sc.id)
+    body = cache.get(key)
+    if body is None:
+        body = render_to_string('grades/class_detail_body.html', _class_page_context(sc))
+        cache.set(key, body, CLASS_PAGE_CACHE_TIMEOUT)
     return render(request, 'grades/class_detail.html', {
         'class': sc,
-        'students': students,
-        'subjects': subjects,
-        'student_averages': student_averages,
-        'class_total': class_total,
-        'class_avg': class_avg,
-        'attendances': attendances,
+        'body': mark_safe(body.replace(CSRF_SLOT, str(csrf_input(request)))),
+        # not part of the cached body: level ranks depend on other classes
+        'leaderboard': rankings.class_leaderboard(sc),
+    })
+
+
+@login_required
+def subject_statistics(request, class_id, subject_id):
+    sc = get_object_or_404(SchoolClass, id=class_id)
+    subject = get_object_or_404(Subject, id=subject_id, classroom=sc)
+    matrix = analytics.load_matrix(sc)
+    stats = {st['subject']: st for st in analytics.subject_stats(matrix)}.get(subject.name, {'count': 0})
+    return render(request, 'grades/subject_statistics.html', {
+        'class': sc,
+        'subject': subject,
+        'stats': stats,
+        'rows': analytics.subject_breakdown(matrix, subject.name),
     })
 
 @login_required
@@ -110,6 +193,33 @@ def add_student(request, class_id):
         form = StudentForm()
     return render(request, 'grades/add_student.html', {'form': form, 'class': sc})
 
+@login_required
+def import_data(request, class_id):
+    sc = get_object_or_404(SchoolClass, id=class_id)
+    errors = []
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                rows = imports.read_table(upload, upload.name)
+            except Exception as e:
+                rows = None
+                messages.error(request, f'خطا در خواندن فایل: {e}')
+            if rows is not None:
+                if form.cleaned_data['kind'] == 'roster':
+                    result = imports.import_roster(sc, rows)
+                else:
+                    result = imports.import_grades(sc, rows, create_subjects=form.cleaned_data['create_subjects'])
+                if result.ok:
+                    messages.success(request, f'ورود اطلاعات انجام شد ({result.created} مورد جدید، {result.updated} مورد به‌روزرسانی).')
+                    return redirect('grades:class_detail', class_id=sc.id)
+                errors = result.errors
+                messages.error(request, f'{len(errors)} خطا در فایل پیدا شد؛ هیچ اطلاعاتی ذخیره نشد.')
+    else:
+        form = ImportForm()
+    return render(request, 'grades/import_data.html', {'form': form, 'class': sc, 'errors': errors})
+
 @login_required
 def add_subject(request, class_id):
     sc = get_object_or_404(SchoolClass, id=class_id)
@@ -184,22 +294,17 @@ def mark_attendance(request, class_id):
     if request.method == 'POST':
         form = AttendanceDateForm(request.POST)
         if form.is_valid():
-            date = form.cleaned_data['date']
-            for stu in students:
-                present = request.POST.get(f'present_{stu.id}') == 'on'
-                Attendance.objects.update_or_create(student=stu, date=date, defaults={'present': present})
-            messages.success(request, 'حضور/غیاب ذخیره شد.')
+            dates = form.dates()
+            marks = {stu.id: request.POST.get(f'present_{stu.id}') == 'on' for stu in students}
+            upsert_roster(marks, dates)
+            if len(dates) > 1:
+                messages.success(request, f'حضور/غیاب برای {len(dates)} روز ذخیره شد.')
+            else:
+                messages.success(request, 'حضور/غیاب ذخیره شد.')
             return redirect('grades:class_detail', class_id=sc.id)
     else:
-        import datetime
-        today = datetime.date.today()
-        # convert today's date to Jalali string for display in the form
-        try:
-            import jdatetime
-            jd = jdatetime.date.fromgregorian(date=today)
-            today_j = f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
-        except Exception:
-            today_j = today.isoformat()
+        # today's date as a Jalali string for display in the form
+        today_j = jalali.today_jalali()
         form = AttendanceDateForm(initial={'date': today_j})
 
     existing_map = {}
@@ -211,9 +316,7 @@ def mark_attendance(request, class_id):
             existing_map = {a.student_id: a.present for a in atts}
             # set initial to Jalali representation when available
             try:
-                import jdatetime
-                jd = jdatetime.date.fromgregorian(date=sel)
-                sel_j = f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+                sel_j = jalali.to_jalali(sel)
             except Exception:
                 sel_j = sel.isoformat()
             form = AttendanceDateForm(initial={'date': sel_j})
@@ -228,17 +331,31 @@ def mark_attendance(request, class_id):
     })
 
 
+@login_required
+def attendance_summary(request, class_id):
+    sc = get_object_or_404(SchoolClass, id=class_id)
+    terms = attendance.class_terms(sc)
+    try:
+        term = int(request.GET.get('term') or 0)
+    except ValueError:
+        term = 0
+    if term not in terms:
+        term = terms[0] if terms else jalali.school_year(date.today())
+    summary = attendance.class_term_summary(sc, term)
+    return render(request, 'grades/attendance_summary.html', {'class': sc, 'terms': terms, 'summary': summary})
+
+
 @login_required
 def delete_class(request, class_id):
     sc = get_object_or_404(SchoolClass, id=class_id)
     if request.method == 'POST':
-        sc.delete()
-        messages.success(request, f'کلاس "{sc.name}" حذف شد.')
+        job = jobs.enqueue('delete_class', f'حذف کلاس "{sc.name}"', class_id=sc.id)
+        return redirect('grades:job_status', job_id=job.id)
     return redirect('grades:dashboard')
 
 @login_required
 def student_grades(request, student_id):
-    student = get_object_or_404(Student, id=student_id)
+    student = get_object_or_404(Student.objects.select_related('classroom'), id=student_id)
     sc = student.classroom
     subjects = sc.subjects.all().order_by('id')
 
@@ -261,7 +378,7 @@ def student_grades(request, student_id):
         # مقداردهی اولیه از نمرات قبلی
         initial = {}
         for g in student.grades.all():
-            initial[f"subject_{g.subject.id}"] = float(g.score)
+            initial[f"subject_{g.subject_id}"] = float(g.score)
         form = GradeForm(initial=initial, subjects=subjects)
 
     return render(request, 'grades/edit_scores.html', {
@@ -269,7 +386,7 @@ def student_grades(request, student_id):
         'class': sc,
         'form': form,
         'subjects': subjects,
-        'student_avg': student.average()
+        'student_avg': stored_average(student)
     })
 
 
@@ -311,10 +428,7 @@ def gradebook(request, student_id):
     else:
         # prefer to prefill date with today's Jalali date for new entries
         try:
-            import datetime, jdatetime
-            today = datetime.date.today()
-            jd = jdatetime.date.fromgregorian(date=today)
-            today_j = f"{jd.year:04d}/{jd.month:02d}/{jd.day:02d}"
+            today_j = jalali.today_jalali()
         except Exception:
             today_j = None
         form = GradebookEntryForm(subjects=subjects, initial={'date': today_j})
@@ -417,82 +531,196 @@ def delete_attendance_entry(request, student_id, date):
 def reset_attendance(request, class_id):
     # Archive all attendance for class and then delete them
     sc = get_object_or_404(SchoolClass, id=class_id)
-    atts = Attendance.objects.filter(student__classroom=sc)
-    # archive
-    bulk = [AttendanceHistory(student=a.student, date=a.date, date_jalali=a.date_jalali, present=a.present) for a in atts]
-    AttendanceHistory.objects.bulk_create(bulk)
-    # delete
-    atts.delete()
-    messages.success(request, 'حضور/غیاب ریست شد و به تاریخچه منتقل شد.')
-    return redirect('grades:class_detail', class_id=sc.id)
+    job = jobs.enqueue('reset', f'ریست حضور/غیاب کلاس "{sc.name}"', class_id=sc.id, gradebook=False)
+    return redirect('grades:job_status', job_id=job.id)
 
 
 @login_required
 def reset_gradebook(request, class_id):
     sc = get_object_or_404(SchoolClass, id=class_id)
-    entries = GradebookEntry.objects.filter(student__classroom=sc)
-    bulk = [
-        GradebookEntryHistory(
-            student=e.student,
-            subject=e.subject,
-            entry_type=e.entry_type,
-            value=e.value,
-            date=e.date,
-            date_jalali=e.date_jalali,
-            notes=e.notes,
-        ) for e in entries
-    ]
-    GradebookEntryHistory.objects.bulk_create(bulk)
-    entries.delete()
-    messages.success(request, 'دفتر نمره ریست شد و به تاریخچه منتقل شد.')
-    return redirect('grades:class_detail', class_id=sc.id)
+    job = jobs.enqueue('reset', f'ریست دفتر نمره کلاس "{sc.name}"', class_id=sc.id, attendance=False)
+    return redirect('grades:job_status', job_id=job.id)
+
+
+def _history_filters(request):
+    # current filters without the page cursor, for building pager links
+    params = request.GET.copy()
+    params.pop('before', None)
+    params.pop('after', None)
+    return params.urlencode()
 
 
 @login_required
 def attendance_history(request):
-    qs = AttendanceHistory.objects.select_related('student').all()
     q = request.GET.get('q', '').strip()
     present = request.GET.get('present')
-    if q:
-        qs = qs.filter(Q(student__full_name__icontains=q) | Q(student__national_id__icontains=q))
-    if present in ['0', '1']:
-        qs = qs.filter(present=(present == '1'))
-    qs = qs.order_by('-archived_at')[:1000]
-    return render(request, 'grades/attendance_history.html', {'items': qs})
+    date_from, date_to = request.GET.get('date_from', '').strip(), request.GET.get('date_to', '').strip()
+    qs = exports.attendance_history_queryset(q, present, date_from, date_to).select_related('student')
+    archived = coldstore.ArchiveQuery('attendance', q, present=present, date_from=date_from, date_to=date_to)
+    items, next_cursor, prev_cursor = keyset_page(qs, request.GET.get('before'), request.GET.get('after'),
+                                                  archived=archived)
+    return render(request, 'grades/attendance_history.html', {
+        'items': items,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'filters': _history_filters(request),
+    })
 
 
 @login_required
 def gradebook_history(request):
-    qs = GradebookEntryHistory.objects.select_related('student', 'subject').all()
     q = request.GET.get('q', '').strip()
     entry_type = request.GET.get('entry_type', '').strip()
-    if q:
-        qs = qs.filter(Q(student__full_name__icontains=q) | Q(subject__name__icontains=q))
-    if entry_type in ['pos', 'neg', 'num']:
-        qs = qs.filter(entry_type=entry_type)
-    qs = qs.order_by('-archived_at')[:1000]
-    return render(request, 'grades/gradebook_history.html', {'items': qs})
+    date_from, date_to = request.GET.get('date_from', '').strip(), request.GET.get('date_to', '').strip()
+    qs = exports.gradebook_history_queryset(q, entry_type, date_from, date_to).select_related('student', 'subject')
+    archived = coldstore.ArchiveQuery('gradebook', q, entry_type=entry_type, date_from=date_from, date_to=date_to)
+    items, next_cursor, prev_cursor = keyset_page(qs, request.GET.get('before'), request.GET.get('after'),
+                                                  archived=archived)
+    return render(request, 'grades/gradebook_history.html', {
+        'items': items,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'filters': _history_filters(request),
+    })
+
+
+def _export_response(qs, archived, fields, request, basename):
+    fmt = 'jsonl' if request.GET.get('format') == 'jsonl' else 'csv'
+    try:
+        after_id = int(request.GET.get('after_id') or 0)
+    except ValueError:
+        after_id = 0
+    rows = exports.iter_rows(qs, fields, after_id=after_id, archived=archived)
+    content_type = 'application/x-ndjson; charset=utf-8' if fmt == 'jsonl' else 'text/csv; charset=utf-8'
+    # under ASGI a sync iterator would be buffered whole before sending
+    render_lines = exports.arender if isinstance(request, ASGIRequest) else exports.render
+    response = StreamingHttpResponse(render_lines(rows, fields, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{basename}.{fmt}"'
+    return response
+
+
+@login_required
+def export_attendance_history(request):
+    q, present = request.GET.get('q', '').strip(), request.GET.get('present')
+    date_from, date_to = request.GET.get('date_from', '').strip(), request.GET.get('date_to', '').strip()
+    qs = exports.attendance_history_queryset(q, present, date_from, date_to)
+    archived = coldstore.ArchiveQuery('attendance', q, present=present, date_from=date_from, date_to=date_to)
+    return _export_response(qs, archived, exports.ATTENDANCE_FIELDS, request, 'attendance_history')
+
+
+@login_required
+def export_gradebook_history(request):
+    q, entry_type = request.GET.get('q', '').strip(), request.GET.get('entry_type', '').strip()
+    date_from, date_to = request.GET.get('date_from', '').strip(), request.GET.get('date_to', '').strip()
+    qs = exports.gradebook_history_queryset(q, entry_type, date_from, date_to)
+    archived = coldstore.ArchiveQuery('gradebook', q, entry_type=entry_type, date_from=date_from, date_to=date_to)
+    return _export_response(qs, archived, exports.GRADEBOOK_FIELDS, request, 'gradebook_history')
+
+
+@login_required
+def report_cards(request, class_id=None):
+    """Zip of report cards for one class; without class_id, queue the whole school as a job."""
+    fmt = 'print' if request.GET.get('format') == 'print' else 'html'
+    if class_id is None:
+        if request.method != 'POST':
+            return redirect('grades:dashboard')
+        job = jobs.enqueue('report_cards', 'کارنامه همه کلاس‌ها', filename=f'report_cards_{uuid.uuid4().hex}.zip',
+                           fmt=fmt)
+        return redirect('grades:job_status', job_id=job.id)
+    sc = get_object_or_404(SchoolClass, id=class_id)
+    archive = tempfile.TemporaryFile()
+    # one class in-request, rendered here rather than in a process pool forked from the web worker
+    reports.write_report_cards([sc], archive, fmt=fmt, workers=1)
+    archive.seek(0)
+    return FileResponse(archive, as_attachment=True, filename=f'report_cards_{sc.id}.zip',
+                        content_type='application/zip')
 
 
 @login_required
 def clear_attendance_history(request):
     if request.method == 'POST':
-        AttendanceHistory.objects.all().delete()
-        messages.success(request, 'تمام تاریخچه حضور/غیاب حذف شد.')
+        job = jobs.enqueue('clear_history', 'حذف کل تاریخچه حضور/غیاب', kind='attendance')
+        return redirect('grades:job_status', job_id=job.id)
     return redirect('grades:attendance_history')
 
 
 @login_required
 def clear_gradebook_history(request):
     if request.method == 'POST':
-        GradebookEntryHistory.objects.all().delete()
-        messages.success(request, 'تمام تاریخچه دفتر نمره حذف شد.')
+        job = jobs.enqueue('clear_history', 'حذف کل تاریخچه دفتر نمره', kind='gradebook')
+        return redirect('grades:job_status', job_id=job.id)
     return redirect('grades:gradebook_history')
 
 
-def student_login_view(request):
+@login_required
+def job_status(request, job_id):
+    job = jobs.resume(get_object_or_404(Job, id=job_id))
+    return render(request, 'grades/job_status.html', {'job': job})
+
+
+@login_required
+def job_file(request, job_id):
+    """The zip a finished report_cards job wrote."""
+    job = get_object_or_404(Job, id=job_id, kind='report_cards', status='done')
+    path = reports.report_card_path(job.params['filename'])
+    if not os.path.exists(path):
+        raise Http404('فایل این کار دیگر موجود نیست.')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename='report_cards.zip',
+                        content_type='application/zip')
+
+
+@login_required
+def job_list(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('دسترسی فقط برای کارکنان')
+    status = request.GET.get('status', '')
+    qs = Job.objects.all()
+    if status in dict(Job.STATUSES):
+        qs = qs.filter(status=status)
+    counts = dict(Job.objects.order_by().values_list('status').annotate(n=Count('id')))
+    return render(request, 'grades/job_list.html', {
+        'jobs': qs[:200],
+        'status': status,
+        'statuses': [(key, label, counts.get(key, 0)) for key, label in Job.STATUSES],
+        'schedule': scheduler.overview(),
+    })
+
+
+@login_required
+def retry_job(request, job_id):
+    if not request.user.is_staff:
+        return HttpResponseForbidden('دسترسی فقط برای کارکنان')
+    job = get_object_or_404(Job, id=job_id)
+    if request.method == 'POST':
+        jobs.retry(job)
+        messages.success(request, f'"{job.label}" دوباره در صف قرار گرفت.')
+    return redirect('grades:job_list')
+
+
+@login_required
+def student_search(request):
+    q = request.GET.get('q', '').strip()
+    results = search.search_students(q, limit=100) if q else []
+    return render(request, 'grades/student_search.html', {'q': q, 'results': results})
+
+
+@login_required
+def student_autocomplete(request):
+    q = request.GET.get('q', '').strip()
+    results = [{
+        'id': s.id,
+        'full_name': s.full_name,
+        'national_id': s.national_id,
+        'classroom': s.classroom.name,
+        'url': reverse('grades:student_grades', args=[s.id]),
+    } for s in search.search_students(q, limit=10, ranked=False)]
+    return JsonResponse({'results': results})
+
+
+async def student_login_view(request):
     """Student login view using national_id and password"""
-    if request.session.get('student_id'):
+    # portal sessions live in request.student_session (see grades.sessions)
+    if await request.student_session.aget('student_id'):
         return redirect('grades:student_dashboard')
     
     error = None
@@ -502,59 +730,93 @@ def student_login_view(request):
             national_id = form.cleaned_data['national_id']
             password = form.cleaned_data['password']
             
-            try:
-                student = Student.objects.get(national_id=national_id, password=password)
-                request.session['student_id'] = student.id
-                request.session['student_name'] = student.full_name
+            student = await StudentBackend().aauthenticate(request, national_id=national_id, password=password)
+            if student is not None:
+                await request.student_session.acycle_key()
+                await request.student_session.aset('student_id', student.id)
+                await request.student_session.aset('student_name', student.full_name)
                 return redirect('grades:student_dashboard')
-            except Student.DoesNotExist:
-                error = "کد ملی یا رمز عبور اشتباه است."
+            error = "کد ملی یا رمز عبور اشتباه است."
     else:
         form = StudentLoginForm()
     
-    return render(request, 'grades/student_login.html', {'form': form, 'error': error})
+    return await _arender(request, 'grades/student_login.html', {'form': form, 'error': error})
 
 
-def student_logout_view(request):
+async def student_logout_view(request):
     """Student logout view"""
-    if 'student_id' in request.session:
-        del request.session['student_id']
-    if 'student_name' in request.session:
-        del request.session['student_name']
+    await request.student_session.aflush()
     return redirect('grades:student_login')
 
 
-def student_dashboard(request):
+DASHBOARD_ATTENDANCE_ROWS = 10
+DASHBOARD_GRADEBOOK_ROWS = 15
+
+
+async def _arender(request, template_name, context):
+    """render() for the async portal views.
+
+    The base template's context processors read the staff session and user
+    lazily, which is sync-only database access, so rendering runs in the
+    request's sync thread.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def _alist(qs):
+    return [obj async for obj in qs]
+
+
+async def _dashboard_payload(student):
+    """Plain-data dashboard content for one student (cacheable).
+
+    The queries go through the async ORM, so the event loop serves other
+    requests while they wait; the ORM still runs them one at a time in its
+    sync thread, not in parallel.
+    """
+    attendances = student.attendances.order_by('-date')
+    entries = student.gradebook_entries.select_related('subject').order_by('-date', '-created_at')
+    grades, attendance_rows, attendance_total, entry_rows, gradebook_total, student_average = await asyncio.gather(
+        _alist(student.grades.select_related('subject')),
+        _alist(attendances.values('date', 'date_jalali', 'present')[:DASHBOARD_ATTENDANCE_ROWS]),
+        attendances.acount(),
+        _alist(entries[:DASHBOARD_GRADEBOOK_ROWS]),
+        entries.acount(),
+        astored_average(student),
+    )
+    return {
+        'grades': [{'subject': {'name': g.subject.name}, 'score': g.score} for g in grades],
+        'attendances': attendance_rows,
+        'attendance_total': attendance_total,
+        'gradebook_entries': [
+            {'date': e.date, 'date_jalali': e.date_jalali, 'subject': {'name': e.subject.name} if e.subject else None,
+             'entry_type': e.entry_type, 'value': e.value, 'notes': e.notes}
+            for e in entry_rows
+        ],
+        'gradebook_total': gradebook_total,
+        'student_average': student_average,
+    }
+
+
+async def student_dashboard(request):
     """Student dashboard showing grades, gradebook entries, and attendance"""
-    student_id = request.session.get('student_id')
+    student_id = await request.student_session.aget('student_id')
     if not student_id:
         return redirect('grades:student_login')
     
     try:
-        student = Student.objects.get(id=student_id)
+        student = await Student.objects.select_related('classroom').aget(id=student_id)
     except Student.DoesNotExist:
         return redirect('grades:student_login')
     
-    # Get student's grades
-    grades = student.grades.all()
-    
-    # Get student's gradebook entries
-    gradebook_entries = student.gradebook_entries.all().order_by('-date', '-created_at')
-    
-    # Get student's attendance records
-    attendances = student.attendances.all().order_by('-date')
-    
-    # Calculate student average
-    student_average = student.average()
+    # Grades, entries, attendance and average are cached per student; the key
+    # carries the student/class versions bumped by signals and bulk writes.
+    key = await caching.adashboard_key(student.id, student.classroom_id)
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await _dashboard_payload(student)
+        await cache.aset(key, payload, caching.DASHBOARD_CACHE_TIMEOUT)
     
-    # Get subjects for this student's class
-    subjects = student.classroom.subjects.all()
-    
-    return render(request, 'grades/student_dashboard.html', {
-        'student': student,
-        'grades': grades,
-        'gradebook_entries': gradebook_entries,
-        'attendances': attendances,
-        'student_average': student_average,
-        'subjects': subjects,
-    })
+    # ranks change with classmates' scores, so they are not part of the cached payload
+    standing = await sync_to_async(rankings.standing)(student.id)
+    return await _arender(request, 'grades/student_dashboard.html', dict(payload, student=student, standing=standing))
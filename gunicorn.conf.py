@@ -0,0 +1,32 @@
+"""ASGI deployment profile: gunicorn managing uvicorn workers.
+
+    pip install gunicorn uvicorn
+    gunicorn gradeproject.asgi:application
+
+gunicorn picks this file up from the working directory. The student portal
+views (login, dashboard) are async, so one worker serves many concurrent
+portal users while their queries are in flight; staff views are sync and
+run in a thread per request as under WSGI.
+
+Cache invalidations made by one worker must reach the others, so more than
+one worker needs a shared cache (the default database cache, Redis or
+Memcached); startup stops if CACHES uses the per-process locmem backend.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+# async workers need far fewer processes than sync ones
+workers = int(os.environ.get('GUNICORN_WORKERS', max(2, multiprocessing.cpu_count())))
+if workers > 1:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gradeproject.settings')
+    from grades.caching import require_shared_cache
+
+    require_shared_cache(f'gunicorn with {workers} workers')
+# restart workers now and then to bound memory growth (template/metrics state)
+max_requests = 10000
+max_requests_jitter = 1000
+timeout = 60
+graceful_timeout = 30
+keepalive = 5